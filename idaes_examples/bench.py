@@ -0,0 +1,272 @@
+"""
+Benchmark notebooks and flowsheet entry points, and compare with a baseline.
+"""
+# stdlib
+import json
+import logging
+from pathlib import Path
+import statistics
+from subprocess import run, PIPE
+import sys
+import time
+from typing import Dict, List
+
+# package
+from idaes_examples.util import (
+    allow_repo_root,
+    notebook_index,
+    NB_ROOT,
+    Ext,
+    NotebookIndex,
+)
+from idaes_examples import execute
+
+_log = logging.getLogger(__name__)
+
+BASELINE_FILE = "bench-baseline.json"  # default baseline, in notebook root
+BASELINE_FORMAT = 1  # increment when baseline layout changes
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.2  # allowed relative increase in median time
+DEFAULT_MIN_DELTA = 1.0  # ignore increases in median time below this (seconds)
+
+# Run a function in a module, as a separate process, and print timings as the
+# last line of output. Functions whose first argument is 'm' get a new
+# ConcreteModel, as for the flowsheet `main(m)` and `get_model(m)` functions.
+_RUNNER = """\
+import inspect, json, os, sys, time
+path, func_name = sys.argv[1:3]
+os.chdir(os.path.dirname(path))
+sys.path.insert(0, os.getcwd())
+module = __import__(os.path.splitext(os.path.basename(path))[0])
+func = getattr(module, func_name)
+params = list(inspect.signature(func).parameters)
+args = []
+if params and params[0] == "m":
+    from pyomo.environ import ConcreteModel
+    args.append(ConcreteModel())
+t0 = time.perf_counter()
+func(*args)
+result = {"wall": time.perf_counter() - t0, "solver": None}
+try:
+    import resource
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result["solver"] = kids.ru_utime + kids.ru_stime
+except ImportError:
+    pass
+print()
+print(json.dumps(result))
+"""
+
+
+def check_target(index: NotebookIndex, target: str) -> Path:
+    """Find the notebook or module for a benchmark target.
+
+    Args:
+        index: Notebook index
+        target: See :func:`run_target`
+
+    Returns:
+        Path to test notebook or module
+
+    Raises:
+        ValueError: If the target is not found
+    """
+    if ":" in target:
+        path = index.root / target.rsplit(":", 1)[0]
+        if not path.exists():
+            raise ValueError(f"Benchmark module not found: {path}")
+        return path
+    if target not in index:
+        raise ValueError(f"Benchmark notebook not found: {target}")
+    info = index[target]
+    if Ext.TEST.value in info.skip:
+        raise ValueError(f"Notebook '{target}' has no generated test notebook")
+    return info.ext_path(Ext.TEST)
+
+
+def run_target(index: NotebookIndex, target: str) -> Dict:
+    """Run one benchmark target once.
+
+    Args:
+        index: Notebook index
+        target: Either a notebook key, like 'flowsheets/methanol_synthesis', to
+                run its generated test notebook; or a module path relative to the
+                notebook root and a function, like
+                'flowsheets/methanol_flowsheet.py:main', to call that function
+                in a new Python process.
+
+    Returns:
+        Timings, with at least the wall time ("wall") in seconds
+
+    Raises:
+        ValueError: If the target is not found
+        RuntimeError: If the function exits with an error
+    """
+    path = check_target(index, target)
+    if ":" in target:
+        func_name = target.rsplit(":", 1)[1]
+        proc = run(
+            [sys.executable, "-c", _RUNNER, str(path.resolve()), func_name],
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+        if proc.returncode != 0:
+            err = proc.stderr.decode("utf-8", errors="replace").strip()
+            raise RuntimeError(f"Benchmark '{target}' failed:\n{err}")
+        return json.loads(proc.stdout.decode("utf-8").strip().split("\n")[-1])
+    stats = {}
+    execute.execute_notebook(path, stats=stats)
+    return {k: stats[k] for k in ("wall", "solver", "maxrss")}
+
+
+def summarize(times: List[float]) -> Dict:
+    """Summary statistics for a list of times."""
+    return {
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def run_benchmarks(
+    index: NotebookIndex, targets: List[str], repeat: int = DEFAULT_REPEAT
+) -> Dict:
+    """Run each target `repeat` times.
+
+    Returns:
+        Benchmark results, in the same format as a saved baseline
+
+    Raises:
+        ValueError: If `repeat` is less than 1, or a target is not found
+    """
+    if repeat < 1:
+        raise ValueError(f"Number of runs must be at least 1, got {repeat}")
+    for target in targets:
+        check_target(index, target)  # fail before running anything
+    benchmarks = {}
+    for target in targets:
+        runs = []
+        for i in range(repeat):
+            _log.info(f"(start) benchmark '{target}' run {i + 1}/{repeat}")
+            runs.append(run_target(index, target))
+            _log.info(f"(end) benchmark '{target}' wall={runs[-1]['wall']:.2f}s")
+        result = summarize([r["wall"] for r in runs])
+        solver_times = [r["solver"] for r in runs if r.get("solver") is not None]
+        if solver_times:
+            result["solver"] = summarize(solver_times)
+        benchmarks[target] = result
+    return {
+        "format": BASELINE_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "versions": execute.package_versions(),
+        "benchmarks": benchmarks,
+    }
+
+
+def read_baseline(path: Path) -> Dict:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != BASELINE_FORMAT:
+        raise ValueError(f"Unknown benchmark baseline format in '{path}'")
+    return data
+
+
+def write_baseline(path: Path, results: Dict):
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def compare(
+    results: Dict,
+    baseline: Dict,
+    tolerance: float = DEFAULT_TOLERANCE,
+    min_delta: float = DEFAULT_MIN_DELTA,
+) -> List[Dict]:
+    """Compare benchmark results with a baseline.
+
+    A target regressed if its median time increased by more than `tolerance`
+    (as a fraction of the baseline median) and by more than `min_delta` seconds.
+
+    Returns:
+        One comparison for each target in both, with the key "regression"
+        set to True for those that regressed.
+    """
+    comparisons = []
+    for target, cur in results["benchmarks"].items():
+        base = baseline["benchmarks"].get(target, None)
+        if base is None:
+            continue
+        delta = cur["median"] - base["median"]
+        ratio = cur["median"] / base["median"] if base["median"] > 0 else 1.0
+        comparisons.append(
+            {
+                "target": target,
+                "baseline": base["median"],
+                "current": cur["median"],
+                "ratio": ratio,
+                "regression": ratio > 1 + tolerance and delta > min_delta,
+            }
+        )
+    return comparisons
+
+
+def bench(
+    srcdir=None,
+    targets=None,
+    repeat=DEFAULT_REPEAT,
+    baseline=None,
+    save=False,
+    tolerance=DEFAULT_TOLERANCE,
+    min_delta=DEFAULT_MIN_DELTA,
+    regressions=None,
+):
+    """Run benchmarks, then save them as the baseline or compare with it.
+
+    Args:
+        srcdir: Notebook source directory, default is the current directory
+        targets: Benchmark targets (see :func:`run_target`). If empty, use all
+                 the targets in the baseline.
+        repeat: Number of runs per target
+        baseline: Baseline file, default is BASELINE_FILE in the notebook root
+        save: If True, save results as the new baseline instead of comparing
+        tolerance: See :func:`compare`
+        min_delta: See :func:`compare`
+        regressions: If given, a list to which regressed comparisons are added
+
+    Raises:
+        ValueError: If there are no targets
+    """
+    src_path = allow_repo_root(Path(srcdir or "."), bench) / NB_ROOT
+    index = notebook_index(src_path)
+    baseline_path = Path(baseline) if baseline else index.root / BASELINE_FILE
+    base = read_baseline(baseline_path) if baseline_path.exists() else None
+    if not targets:
+        if base is None:
+            raise ValueError("No benchmark targets given, and no baseline found")
+        targets = list(base["benchmarks"].keys())
+    results = run_benchmarks(index, targets, repeat=repeat)
+
+    print()
+    for target, r in results["benchmarks"].items():
+        print(
+            f"{r['median']:9.2f}s median {r['min']:9.2f}s min "
+            f"{r['stdev']:7.2f}s stdev | {target}"
+        )
+    if save:
+        write_baseline(baseline_path, results)
+        print(f"\nSaved baseline: {baseline_path}")
+        return
+    if base is None:
+        print(f"\nNo baseline to compare with: {baseline_path}")
+        return
+    print(f"\nCompare with baseline from {base['created']} {base['versions']}")
+    for c in compare(results, base, tolerance=tolerance, min_delta=min_delta):
+        flag = "REGRESSION" if c["regression"] else "ok"
+        print(
+            f"{c['baseline']:9.2f}s -> {c['current']:9.2f}s "
+            f"({c['ratio']:5.2f}x) {flag:10} | {c['target']}"
+        )
+        if c["regression"] and regressions is not None:
+            regressions.append(c)
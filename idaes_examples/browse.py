@@ -2,15 +2,22 @@
 Graphical examples browser
 """
 # stdlib
+from collections import OrderedDict
 from importlib import resources
 import json
 import logging
 from logging.handlers import RotatingFileHandler
 from operator import attrgetter
+import os
 from pathlib import Path
 import re
 from subprocess import Popen, PIPE, TimeoutExpired
-from typing import Tuple, List, Dict
+from threading import Thread
+from typing import Tuple, List, Dict, Iterable, Optional
+from urllib.error import URLError
+from urllib.parse import quote
+from urllib.request import urlopen
+import webbrowser
 
 # third-party
 import markdown
@@ -20,11 +27,11 @@ from tkhtmlview import html_parser
 # package
 import idaes_examples
 from idaes_examples.util import (
-    find_notebooks,
-    read_toc,
+    iter_notebook,
+    notebook_index,
+    NotebookInfo,
     NB_CELLS,
     Ext,
-    src_suffix_len,
 )
 
 # -------------
@@ -84,6 +91,98 @@ def find_notebook_dir() -> Path:
     return root_path
 
 
+DESC_CACHE = ".notebook-descriptions.json"  # cached descriptions, in root folder
+
+
+def describe_notebook(cells: Iterable[Dict], full: bool = True) -> Dict:
+    """Summarize the cells of a notebook for the browser.
+
+    Args:
+        cells: Notebook cells
+        full: If False, stop at the first non-empty markdown cell and do not
+              count cells or collect tags.
+
+    Returns:
+        Dict with the title (from the first heading of the first non-empty
+        markdown cell, or None), source lines of that cell, number of cells,
+        and all the cell tags. The last two are None if `full` is False.
+    """
+    title, lines, tags, n = None, [], set(), 0
+    for cell in cells:
+        n += 1
+        tags.update(cell.get("metadata", {}).get("tags", []))
+        if lines or cell["cell_type"] != "markdown" or not cell.get("source"):
+            continue
+        lines = cell["source"]
+        for line in lines:
+            if line.strip().startswith("#"):
+                last_pound = line.rfind("#")
+                title = line[last_pound + 1 :].strip()
+                break
+        if not full:
+            break
+    if not full:
+        n, tags = None, None
+    else:
+        tags = sorted(tags)
+    return {"title": title, "lines": lines, "cells": n, "tags": tags}
+
+
+class DescriptionCache:
+    """On-disk cache of notebook descriptions (see :func:`describe_notebook`),
+    keyed by notebook path and checked against its size and modification time.
+    """
+
+    FORMAT = 1  # increment when cached layout changes
+
+    def __init__(self, root: Path):
+        self._root = root
+        self._path = root / DESC_CACHE
+        self._data, self._modified = {}, False
+        if self._path.exists():
+            try:
+                with self._path.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("format") == self.FORMAT:
+                    self._data = data["notebooks"]
+            except (OSError, ValueError) as err:
+                _log.debug(f"Ignoring unreadable description cache: {err}")
+
+    def _key(self, path: Path) -> str:
+        return path.relative_to(self._root).as_posix()
+
+    @staticmethod
+    def _stamp(path: Path) -> List[int]:
+        st = path.stat()
+        return [st.st_size, st.st_mtime_ns]
+
+    def get(self, path: Path) -> Optional[Dict]:
+        """Get the description for a notebook, or None if missing or stale."""
+        desc = self._data.get(self._key(path), None)
+        if desc is None or desc["stamp"] != self._stamp(path):
+            return None
+        return desc
+
+    def put(self, path: Path, desc: Dict):
+        """Set the description for a notebook, which must exist."""
+        self._data[self._key(path)] = dict(desc, stamp=self._stamp(path))
+        self._modified = True
+
+    def save(self):
+        """Write cache to disk, if it was modified."""
+        if not self._modified:
+            return
+        # unique temporary file, as parallel preprocess runs may save at once
+        tmp_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+        try:
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump({"format": self.FORMAT, "notebooks": self._data}, f)
+            tmp_path.replace(self._path)
+            self._modified = False
+        except OSError as err:  # e.g. read-only installation
+            _log.debug(f"Cannot write description cache '{self._path}': {err}")
+
+
 class Notebooks:
     """Container for all known Jupyter notebooks."""
 
@@ -91,29 +190,38 @@ class Notebooks:
 
     def __init__(self, sort_keys=DEFAULT_SORT_KEYS):
         self._nb = {}
-        self._root = find_notebook_dir()
+        index = notebook_index(find_notebook_dir())
+        self._root = index.root  # resolved, as are the notebook paths
         self._root_key = "root"
         self._section_key_prefix = "s_"
-        self._toc = read_toc(self._root)
-        find_notebooks(self._root, self._toc, self._add_notebook)
+        self._desc_cache = DescriptionCache(self._root)
+        for info in index:
+            self._add_notebook(info)
         self._sorted_values = sorted(
             list(self._nb.values()), key=attrgetter(*sort_keys)
         )
-        self._tree = self._as_tree()
+        self._tree = None  # built on first use
+        self._titled = {}  # {tree-key: (section-key, notebook)}, see as_tree()
 
-    def _add_notebook(self, path: Path, **kwargs):
-        name = path.stem[:-src_suffix_len]
-        section = path.relative_to(self._root).parts[:-1]
-        for ext in Ext.USER.value, Ext.EX.value, Ext.SOL.value:
-            tpath = path.parent / f"{name}_{ext}.ipynb"
+    def _add_notebook(self, info: NotebookInfo):
+        name, section = info.name, info.section
+        for ext in Ext.USER, Ext.EX, Ext.SOL:
+            tpath = info.ext_path(ext)
             if tpath.exists():
-                key = (section, name, ext)
+                key = (section, name, ext.value)
                 _log.debug(f"Add notebook. key='{key}'")
-                self._nb[key] = Notebook(name, section, tpath, nbtype=ext)
+                self._nb[key] = Notebook(
+                    name, section, tpath, nbtype=ext.value, cache=self._desc_cache
+                )
 
     def __len__(self):
         return len(self._nb)
 
+    @property
+    def root(self) -> Path:
+        """Root directory of the notebooks."""
+        return self._root
+
     @property
     def notebooks(self) -> Dict:
         """Underlying dict mapping a tuple of (section, name, type) to
@@ -121,9 +229,22 @@ class Notebooks:
         """
         return self._nb
 
-    def titles(self) -> List[str]:
-        """Get list of all titles for notebooks."""
-        return [nb.title for nb in self._nb.values()]
+    def titles(self, load: bool = True) -> List[str]:
+        """Get list of all titles for notebooks.
+
+        Args:
+            load: If False, do not read any notebook: use the title only if it
+                  is loaded or cached, and otherwise the notebook name.
+        """
+        if not load:
+            return [nb.cached_title() or nb.name for nb in self._nb.values()]
+        result = [nb.title for nb in self._nb.values()]
+        self._desc_cache.save()
+        return result
+
+    def save_cache(self):
+        """Save the descriptions loaded so far, for the next start."""
+        self._desc_cache.save()
 
     def __getitem__(self, key):
         return self._nb[key]
@@ -132,9 +253,13 @@ class Notebooks:
         """Get notebooks as a tree suitable for displaying in a PySimpleGUI
         Tree widget.
         """
+        if self._tree is None:
+            self._tree = self._as_tree()
         return self._tree
 
     def _as_tree(self) -> PySG.TreeData:
+        # Entries for notebooks whose title is not cached show the name, to
+        # avoid reading every notebook. See load_titles().
         td = PySG.TreeData()
 
         # organize notebooks hierarchically
@@ -157,9 +282,11 @@ class Notebooks:
                 for nb in nblist:
                     if nb.type == Ext.USER.value:
                         base_key = f"nb+{section}+{nb.name}+{nb.type}"
+                        text = nb.cached_title() or nb.name
                         td.insert(
-                            section_key, key=base_key, text=nb.title, values=[nb.path]
+                            section_key, key=base_key, text=text, values=[nb.path]
                         )
+                        self._titled[base_key] = (section_key, nb)
                         break
                 # Make sub-entries for examples, tutorials, etc. (if there are any)
                 if len(nblist) > 1:
@@ -175,6 +302,23 @@ class Notebooks:
 
         return td
 
+    def load_titles(self, key) -> Dict[str, str]:
+        """Load the titles of the tree entries for a notebook, or for all the
+        notebooks in a section (or the root), e.g. when it is selected or
+        expanded.
+
+        Args:
+            key: Key of the tree entry
+
+        Returns:
+            Mapping of tree key to title, for the entries that show a title
+        """
+        return {
+            k: nb.title
+            for k, (section_key, nb) in self._titled.items()
+            if key in (k, section_key) or self.is_tree_root(key)
+        }
+
     def is_tree_section(self, key) -> bool:
         return key.startswith(self._section_key_prefix)
 
@@ -183,14 +327,24 @@ class Notebooks:
 
 
 class Notebook:
-    """Interface for metadata of one Jupyter notebook."""
-
-    def __init__(self, name: str, section: Tuple, path: Path, nbtype="plain"):
+    """Interface for metadata of one Jupyter notebook.
+
+    The description is read from the cache, or the notebook file, on first use.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        section: Tuple,
+        path: Path,
+        nbtype="plain",
+        cache: DescriptionCache = None,
+    ):
         self.name, self._section = name, section
         self._path = path
         self._long_desc, self._short_desc = "", name
         self._lines = []
-        self._get_description()
+        self._cache, self._loaded = cache, False
         self._type = nbtype
 
     @property
@@ -199,53 +353,87 @@ class Notebook:
 
     @property
     def title(self) -> str:
+        self._load()
         return self._short_desc
 
     @property
     def description(self) -> str:
+        self._load()
         return self._long_desc
 
     @property
     def description_lines(self) -> List[str]:
+        self._load()
         return self._lines
 
     @property
     def type(self) -> str:
         return self._type
 
+    def cached_title(self) -> Optional[str]:
+        """Title if the description is loaded or cached, else None. This never
+        reads the notebook.
+        """
+        if not self._loaded:
+            desc = None if self._cache is None else self._cache.get(self._path)
+            if desc is None:
+                return None
+            self._set_description(desc)
+            self._loaded = True
+        return self._short_desc
+
     @property
     def path(self) -> Path:
         return self._path
 
-    def _get_description(self):
-        desc = False
-        with self._path.open("r") as f:
-            data = json.load(f)
-        cells = data[NB_CELLS]
-        if len(cells) > 0:
-            for c1 in cells:
-                if c1["cell_type"] == "markdown" and "source" in c1 and c1["source"]:
-                    self._long_desc = "".join(c1["source"])
-                    self._lines = c1["source"]
-                    for line in self._lines:
-                        if line.strip().startswith("#"):
-                            last_pound = line.rfind("#")
-                            self._short_desc = line[last_pound + 1 :].strip()
-                            break
-                    desc = True
-                    break
-        if not desc:
+    def _load(self):
+        if not self._loaded:
+            self._get_description(self._cache)
+            self._loaded = True
+
+    def _get_description(self, cache: DescriptionCache = None):
+        desc = None if cache is None else cache.get(self._path)
+        if desc is None:
+            cells = (v for k, v in iter_notebook(self._path) if k == NB_CELLS)
+            desc = describe_notebook(cells, full=False)
+            if cache is not None:
+                cache.put(self._path, desc)
+        self._set_description(desc)
+
+    def _set_description(self, desc: Dict):
+        if desc["lines"]:
+            self._lines = desc["lines"]
+            self._long_desc = "".join(self._lines)
+            if desc["title"] is not None:
+                self._short_desc = desc["title"]
+        else:
             self._short_desc, self._long_desc = "No description", "No description"
             self._lines = [self._short_desc]
 
 
 class Jupyter:
-    """Run Jupyter notebooks."""
+    """Run Jupyter notebooks.
+
+    By default, each notebook is opened in its own Jupyter server.
+    If a root directory is given, a single server is started (on first use)
+    in that directory, and all notebooks are opened as pages of that server.
+    """
 
     COMMAND = "jupyter"
+    STOP_TIMEOUT = 5  # seconds to wait for a server to stop
+
+    # URL printed by the server on startup
+    _url_pat = re.compile(r"(http://[^\s/]+:\d+/)\S*\?token=(\w+)")
 
-    def __init__(self):
+    def __init__(self, root: Path = None):
+        """Constructor.
+
+        Args:
+            root: If given, run one shared server with this root directory.
+        """
         self._ports = set()
+        self._root = root
+        self._server, self._base_url, self._token = None, None, None
 
     def open(self, nb_path: Path):
         """Open notebook in a browser.
@@ -256,6 +444,9 @@ class Jupyter:
         Returns:
             None
         """
+        if self._root is not None:
+            self._open_shared(nb_path)
+            return
         _log.info(f"(start) open notebook at path={nb_path}")
         p = Popen([self.COMMAND, "notebook", str(nb_path)], stderr=PIPE)
         buf, m, port = "", None, "unknown"
@@ -272,12 +463,71 @@ class Jupyter:
             self._ports.add(port)
         _log.info(f"(end) open notebook at path={nb_path} port={port}")
 
+    def _open_shared(self, nb_path: Path):
+        _log.info(f"(start) open notebook in shared server, path={nb_path}")
+        if not self.is_running():
+            self._start_server()
+        rel_path = Path(nb_path).resolve().relative_to(Path(self._root).resolve())
+        url = f"{self._base_url}notebooks/{quote(rel_path.as_posix())}"
+        webbrowser.open(f"{url}?token={self._token}")
+        _log.info(f"(end) open notebook in shared server, url={url}")
+
+    def _start_server(self):
+        self._stop_server()
+        _log.info(f"(start) start shared server, root={self._root}")
+        cmd = [self.COMMAND, "notebook", "--no-browser", f"--notebook-dir={self._root}"]
+        proc = Popen(cmd, stderr=PIPE)
+        m = None
+        for line in proc.stderr:
+            m = self._url_pat.search(line.decode("utf-8", errors="replace"))
+            if m:
+                break
+        if m is None:
+            self._server = proc
+            self._stop_server()
+            raise RuntimeError(f"Could not start Jupyter server: {' '.join(cmd)}")
+        self._server, self._base_url, self._token = proc, m.group(1), m.group(2)
+        # keep reading server output, so it does not block on a full pipe
+        Thread(target=self._drain, args=(proc.stderr,), daemon=True).start()
+        _log.info(f"(end) start shared server, url={self._base_url}")
+
+    @staticmethod
+    def _drain(stream):
+        for line in stream:
+            _log.debug(f"jupyter: {line.decode('utf-8', errors='replace').rstrip()}")
+
+    def is_running(self) -> bool:
+        """Whether the shared server is running and responding to requests."""
+        if self._server is None or self._server.poll() is not None:
+            return False
+        try:
+            with urlopen(f"{self._base_url}api/status?token={self._token}", timeout=2):
+                return True
+        except (URLError, OSError) as err:
+            _log.warning(f"Shared Jupyter server is not responding: {err}")
+            return False
+
+    def _stop_server(self):
+        proc, self._server = self._server, None
+        if proc is None:
+            return
+        _log.info("(start) stop shared server")
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=self.STOP_TIMEOUT)
+            except TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        _log.info("(end) stop shared server")
+
     def stop(self):
         """Stop all running notebooks.
 
         Returns:
             None
         """
+        self._stop_server()
         for port in self._ports:
             self._stop(port)
 
@@ -295,11 +545,23 @@ class Jupyter:
 class NotebookDescription:
     """Show notebook descriptions in a UI widget."""
 
+    HTML_CACHE_SIZE = 64  # number of rendered descriptions to keep
+
+    # (pattern, replacement) for tags that display badly in the Tk HTML viewer
+    _html_subs = [
+        (re.compile(r"<code>(.*?)</code>"), r"<em>\1</em>"),
+        (re.compile(r"<sub>(.*?)</sub>"), r"<span style='font-size: 50%'>\1</span>"),
+        (re.compile(r"<h1>(.*?)</h1>"), r"<h1 style='font-size: 120%'>\1</h1>"),
+        (re.compile(r"<h2>(.*?)</h2>"), r"<h2 style='font-size: 110%'>\1</h2>"),
+        (re.compile(r"<h3>(.*?)</h3>"), r"<h3 style='font-size: 100%'>\1</h3>"),
+    ]
+
     def __init__(self, nb: dict, widget):
         self._text = "_Select a notebook to view its description_"
         self._nb = nb
         self._w = widget
         self._html_parser = html_parser.HTMLTextParser()
+        self._html_cache = OrderedDict()  # {notebook-key: html}, in LRU order
         self._html()
 
     def show(self, section: str, name: str, type_: Ext):
@@ -316,7 +578,7 @@ class NotebookDescription:
         key = self._make_key(section, name, type_)
         self._text = self._nb[key].description
         # self._print()
-        self._html()
+        self._html(key)
 
     @staticmethod
     def _make_key(section, name, type_):
@@ -326,25 +588,33 @@ class NotebookDescription:
             section_tuple = (section,)
         return section_tuple, name, type_
 
-    def _html(self):
-        """Convert markdown source to HTML using the 'markdown' package."""
-        m_html = markdown.markdown(
-            self._text, extensions=["extra", "codehilite"], output_format="html"
-        )
-        self._set_html(self._pre_html(m_html))
+    def _html(self, key=None):
+        """Convert markdown source to HTML using the 'markdown' package.
 
-    @staticmethod
-    def _pre_html(text):
+        Args:
+            key: If given, notebook key used to cache the rendered HTML
+        """
+        html = self._html_cache.get(key, None) if key is not None else None
+        if html is None:
+            m_html = markdown.markdown(
+                self._text, extensions=["extra", "codehilite"], output_format="html"
+            )
+            html = self._pre_html(m_html)
+            if key is not None:
+                self._html_cache[key] = html
+                if len(self._html_cache) > self.HTML_CACHE_SIZE:
+                    self._html_cache.popitem(last=False)
+        else:
+            self._html_cache.move_to_end(key)
+        self._set_html(html)
+
+    @classmethod
+    def _pre_html(cls, text):
         """Pre-process the HTML so it displays more nicely in the relatively crude
         Tk HTML viewer.
         """
-        text = re.sub(r"<code>(.*?)</code>", r"<em>\1</em>", text)
-        text = re.sub(
-            r"<sub>(.*?)</sub>", r"<span style='font-size: 50%'>\1</span>", text
-        )
-        text = re.sub(r"<h1>(.*?)</h1>", r"<h1 style='font-size: 120%'>\1</h1>", text)
-        text = re.sub(r"<h2>(.*?)</h2>", r"<h2 style='font-size: 110%'>\1</h2>", text)
-        text = re.sub(r"<h3>(.*?)</h3>", r"<h3 style='font-size: 100%'>\1</h3>", text)
+        for pattern, repl in cls._html_subs:
+            text = pattern.sub(repl, text)
         return (
             f"<div style='font-size: 80%; "
             f'font-family: "Helvetica Neue", Helvetica, Arial, sans-serif;\'>'
@@ -372,8 +642,15 @@ class NotebookDescription:
 FONT = ("Helvetica", 11)
 
 
-def gui(notebooks):
+def gui(notebooks, shared_server=True):
     setup_logging()
+    try:
+        return _gui(notebooks, shared_server=shared_server)
+    finally:
+        notebooks.save_cache()
+
+
+def _gui(notebooks, shared_server=True):
     PySG.theme("Material2")
 
     nb_tree = notebooks.as_tree()
@@ -396,7 +673,8 @@ def gui(notebooks):
         "Description", layout=[[description_widget]], expand_y=True, expand_x=True
     )
 
-    title_max = max(len(t) for t in notebooks.titles())
+    # without reading the notebooks whose titles are not cached
+    title_max = max(len(t) for t in notebooks.titles(load=False))
 
     nb_widget = PySG.Tree(
         nb_tree,
@@ -445,35 +723,49 @@ def gui(notebooks):
 
     nbdesc = NotebookDescription(notebooks, window["Description"].Widget)
 
+    tree = window["-TREE-"]
+    tree.bind("<<TreeviewOpen>>", "+OPEN")
+
+    def show_titles(key):
+        for tree_key, title in notebooks.load_titles(key).items():
+            tree.update(key=tree_key, text=title)
+
     # Event Loop to process "events" and get the "values" of the inputs
-    jupyter = Jupyter()
-    while True:
-        event, values = window.read()
-        # if user closes window or clicks cancel
-        if event == PySG.WIN_CLOSED or event == "Cancel":
-            break
-        # print(event, values)
-        if isinstance(event, int):
-            _log.debug(f"Unhandled event: {event}")
-        elif event == "-TREE-":
-            what = values.get("-TREE-", [""])[0]
-            if notebooks.is_tree_section(what) or notebooks.is_tree_root(what):
-                # cannot open a section or the root entry, so disable the button
-                window["open"].update(disabled=True)
-            elif what:
-                _, section, name, type_ = what.split("+")
-                nbdesc.show(section, name, type_)
-                # make sure open is enabled
-                window["open"].update(disabled=False)
-        elif event == "open":
-            what = values.get("-TREE-", [None])[0]
-            if what:
-                _, section, name, type_ = what.split("+")
-                path = nbdesc.get_path(section, name, type_)
-                jupyter.open(path)
-
-    _log.info("Stop running notebooks")
-    jupyter.stop()
-    _log.info("Close main window")
-    window.close()
+    jupyter = Jupyter(root=notebooks.root if shared_server else None)
+    try:
+        while True:
+            event, values = window.read()
+            # if user closes window or clicks cancel
+            if event == PySG.WIN_CLOSED or event == "Cancel":
+                break
+            # print(event, values)
+            if isinstance(event, int):
+                _log.debug(f"Unhandled event: {event}")
+            elif event == "-TREE-+OPEN":
+                what = tree.IdToKey.get(tree.Widget.focus(), None)
+                if what:
+                    show_titles(what)
+            elif event == "-TREE-":
+                what = values.get("-TREE-", [""])[0]
+                if what:
+                    show_titles(what)
+                if notebooks.is_tree_section(what) or notebooks.is_tree_root(what):
+                    # cannot open a section or the root entry, so disable the button
+                    window["open"].update(disabled=True)
+                elif what:
+                    _, section, name, type_ = what.split("+")
+                    nbdesc.show(section, name, type_)
+                    # make sure open is enabled
+                    window["open"].update(disabled=False)
+            elif event == "open":
+                what = values.get("-TREE-", [None])[0]
+                if what:
+                    _, section, name, type_ = what.split("+")
+                    path = nbdesc.get_path(section, name, type_)
+                    jupyter.open(path)
+    finally:
+        _log.info("Stop running notebooks")
+        jupyter.stop()
+        _log.info("Close main window")
+        window.close()
     return 0
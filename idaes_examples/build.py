@@ -2,14 +2,19 @@
 Build the examples
 """
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from importlib import metadata
 import json
 import logging
+import os
 from pathlib import Path
 import re
 from subprocess import check_call
 import sys
 import time
 import traceback
+from typing import Dict, List, Optional, Tuple
 import webbrowser
 
 # package
@@ -23,14 +28,14 @@ from idaes_examples.util import (
     NB_META,
     NB_IDAES,
     NB_SKIP,
-    read_toc,
-    find_notebooks,
+    NB_STRIP,
+    notebook_index,
     src_suffix,
     src_suffix_len,
     Ext,
     Tags,
 )
-from idaes_examples import browse
+from idaes_examples import bench, browse, execute
 
 # -------------
 #   Logging
@@ -48,21 +53,189 @@ _log.addHandler(_h)
 # -------------
 
 DEV_DIR = "_dev"  # special directory to include in preprocessing
+MANIFEST_FILE = ".preprocess-manifest.json"  # hashes of preprocessed sources
+MANIFEST_FORMAT = 2  # increment when manifest layout changes
 
 
-def preprocess(srcdir=None):
+def preprocess(srcdir=None, jobs=1):
+    """Preprocess all source notebooks found in the TOC (and the dev directory).
+
+    Args:
+        srcdir: Source directory
+        jobs: Number of worker processes. If 1, run serially in this process.
+              If 0 or less, use one worker per CPU.
+
+    Returns:
+        Number of notebooks (in the TOC) preprocessed
+    """
     src_path = allow_repo_root(Path(srcdir), main)
     src_path /= NB_ROOT
-    toc = read_toc(src_path)
     t0 = time.time()
-    n = find_notebooks(src_path, toc, _preprocess)
-    for dev_file in (src_path / DEV_DIR).glob(f"*{src_suffix}.ipynb"):
-        _preprocess(dev_file)
+    index = notebook_index(src_path)
+    # use the resolved root, as in the index, for the manifest and descriptions
+    src_path = index.root
+    n, nb_paths = len(index), index.paths
+    nb_paths.extend(sorted((src_path / DEV_DIR).glob(f"*{src_suffix}.ipynb")))
+    old_manifest = _read_manifest(src_path)
+    # copies, since the entries are updated in place
+    entries = [
+        dict(old_manifest.get(_manifest_key(src_path, p), {})) for p in nb_paths
+    ]
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+    if jobs == 1:
+        timings = [(p, _preprocess(p, entry=e)) for p, e in zip(nb_paths, entries)]
+    else:
+        timings = _preprocess_parallel(nb_paths, entries, jobs)
+    manifest = {
+        _manifest_key(src_path, p): e for p, e in zip(nb_paths, entries) if e
+    }
+    if manifest != old_manifest:
+        _write_manifest(src_path, manifest)
+    _update_descriptions(src_path, nb_paths, entries)
     dur = time.time() - t0
-    _log.info(f"Preprocessed {n} notebooks in {dur:.1f} seconds")
+    misses = sum(1 for _, d in timings if d is not None)
+    _log.info(
+        f"Preprocessed {n} notebooks in {dur:.1f} seconds "
+        f"(unchanged={len(timings) - misses} regenerated={misses})"
+    )
+    _log_timings(timings, dur)
     return n
 
 
+def _preprocess_parallel(
+    nb_paths: List[Path], entries: List[Dict], jobs: int
+) -> List[Tuple]:
+    """Run :func:`_preprocess` for each notebook in a pool of worker processes.
+
+    Log messages from each worker are buffered and re-emitted here, in the
+    same order as the input notebooks, so the output does not interleave.
+    The manifest entries in `entries` are updated with the workers' results.
+    """
+    _log.info(f"Preprocess {len(nb_paths)} notebooks with {jobs} processes")
+    level = _log.getEffectiveLevel()
+    timings = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(_preprocess_job, p, e, level)
+            for p, e in zip(nb_paths, entries)
+        ]
+        for nb_path, entry, fut in zip(nb_paths, entries, futures):
+            records, nb_dur, new_entry = fut.result()
+            for record in records:
+                _log.handle(record)
+            entry.clear()
+            entry.update(new_entry)
+            timings.append((nb_path, nb_dur))
+    return timings
+
+
+class _BufferHandler(logging.Handler):
+    """Save log records in a list instead of emitting them."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _preprocess_job(
+    nb_path: Path, entry: Dict, level: int
+) -> Tuple[List, Optional[float], Dict]:
+    """Worker process entry point for :func:`_preprocess`."""
+    buf = _BufferHandler()
+    saved = _log.handlers, _log.propagate
+    _log.handlers, _log.propagate = [buf], False
+    _log.setLevel(level)
+    try:
+        nb_dur = _preprocess(nb_path, entry=entry)
+    finally:
+        _log.handlers, _log.propagate = saved
+    return buf.records, nb_dur, entry
+
+
+def _log_timings(timings: List[Tuple], wall_time: float, top: int = 5):
+    """Log aggregated per-notebook preprocessing times."""
+    done = sorted(((d, p) for p, d in timings if d is not None), reverse=True)
+    if not done:
+        return
+    total = sum(d for d, _ in done)
+    _log.info(
+        f"Notebook preprocessing time: total={total:.2f}s "
+        f"mean={total / len(done):.2f}s speedup={total / max(wall_time, 1e-6):.1f}x"
+    )
+    for d, p in done[:top]:
+        _log.info(f"  {d:6.2f}s {p}")
+
+
+def _update_descriptions(src_path: Path, nb_paths: List[Path], entries: List[Dict]):
+    """Save descriptions of generated notebooks for the notebook browser."""
+    cache = browse.DescriptionCache(src_path)
+    for nb_path, entry in zip(nb_paths, entries):
+        base = nb_path.stem[:-src_suffix_len]
+        for name, desc in entry.get("descriptions", {}).items():
+            desc_path = nb_path.parent / f"{base}_{name}.ipynb"
+            if desc_path.exists() and cache.get(desc_path) is None:
+                cache.put(desc_path, desc)
+    cache.save()
+
+
+def _manifest_key(src_path: Path, nb_path: Path) -> str:
+    return nb_path.relative_to(src_path).as_posix()
+
+
+def _read_manifest(src_path: Path) -> Dict:
+    """Read the manifest of preprocessed notebooks.
+
+    Returns:
+        Mapping of notebook path (relative to `src_path`) to its manifest entry.
+        Empty if the manifest is missing, unreadable or in an older format.
+    """
+    manifest_path = src_path / MANIFEST_FILE
+    if not manifest_path.exists():
+        return {}
+    try:
+        with manifest_path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as err:
+        _log.warning(f"Ignoring unreadable manifest '{manifest_path}': {err}")
+        return {}
+    if data.get("format") != MANIFEST_FORMAT:
+        return {}
+    return data.get("notebooks", {})
+
+
+def _write_manifest(src_path: Path, notebooks: Dict):
+    manifest_path = src_path / MANIFEST_FILE
+    # unique temporary file, as parallel test workers may preprocess at once
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump({"format": MANIFEST_FORMAT, "notebooks": notebooks}, f, indent=1)
+    tmp_path.replace(manifest_path)
+
+
+def _package_version() -> str:
+    try:
+        return metadata.version("examples")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _source_hash(data: bytes) -> str:
+    """Hash of everything that determines the preprocessing output:
+    the source notebook contents, the exclusion table, the default output
+    stripping, and the package version.
+    """
+    h = hashlib.sha256(data)
+    tag_table = {k: sorted(v) for k, v in exclude_tags.items()}
+    h.update(json.dumps(tag_table, sort_keys=True).encode("utf-8"))
+    h.update(json.dumps(sorted(strip_outputs)).encode("utf-8"))
+    h.update(_package_version().encode("utf-8"))
+    return h.hexdigest()
+
+
 # Which tags to exclude for which generated file
 exclude_tags = {
     Ext.TEST.value: {Tags.EX.value, Tags.NOAUTO.value},
@@ -72,6 +245,23 @@ exclude_tags = {
     Ext.USER.value: {Tags.TEST.value, Tags.AUTO.value},  # same as _solution
 }
 
+# Which generated files have code cell outputs removed, unless overridden by
+# the notebook metadata. Outputs in test notebooks are replaced when they run.
+strip_outputs = {Ext.TEST.value}
+
+# Generated files shown in the notebook browser
+browse_names = {Ext.USER.value, Ext.EX.value, Ext.SOL.value}
+
+# Bit for each type of generated file, used in per-cell masks of the files
+# that keep that cell
+ext_bits = {e.value: 1 << i for i, e in enumerate(Ext)}
+all_ext_bits = (1 << len(Ext)) - 1
+# Bits for generated files that exclude cells with a given tag
+tag_exclude_bits = {
+    tag: sum(ext_bits[name] for name, tags in exclude_tags.items() if tag in tags)
+    for tag in set().union(*exclude_tags.values())
+}
+
 # notebook filenames, e.g. in markdown links
 # NOTE: assume no spaces in filenames
 nb_file_pat = re.compile(f"([a-zA-Z0-9_\\-:.+]+){src_suffix}\\.ipynb")
@@ -80,7 +270,18 @@ nb_file_subs = {e.value: f"\\1_{e.value}.ipynb" for e in Ext if e != Ext.DOC}
 nb_file_subs[Ext.DOC.value] = f"\\1_{Ext.DOC.value}.md"
 
 
-def _preprocess(nb_path: Path, **kwargs):
+def _preprocess(nb_path: Path, entry: Dict = None, **kwargs) -> Optional[float]:
+    """Generate the derived notebooks for one source notebook.
+
+    Args:
+        nb_path: Path to source notebook
+        entry: Manifest entry for this notebook, updated in place. If the stored
+               hash matches the current inputs and all the outputs exist,
+               nothing is generated.
+
+    Returns:
+        Time taken, in seconds, or None if the notebook was not changed
+    """
     _log.info(f"Preprocess: {nb_path}")
 
     def ext_path(p: Path, ext: Ext = None, name: str = None) -> Path:
@@ -92,44 +293,49 @@ def _preprocess(nb_path: Path, **kwargs):
 
     t0 = time.time()
 
-    # Check whether source was changed after any of the derived notebooks
-    src_mtime, changed = nb_path.stat().st_mtime, False
-    for ext in Ext:
-        p_ext = ext_path(nb_path, ext=ext)
-        if not p_ext.exists() or p_ext.stat().st_mtime <= src_mtime:
-            changed = True
-            break
-    if not changed:
+    if entry is None:
+        entry = {}
+
+    # Check whether inputs changed since the derived notebooks were generated
+    data = nb_path.read_bytes()
+    src_hash = _source_hash(data)
+    if entry.get("hash") == src_hash and all(
+        ext_path(nb_path, name=name).exists() for name in entry.get("outputs", [])
+    ):
         _log.info(f"Skip preprocessing notebook {nb_path} (source unchanged)")
-        return
+        return None
 
-    # Load input file
-    with nb_path.open("r", encoding="utf-8") as nb_file:
-        nb = json.load(nb_file)
+    # Parse input file
+    nb = json.loads(data.decode("utf-8"))
+    del data
 
-    # Get cells to exclude, also ones with notebook xrefs
+    # Classify each cell (once) by the generated files that keep it,
+    # and rewrite notebook xrefs for each of those files.
     had_tag = set()  # if tag occurred at all
-    exclude_cells = {n: [] for n in exclude_tags}
-    xref_cells = {}  # {cell-index: [list of line indexes]}
+    keep_bits = []  # [cell-index] -> bitmask over ext_bits
+    xref_sources = {}  # {cell-index: {name: modified-source}}
     for cell_index, cell in enumerate(nb[NB_CELLS]):
         # Get tags for cell
-        cell_tags = set(cell["metadata"].get("tags", []))
-        for c in cell_tags:
+        exclude = 0
+        for c in cell["metadata"].get("tags", []):
+            exclude |= tag_exclude_bits.get(c, 0)
             try:
                 had_tag.add(Tags(c))
             except ValueError:  # not in Tags enum
                 pass
-        # Potentially add to lists of excluded cells
-        for name, ex_tags in exclude_tags.items():
-            if cell_tags & ex_tags:
-                # add in reverse order to make delete easier
-                exclude_cells[name].insert(0, cell_index)
-        # Look for (and save) lines with cross references
-        xref_lines = [
-            i for i, line in enumerate(cell["source"]) if nb_file_pat.search(line)
-        ]
+        keep = all_ext_bits & ~exclude
+        keep_bits.append(keep)
+        # Look for lines with cross references
+        cs = cell["source"]  # alias
+        xref_lines = [i for i, line in enumerate(cs) if nb_file_pat.search(line)]
         if xref_lines:
-            xref_cells[cell_index] = xref_lines
+            sources = {}
+            for name, bit in ext_bits.items():
+                if keep & bit:
+                    sources[name] = cs.copy()
+                    for i in xref_lines:
+                        sources[name][i] = nb_file_pat.sub(nb_file_subs[name], cs[i])
+            xref_sources[cell_index] = sources
 
     # Write output files
 
@@ -139,38 +345,82 @@ def _preprocess(nb_path: Path, **kwargs):
         nb_names.extend([Ext.EX.value, Ext.SOL.value])
 
     # allow notebook metadata to skip certain outputs (e.g. 'test')
+    # and to choose which outputs have cell outputs stripped
+    strip_names = strip_outputs
     if NB_IDAES in nb[NB_META]:
         for skip_ext in nb[NB_META][NB_IDAES].get(NB_SKIP, []):
             nb_names.remove(skip_ext)
             _log.info(f"Skipping '{skip_ext}' for notebook '{nb_path}'")
+        strip_names = set(nb[NB_META][NB_IDAES].get(NB_STRIP, strip_names))
 
+    descriptions = {}  # for the notebook browser
     for name in nb_names:
-        nb_copy = nb.copy()
-        nb_copy[NB_CELLS] = nb[NB_CELLS].copy()
-        # Fix (any) cross-references to use current file extension ('name')
-        saved_source = []  # save (index, orig-source) for all changed cells
-        for cell_index, cell in enumerate(nb_copy[NB_CELLS]):
-            if cell_index not in xref_cells or cell_index in exclude_cells[name]:
-                continue
-            cs = cell["source"]  # alias
-            saved_source.append((cell_index, cs.copy()))  # save orig
-            for line_index in xref_cells[cell_index]:
-                subst = nb_file_pat.sub(nb_file_subs[name], cs[line_index])
-                cs[line_index] = subst
-        # Delete excluded cells
-        for index in exclude_cells[name]:
-            del nb_copy[NB_CELLS][index]  # indexes are in reverse order
+        bit = ext_bits[name]
+        # Kept cells, with cross-references using current file extension ('name')
+        cells = [
+            cell if i not in xref_sources else dict(cell, source=xref_sources[i][name])
+            for i, cell in enumerate(nb[NB_CELLS])
+            if keep_bits[i] & bit
+        ]
+        if name in browse_names:
+            descriptions[name] = browse.describe_notebook(cells)
+        if name in strip_names:
+            _log.debug(f"Strip cell outputs from '{name}' file")
+            cells = map(_strip_cell_outputs, cells)
         # Generate output file
         nbcopy_path = ext_path(nb_path, name=name)
         _log.debug(f"Generate '{name}' file: {nbcopy_path}")
-        with nbcopy_path.open("w") as nbcopy_file:
-            json.dump(nb_copy, nbcopy_file)
-        # Restore modified sources
-        for i, s in saved_source:
-            nb[NB_CELLS][i]["source"] = s
+        _write_notebook(nbcopy_path, nb, cells)
 
+    entry.update({"hash": src_hash, "outputs": nb_names, "descriptions": descriptions})
     dur = time.time() - t0
     _log.info(f"Prepocessed notebook {nb_path} in {dur:.2f} seconds")
+    return dur
+
+
+def _strip_cell_outputs(cell: Dict) -> Dict:
+    """Return a copy of a code cell without outputs, or any other cell as-is."""
+    if cell["cell_type"] != "code":
+        return cell
+    return dict(cell, outputs=[], execution_count=None)
+
+
+def _write_notebook(path: Path, nb: Dict, cells):
+    """Write a notebook, one cell at a time, replacing `path` atomically.
+
+    The output is the same as `json.dump()` of `nb` with its cells replaced by
+    `cells`, but only one cell is serialized in memory at a time.
+
+    Args:
+        path: Output path
+        nb: Notebook whose top-level keys (other than the cells) are written
+        cells (Iterable[Dict]): Cells to write
+    """
+    # unique temporary file, as parallel test workers may preprocess at once
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp_path.open("w") as f:
+            f.write("{")
+            for key_index, (key, value) in enumerate(nb.items()):
+                if key_index > 0:
+                    f.write(", ")
+                f.write(json.dumps(key))
+                f.write(": ")
+                if key == NB_CELLS:
+                    f.write("[")
+                    for cell_index, cell in enumerate(cells):
+                        if cell_index > 0:
+                            f.write(", ")
+                        f.write(json.dumps(cell))
+                    f.write("]")
+                else:
+                    f.write(json.dumps(value))
+            f.write("}")
+        tmp_path.replace(path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
 
 
 # -------------
@@ -180,8 +430,12 @@ def _preprocess(nb_path: Path, **kwargs):
 
 def clean(srcdir=None):
     src_path = allow_repo_root(Path(srcdir), main) / NB_ROOT
-    toc = read_toc(src_path)
-    find_notebooks(src_path, toc, _clean)
+    for nb_path in notebook_index(src_path).paths:
+        _clean(nb_path)
+    manifest_path = src_path / MANIFEST_FILE
+    if manifest_path.exists():
+        _log.debug(f"Remove preprocessing manifest '{manifest_path}'")
+        manifest_path.unlink()
 
 
 def _clean(nb_path: Path, **kwargs):
@@ -202,9 +456,7 @@ def _clean(nb_path: Path, **kwargs):
 
 def skipped(srcdir=None):
     src_path = allow_repo_root(Path(srcdir), main) / NB_ROOT
-    toc = read_toc(src_path)
-    smap = {}
-    find_notebooks(src_path, toc, _skipped, smap=smap)
+    smap = {info.path: info.skip for info in notebook_index(src_path) if info.skip}
 
     # print results in 'smap'
     # - get column-width for tags
@@ -218,16 +470,6 @@ def skipped(srcdir=None):
         file_str = str(k)
         print(f"{tag_str} | {file_str}")
 
-
-def _skipped(nb_path: Path, smap=None, **kwargs):
-    """Print which notebooks have something skipped"""
-    with open(nb_path, mode="r", encoding="utf-8") as fp:
-        nb = json.load(fp)
-    if NB_IDAES in nb[NB_META]:
-        skipped = nb[NB_META].get(NB_IDAES, {}).get(NB_SKIP, [])
-        if skipped:
-            smap[nb_path] = sorted(skipped)
-
 # -------------
 # Black
 # -------------
@@ -244,12 +486,25 @@ def black(srcdir=None):
 # --------------------
 
 
-def jupyterbook(srcdir=None, quiet=0):
+def jupyterbook(srcdir=None, quiet=0, cache=False, warm_kernels=0, jobs=1):
+    """Build the documentation with Jupyterbook.
+
+    Args:
+        srcdir: Source directory
+        quiet: Quietness level passed to Jupyterbook (0 to 2)
+        cache: If True, first fill in the documentation notebooks from the
+               execution cache, executing the ones that are out of date
+               (see :func:`_execute_docs`)
+        warm_kernels: See :func:`_execute_docs`
+        jobs: See :func:`_execute_docs`
+    """
     # build commandline with path arg
     path = allow_repo_root(Path(srcdir), main)
     path /= NB_ROOT
     if not path.is_dir():
         raise FileNotFoundError(f"Could not find directory: {path}")
+    if cache:
+        _execute_docs(path, warm_kernels=warm_kernels, jobs=jobs)
     commandline = ["jupyter-book", "build", str(path)]
     if quiet > 0:
         quiet = min(quiet, 2)
@@ -260,6 +515,101 @@ def jupyterbook(srcdir=None, quiet=0):
     check_call(commandline)
 
 
+def _execute_docs(src_path: Path, warm_kernels: int = 0, jobs: int = 1):
+    """Put outputs in the documentation notebooks, from the execution cache or
+    by executing them, so Jupyterbook does not need to execute them.
+
+    Notebooks that fail to execute are left as they are.
+
+    Args:
+        src_path: Notebook source directory
+        warm_kernels: If more than zero, the size of the pool of warm kernels
+                      to run the notebooks in (see :class:`execute.KernelPool`),
+                      in each worker process
+        jobs: Number of worker processes. If 1, run serially in this process.
+              If 0 or less, use one worker per CPU.
+    """
+    src_path = notebook_index(src_path).root
+    doc_paths = [
+        info.ext_path(Ext.DOC)
+        for info in notebook_index(src_path)
+        if Ext.DOC.value not in info.skip
+    ]
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+    t0 = time.time()
+    if jobs == 1:
+        cache = execute.ExecutionCache(src_path)
+        pool = execute.KernelPool(warm_kernels) if warm_kernels > 0 else None
+        try:
+            results = [_execute_doc(p, cache, pool) for p in doc_paths]
+        finally:
+            if pool is not None:
+                pool.close()
+    else:
+        _log.info(f"Execute {len(doc_paths)} notebooks with {jobs} processes")
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_execute_doc_init,
+            initargs=(src_path, warm_kernels),
+        ) as workers:
+            results = list(workers.map(_execute_doc_job, doc_paths))
+    n_run, n_failed = 0, 0
+    for path, (ran, error) in zip(doc_paths, results):
+        if error is not None:
+            _log.error(f"Could not execute notebook '{path}': {error}")
+            n_failed += 1
+        elif ran:
+            n_run += 1
+    _log.info(
+        f"Executed {n_run} of {len(doc_paths)} notebooks in "
+        f"{time.time() - t0:.1f} seconds (failed={n_failed})"
+    )
+
+
+def _execute_doc(
+    path: Path, cache: "execute.ExecutionCache", pool: "execute.KernelPool" = None
+) -> Tuple[bool, Optional[str]]:
+    """Fill in the outputs of one documentation notebook, and save it.
+
+    Returns:
+        Whether the notebook was executed (not cached), and the error message
+        if it could not be executed
+    """
+    # dev dependency, imported here so the package works without it
+    import nbformat
+
+    stats = {}
+    try:
+        nb = execute.execute_notebook(path, stats=stats, cache=cache, kernel_pool=pool)
+    except Exception as err:
+        return False, str(err)
+    text = nbformat.writes(nb)
+    if path.read_text(encoding="utf-8") != text:
+        path.write_text(text, encoding="utf-8")
+    return not stats.get("cached", False), None
+
+
+_doc_worker = {}  # execution cache and kernel pool of a worker process
+
+
+def _execute_doc_init(src_path: Path, warm_kernels: int):
+    """Worker process initializer for :func:`_execute_doc_job`."""
+    _doc_worker["cache"] = execute.ExecutionCache(src_path)
+    if warm_kernels > 0:
+        # shut down the kernels when the worker process exits
+        from multiprocessing.util import Finalize
+
+        pool = execute.KernelPool(warm_kernels)
+        Finalize(pool, pool.close, exitpriority=10)
+        _doc_worker["pool"] = pool
+
+
+def _execute_doc_job(path: Path) -> Tuple[bool, Optional[str]]:
+    """Worker process entry point for :func:`_execute_doc`."""
+    return _execute_doc(path, _doc_worker["cache"], _doc_worker.get("pool", None))
+
+
 # -------------
 #    View
 # -------------
@@ -285,7 +635,9 @@ class Commands:
     @classmethod
     def pre(cls, args):
         cls.heading("Pre-process notebooks")
-        return cls._run("pre-process notebooks", preprocess, srcdir=args.dir)
+        return cls._run(
+            "pre-process notebooks", preprocess, srcdir=args.dir, jobs=args.jobs
+        )
 
     @classmethod
     def skipped(cls, args):
@@ -297,10 +649,13 @@ class Commands:
     def build(cls, args):
         if not args.no_pre:
             cls.heading("Pre-process notebooks")
-            cls._run("pre-process notebooks", preprocess, srcdir=args.dir)
+            cls._run(
+                "pre-process notebooks", preprocess, srcdir=args.dir, jobs=args.jobs
+            )
         cls.heading("Build Jupyterbook")
         return cls._run("build jupyterbook", jupyterbook, srcdir=args.dir,
-                        quiet=args.quiet)
+                        quiet=args.quiet, cache=args.execution_cache,
+                        warm_kernels=args.warm_kernels, jobs=args.jobs)
 
     @classmethod
     def view(cls, args):
@@ -317,18 +672,43 @@ class Commands:
         cls.heading("Format code in notebooks with Black")
         return cls._run("format notebook code", black, srcdir=args.dir)
 
+    @classmethod
+    def bench(cls, args):
+        cls.heading("Benchmark notebooks")
+        regressions = []
+        status = cls._run(
+            "benchmark",
+            bench.bench,
+            srcdir=args.dir,
+            targets=args.targets,
+            repeat=args.repeat,
+            baseline=args.baseline,
+            save=args.save,
+            tolerance=args.tolerance,
+            min_delta=args.min_delta,
+            regressions=regressions,
+        )
+        if status is None and regressions:
+            _log.error(f"{len(regressions)} benchmark(s) slower than baseline")
+            status = 1
+        return status
+
     @classmethod
     def gui(cls, args):
         browse._log.setLevel(_log.getEffectiveLevel())
         nb = browse.Notebooks()
         if args.console:
-            for val in nb._sorted_values:
-                pth = Path(val.path).relative_to(Path.cwd())
-                print(f"{val.type}{' '*(10 - len(val.type))} {val.title} -> {pth}")
+            try:
+                for val in nb._sorted_values:
+                    pth = Path(val.path).relative_to(Path.cwd())
+                    pad = " " * (10 - len(val.type))
+                    print(f"{val.type}{pad} {val.title} -> {pth}")
+            finally:
+                nb.save_cache()
             status = 0
         else:
             _log.info(f"Run GUI start")
-            status = browse.gui(nb)
+            status = browse.gui(nb, shared_server=not args.separate_servers)
             _log.info(f"Run GUI end")
         return status
 
@@ -357,6 +737,13 @@ class Commands:
         print(f"   {message}")
 
 
+def _positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+
 def main():
     p = argparse.ArgumentParser()
     add_vb(p)
@@ -371,19 +758,45 @@ def main():
         ("clean", "Remove generated files"),
         ("black", "Format code in notebooks with Black"),
         ("gui", "Graphical notebook browser"),
-        ("skipped", "List notebooks tagged to skip some pre-processing")
+        ("skipped", "List notebooks tagged to skip some pre-processing"),
+        ("bench", "Benchmark notebooks and compare with a baseline"),
     ):
         subp[name] = commands.add_parser(name, help=desc)
         subp[name].add_argument(
             "-d", "--dir", help="Source directory (default=<current>)", default="."
         )
         add_vb(subp[name], dest=f"vb_{name}")
+    for name in "pre", "build":
+        subp[name].add_argument(
+            "--jobs",
+            "-j",
+            type=int,
+            default=1,
+            metavar="N",
+            help="Pre-process (and, for build with --execution-cache, execute) "
+            "notebooks with N worker processes (default=1, 0 means one per CPU)",
+        )
     subp["build"].add_argument(
         "--no-pre",
         action="store_true",
         help="skip pre-processing",
         default=False,
     )
+    subp["build"].add_argument(
+        "--execution-cache",
+        action="store_true",
+        help="execute notebooks before Jupyterbook, reusing outputs from the "
+        "execution cache; by default Jupyterbook executes them",
+        default=False,
+    )
+    subp["build"].add_argument(
+        "--warm-kernels",
+        type=int,
+        default=0,
+        metavar="N",
+        help="with --execution-cache, execute notebooks in kernels from a pool of "
+        "N kernels with IDAES already imported (default=0, no pool)",
+    )
     subp["build"].add_argument(
         "--quiet",
         "-q",
@@ -392,6 +805,57 @@ def main():
         default=0,
     )
     subp["gui"].add_argument("--console", action="store_true", dest="console")
+    subp["gui"].add_argument(
+        "--separate-servers",
+        action="store_true",
+        help="Start a new Jupyter server for each opened notebook",
+        default=False,
+    )
+    subp["bench"].add_argument(
+        "targets",
+        nargs="*",
+        metavar="TARGET",
+        help="Notebook key (e.g. 'flowsheets/methanol_synthesis') to run its test "
+        "notebook, or module and function (e.g. "
+        "'flowsheets/methanol_flowsheet.py:main') to call it. "
+        "Default is all the targets in the baseline.",
+    )
+    subp["bench"].add_argument(
+        "--repeat",
+        "-n",
+        type=_positive_int,
+        default=bench.DEFAULT_REPEAT,
+        metavar="N",
+        help=f"Run each target N times (default={bench.DEFAULT_REPEAT})",
+    )
+    subp["bench"].add_argument(
+        "--baseline",
+        metavar="FILE",
+        help=f"Baseline file (default=<notebooks>/{bench.BASELINE_FILE})",
+        default=None,
+    )
+    subp["bench"].add_argument(
+        "--save",
+        action="store_true",
+        help="Save results as the baseline, instead of comparing with it",
+        default=False,
+    )
+    subp["bench"].add_argument(
+        "--tolerance",
+        type=float,
+        default=bench.DEFAULT_TOLERANCE,
+        metavar="FRAC",
+        help="Allowed increase in median time, as a fraction of the baseline "
+        f"(default={bench.DEFAULT_TOLERANCE})",
+    )
+    subp["bench"].add_argument(
+        "--min-delta",
+        type=float,
+        default=bench.DEFAULT_MIN_DELTA,
+        metavar="SEC",
+        help="Ignore increases in median time smaller than this "
+        f"(default={bench.DEFAULT_MIN_DELTA})",
+    )
     args = p.parse_args()
     subvb = getattr(args, f"vb_{args.command}")
     if subvb != args.vb:
@@ -0,0 +1,314 @@
+#################################################################################
+# The Institute for the Design of Advanced Energy Systems Integrated Platform
+# Framework (IDAES IP) was produced under the DOE Institute for the
+# Design of Advanced Energy Systems (IDAES), and is copyright (c) 2018-2022
+# by the software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia University
+# Research Corporation, et al.  All rights reserved.
+#
+# Please see the files COPYRIGHT.md and LICENSE.md for full copyright and
+# license information.
+#################################################################################
+"""
+Binary snapshots of a model's initial state, kept beside the `*_init.json.gz`
+files written by `idaes.core.util.to_json`.
+
+A snapshot is an uncompressed NumPy `.npz` file with the value, fixed flag and
+bounds of every variable, the value of every mutable parameter and the active
+flag of every block, constraint and objective, in component traversal order,
+plus the names of those components (relative to the saved block).
+The snapshot also has a layout: the name of each indexed component, its
+number of data objects and a hash of their index keys. When the layout matches the block being loaded, which
+is the usual case, the state is copied by position; only if it does not match
+are the data objects matched by name.
+Suffixes, such as scaling factors, are only saved when asked for, and are
+then found by name when loaded, since they usually have far fewer entries.
+
+The JSON file stays the reference copy: :func:`load_initial` converts it to a
+snapshot the first time it is loaded, and again whenever it is newer than the
+snapshot.
+"""
+# stdlib
+import hashlib
+import logging
+import os
+
+# third-party
+import numpy as np
+import pyomo.environ as pyo
+import idaes.core.util as iutil
+
+_log = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 2  # increment when the layout of the arrays changes
+_JSON_SUFFIXES = (".json.gz", ".json")
+
+
+def snapshot_file(fname: str) -> str:
+    """Name of the snapshot beside a JSON file, e.g. 'hrsg_init.json.gz' ->
+    'hrsg_init.npz'.
+    """
+    for suffix in _JSON_SUFFIXES:
+        if fname.endswith(suffix):
+            return fname[: -len(suffix)] + ".npz"
+    return fname + ".npz"
+
+
+def _vars(block):
+    return list(block.component_data_objects(pyo.Var, descend_into=True))
+
+
+def _params(block):
+    return [
+        p
+        for p in block.component_data_objects(pyo.Param, descend_into=True)
+        if p.parent_component().mutable
+    ]
+
+
+def _actives(block):
+    return list(
+        block.component_data_objects(
+            (pyo.Block, pyo.Constraint, pyo.Objective), descend_into=True
+        )
+    )
+
+
+def _names(components, block):
+    return [c.getname(fully_qualified=True, relative_to=block) for c in components]
+
+
+# Names are stored as one newline-separated UTF-8 buffer, which is much smaller
+# than a fixed-width unicode array and is read back in a single decode.
+def _encode_names(names):
+    return np.frombuffer("\n".join(names).encode("utf-8"), dtype=np.uint8)
+
+
+def _decode_names(arr, count):
+    if count == 0:
+        return []
+    return arr.tobytes().decode("utf-8").split("\n")
+
+
+def _floats(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _signature(keys):
+    """64-bit hash of a list of index keys."""
+    digest = hashlib.blake2b(repr(keys).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def _layout(components, block):
+    """Names of the parent components, in order, their number of data, and
+    the signature of the index keys of their data.
+    """
+    parents, counts, keys = [], [], []
+    last = None
+    for c in components:
+        parent = c.parent_component()
+        if parent is not last:
+            parents.append(parent)
+            counts.append(0)
+            keys.append([])
+            last = parent
+        counts[-1] += 1
+        keys[-1].append(c.index())
+    return _names(parents, block), counts, [_signature(k) for k in keys]
+
+
+def _positions(components, block, arrays, prefix):
+    """Pairs of component and its position in the snapshot."""
+    names, counts, signatures = _layout(components, block)
+    stored_counts = arrays[f"{prefix}_layout_counts"].tolist()
+    if (
+        counts == stored_counts
+        and signatures == arrays[f"{prefix}_layout_keys"].tolist()
+        and names == _decode_names(arrays[f"{prefix}_layout"], len(stored_counts))
+    ):
+        return zip(components, range(len(components)))
+    stored_names = _decode_names(arrays[f"{prefix}_names"], sum(stored_counts))
+    names = _names(components, block)
+    index = {name: i for i, name in enumerate(stored_names)}
+    pairs = [(c, index[n]) for c, n in zip(components, names) if n in index]
+    if len(pairs) < len(components):
+        _log.warning(
+            f"Snapshot has no state for {len(components) - len(pairs)} of "
+            f"{len(components)} components of {block.name}"
+        )
+    return pairs
+
+
+def _suffix_entries(block):
+    """Names of suffixes and their components, and values, for all entries."""
+    suffixes, components, values = [], [], []
+    for suffix in block.component_data_objects(pyo.Suffix, descend_into=True):
+        name = suffix.getname(fully_qualified=True, relative_to=block)
+        for c, val in suffix.items():
+            try:
+                values.append(float(val))
+            except (TypeError, ValueError):
+                continue  # only numeric suffixes are saved
+            suffixes.append(name)
+            components.append(c.getname(fully_qualified=True, relative_to=block))
+    return suffixes, components, values
+
+
+def _load_suffixes(block, arrays):
+    values = arrays["suffix_value"].tolist()
+    suffixes = _decode_names(arrays["suffix_names"], len(values))
+    components = _decode_names(arrays["suffix_components"], len(values))
+    found = {}
+    missing = 0
+    for name, cname, val in zip(suffixes, components, values):
+        if name not in found:
+            found[name] = block.find_component(name)
+        c = block.find_component(cname)
+        if found[name] is None or c is None:
+            missing += 1
+        else:
+            found[name][c] = val
+    if missing:
+        _log.warning(f"Snapshot has {missing} suffix entries not in {block.name}")
+
+
+def save_snapshot(block, fname: str, suffix: bool = False):
+    """Save the state of a block to a snapshot file.
+
+    Args:
+        block: Pyomo block (or model)
+        fname: Snapshot file name, usually from :func:`snapshot_file`
+        suffix: If True, also save the values of suffixes
+
+    Returns:
+        None
+    """
+    variables, params, actives = _vars(block), _params(block), _actives(block)
+    arrays = {
+        "format": np.array(SNAPSHOT_FORMAT),
+        "var_value": _floats([v.value for v in variables]),
+        "var_fixed": np.array([v.fixed for v in variables], dtype=bool),
+        "var_lb": _floats([v.lb for v in variables]),
+        "var_ub": _floats([v.ub for v in variables]),
+        "param_value": _floats([pyo.value(p, exception=False) for p in params]),
+        "active": np.array([c.active for c in actives], dtype=bool),
+    }
+    for prefix, components in (
+        ("var", variables),
+        ("param", params),
+        ("active", actives),
+    ):
+        names, counts, signatures = _layout(components, block)
+        arrays[f"{prefix}_layout"] = _encode_names(names)
+        arrays[f"{prefix}_layout_counts"] = np.array(counts, dtype=np.int64)
+        arrays[f"{prefix}_layout_keys"] = np.array(signatures, dtype=np.int64)
+        arrays[f"{prefix}_names"] = _encode_names(_names(components, block))
+    if suffix:
+        suffixes, components, values = _suffix_entries(block)
+        arrays["suffix_names"] = _encode_names(suffixes)
+        arrays["suffix_components"] = _encode_names(components)
+        arrays["suffix_value"] = np.array(values, dtype=float)
+    # write to a temporary file first, so a partial snapshot is never loaded
+    tmp = f"{fname}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, fname)
+
+
+def load_snapshot(block, fname: str):
+    """Load the state of a block from a snapshot file.
+
+    Components that are not in the snapshot are left unchanged, as are
+    suffixes if the snapshot was saved without them.
+
+    Args:
+        block: Pyomo block (or model)
+        fname: Snapshot file name
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If the snapshot format is not known
+    """
+    with np.load(fname) as data:
+        if int(data["format"]) != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unknown snapshot format in '{fname}'")
+        arrays = {k: data[k] for k in data.files}
+
+    # variables: convert to Python lists once, then copy by position
+    value, lb, ub = (
+        [None if np.isnan(x) else x for x in arrays[k].tolist()]
+        for k in ("var_value", "var_lb", "var_ub")
+    )
+    fixed = arrays["var_fixed"].tolist()
+    for v, i in _positions(_vars(block), block, arrays, "var"):
+        v.set_value(value[i], skip_validation=True)
+        v.setlb(lb[i])
+        v.setub(ub[i])
+        v.fixed = fixed[i]
+
+    value = arrays["param_value"].tolist()
+    for p, i in _positions(_params(block), block, arrays, "param"):
+        if not np.isnan(value[i]):
+            p.set_value(value[i])
+
+    active = arrays["active"].tolist()
+    for c, i in _positions(_actives(block), block, arrays, "active"):
+        if c.active != active[i]:
+            c.activate() if active[i] else c.deactivate()
+
+    if "suffix_value" in arrays:
+        _load_suffixes(block, arrays)
+
+
+def load_initial(block, fname: str, suffix: bool = False):
+    """Load the initial state of a block saved by :func:`save_initial`.
+
+    The snapshot beside the JSON file is used if it is at least as new as the
+    JSON file, and has the current format. Otherwise the JSON file is loaded,
+    and then converted to a snapshot for next time.
+
+    Args:
+        block: Pyomo block (or model)
+        fname: JSON file name, e.g. 'hrsg_init.json.gz'
+        suffix: If True, also load suffixes, such as scaling factors
+
+    Returns:
+        None
+    """
+    snap = snapshot_file(fname)
+    if os.path.exists(snap) and (
+        not os.path.exists(fname) or os.path.getmtime(snap) >= os.path.getmtime(fname)
+    ):
+        with np.load(snap) as data:
+            usable = int(data["format"]) == SNAPSHOT_FORMAT and (
+                "suffix_value" in data.files or not suffix
+            )
+        if usable:
+            load_snapshot(block, snap)
+            return
+    wts = None if suffix else iutil.StoreSpec(suffix=False)
+    iutil.from_json(block, fname=fname, wts=wts)
+    try:
+        save_snapshot(block, snap, suffix=suffix)
+    except OSError as err:  # e.g. a read-only install; just load JSON next time
+        _log.warning(f"Could not save snapshot '{snap}': {err}")
+
+
+def save_initial(block, fname: str, suffix: bool = False):
+    """Save the initial state of a block as a JSON file and a snapshot.
+
+    Args:
+        block: Pyomo block (or model)
+        fname: JSON file name, e.g. 'hrsg_init.json.gz'
+        suffix: If True, also save suffixes in the snapshot (the JSON file
+                always has them)
+
+    Returns:
+        None
+    """
+    iutil.to_json(block, fname=fname)
+    save_snapshot(block, snapshot_file(fname), suffix=suffix)
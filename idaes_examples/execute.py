@@ -0,0 +1,647 @@
+"""
+Execute generated notebooks, e.g. from tests.
+"""
+# stdlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import hashlib
+from importlib import metadata
+import json
+import logging
+import os
+from pathlib import Path
+import statistics
+import time
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# package
+from idaes_examples.util import (
+    NB_META,
+    NB_IDAES,
+    NB_TIMEOUT,
+    Ext,
+    NotebookIndex,
+)
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 1200  # seconds allowed for each cell, unless set in metadata
+HISTORY_FILE = ".execution-history.jsonl"  # execution records, in notebook root
+HISTORY_KEEP = 10  # number of records kept for each notebook
+HISTORY_ESTIMATE = 5  # number of recent successful runs used for estimates
+CACHE_DIR = ".execution-cache"  # outputs of executed notebooks, in notebook root
+GENERATED_FILE = "generated.json"  # data files written by notebooks, in CACHE_DIR
+# Files in a notebook's directory that, if changed, may change its outputs
+DATA_PATTERNS = ("*.json.gz", "*.csv", "*.py")
+
+# Modules imported in warm kernels (see KernelPool). Missing ones are ignored.
+WARM_MODULES = (
+    "numpy",
+    "pyomo.environ",
+    "idaes",
+    "idaes.core",
+    "idaes.core.util.model_statistics",
+    "idaes.models.unit_models",
+    "idaes.models.properties",
+    "idaes.models.properties.modular_properties",
+)
+WARM_TIMEOUT = 300  # seconds allowed to start a kernel and import WARM_MODULES
+
+# Code run in the kernel after the notebook, to report resource usage.
+# Solver time is the CPU time of (finished) child processes, which is where
+# external solvers such as IPOPT run.
+_USAGE_SOURCE = """\
+import json as _json, sys as _sys
+try:
+    import resource as _resource
+    _self = _resource.getrusage(_resource.RUSAGE_SELF)
+    _kids = _resource.getrusage(_resource.RUSAGE_CHILDREN)
+    print(_json.dumps({
+        "maxrss": _self.ru_maxrss * (1 if _sys.platform == "darwin" else 1024),
+        "solver": _kids.ru_utime + _kids.ru_stime,
+    }))
+except ImportError:
+    print("{}")
+"""
+
+
+def testable_notebooks(index: NotebookIndex) -> List[Tuple[str, Path]]:
+    """Get all notebooks that have a generated 'test' notebook.
+
+    Args:
+        index: Notebook index
+
+    Returns:
+        List of (notebook key, path to test notebook), in TOC order
+    """
+    return [
+        (info.key, info.ext_path(Ext.TEST))
+        for info in index
+        if Ext.TEST.value not in info.skip
+    ]
+
+
+def notebook_timeout(nb: Dict, default: int = DEFAULT_TIMEOUT) -> int:
+    """Get the cell execution timeout for a notebook.
+
+    This is taken from the notebook-level metadata, e.g.
+    ``"idaes": {"timeout": 1800}``, or else `default`.
+    """
+    return int(nb.get(NB_META, {}).get(NB_IDAES, {}).get(NB_TIMEOUT, default))
+
+
+def execute_notebook(
+    path: Path,
+    timeout: int = None,
+    kernel_name: str = None,
+    stats: Dict = None,
+    cache: "ExecutionCache" = None,
+    kernel_pool: "KernelPool" = None,
+):
+    """Run all cells in a notebook, in its own directory.
+
+    Args:
+        path: Path to notebook
+        timeout: Seconds allowed for each cell. If not given, use the
+                 value from the notebook metadata (see :func:`notebook_timeout`).
+        kernel_name: Jupyter kernel to use. If not given, use the notebook's.
+        stats: If given, filled in with the total wall time ("wall"), wall time
+               of each cell ("cells"), the kernel's peak RSS in bytes ("maxrss")
+               and the CPU time of solvers and other child processes ("solver").
+               Values that could not be measured are None. If the outputs
+               came from the cache, only "cached" is set (to True).
+        cache: If given, reuse the cached outputs instead of running the
+               notebook, if they are current; otherwise cache the outputs
+               of a successful run.
+        kernel_pool: If given, run the notebook in a warm kernel from this pool,
+                     instead of starting a new kernel. The pool's kernel name
+                     is used instead of `kernel_name`.
+
+    Returns:
+        The executed notebook (as an nbformat.NotebookNode)
+
+    Raises:
+        nbclient.exceptions.CellExecutionError: If a cell raised an error
+        nbclient.exceptions.CellTimeoutError: If a cell did not finish in time
+    """
+    # dev dependencies, imported here so the package works without them
+    import nbformat
+    from nbclient import NotebookClient
+
+    nb = nbformat.read(str(path), as_version=4)
+    if kernel_pool is not None:
+        kernel_name = kernel_pool.kernel_name
+    if cache is not None:
+        key = cache.key(nb, path, kernel_name=kernel_name)
+        if cache.get(nb, path, key):
+            _log.info(f"Using cached outputs for notebook '{path}'")
+            if stats is not None:
+                stats["cached"] = True
+            return nb
+        before = cache.data_stamps(path)
+    if timeout is None:
+        timeout = notebook_timeout(nb)
+    if stats is not None:
+        nb.cells.append(nbformat.v4.new_code_cell(_USAGE_SOURCE))
+    kwargs = {} if kernel_name is None else {"kernel_name": kernel_name}
+    km = None if kernel_pool is None else kernel_pool.get(path.parent)
+    client = NotebookClient(
+        nb,
+        km=km,
+        timeout=timeout,
+        resources={"metadata": {"path": str(path.parent)}},
+        **kwargs,
+    )
+    _log.info(f"(start) execute notebook '{path}' timeout={timeout}s")
+    t0 = time.time()
+    try:
+        client.execute()
+    finally:
+        if km is not None and km.is_alive():
+            km.shutdown_kernel(now=True)
+        if stats is not None:
+            stats["wall"] = time.time() - t0
+            stats.update(_usage(nb.cells.pop()))
+            stats["cells"] = [_cell_time(c) for c in nb.cells if c.cell_type == "code"]
+    _log.info(f"(end) execute notebook '{path}'")
+    if cache is not None:
+        cache.add_generated(path, before)
+        # key without the data files that the notebook just wrote
+        cache.put(nb, path, cache.key(nb, path, kernel_name=kernel_name))
+    return nb
+
+
+def _usage(cell) -> Dict:
+    usage = {"maxrss": None, "solver": None}
+    for output in cell.get("outputs", []):
+        if output.get("name") == "stdout":
+            try:
+                usage.update(json.loads(output["text"]))
+            except ValueError:
+                pass
+    return usage
+
+
+def _cell_time(cell) -> Optional[float]:
+    """Wall time of a cell, from the timing metadata recorded by nbclient."""
+    timing = cell.get("metadata", {}).get("execution", {})
+    try:
+        start, end = (
+            datetime.fromisoformat(timing[k].rstrip("Z"))
+            for k in ("iopub.execute_input", "shell.execute_reply")
+        )
+    except (KeyError, ValueError):
+        return None
+    return (end - start).total_seconds()
+
+
+# -------------
+#  Warm kernels
+# -------------
+
+
+class KernelPool:
+    """Jupyter kernels started ahead of time, which have already imported
+    the slow-to-import modules that most notebooks use.
+
+    Each kernel is used for only one notebook, so notebooks are as isolated
+    as with a new kernel. Whenever a kernel is taken, a replacement is
+    started in the background.
+
+    Use as a context manager, or call :meth:`close` to shut down the kernels
+    that were not used.
+    """
+
+    def __init__(
+        self, size: int = 2, kernel_name: str = "python3", modules=WARM_MODULES
+    ):
+        """Start the kernels.
+
+        Args:
+            size: Number of warm kernels to keep ready
+            kernel_name: Jupyter kernel to start
+            modules: Names of modules to import in each kernel
+        """
+        self.kernel_name = kernel_name
+        self._warmup = "\n".join(
+            [
+                "import importlib as _il",
+                f"for _m in {list(modules)!r}:",
+                "    try:",
+                "        _il.import_module(_m)",
+                "    except Exception:",
+                "        pass",
+                "del _il, _m",
+            ]
+        )
+        self._workers = ThreadPoolExecutor(max_workers=size)
+        self._ready = deque(self._workers.submit(self._start) for _ in range(size))
+
+    def get(self, cwd: Path):
+        """Take a warm kernel, with its working directory changed to `cwd`.
+
+        Args:
+            cwd: Working directory, normally the notebook's directory
+
+        Returns:
+            Kernel manager (jupyter_client.KernelManager) of a running kernel.
+            The caller should shut down the kernel after use.
+        """
+        self._ready.append(self._workers.submit(self._start))
+        km = self._ready.popleft().result()
+        if not km.is_alive():
+            _log.warning("Warm kernel died, starting a new one")
+            km = self._start()
+        self._run(km, f"import os as _os; _os.chdir({str(cwd)!r}); del _os")
+        return km
+
+    def close(self):
+        """Shut down the kernels that were not used."""
+        self._workers.shutdown(wait=True)
+        while self._ready:
+            future = self._ready.popleft()
+            if future.exception() is None:
+                future.result().shutdown_kernel(now=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self):
+        # dev dependency, imported here so the package works without it
+        from jupyter_client import KernelManager
+
+        km = KernelManager(kernel_name=self.kernel_name)
+        km.start_kernel()
+        t0 = time.time()
+        self._run(km, self._warmup)
+        _log.debug(f"Warmed up kernel in {time.time() - t0:.1f} seconds")
+        return km
+
+    @staticmethod
+    def _run(km, source: str):
+        """Run code in the kernel, without adding to its history, so the
+        execution counts in the notebook start from 1 as usual.
+        """
+        kc = km.client()
+        kc.start_channels()
+        try:
+            kc.wait_for_ready(timeout=WARM_TIMEOUT)
+            kc.execute_interactive(
+                source, store_history=False, timeout=WARM_TIMEOUT, output_hook=_ignore
+            )
+        finally:
+            kc.stop_channels()
+
+
+def _ignore(msg):
+    pass
+
+
+# -----------------
+#  Execution cache
+# -----------------
+
+
+def package_versions() -> Dict[str, str]:
+    """Versions of Python and the packages that notebook results depend on."""
+    result = {"python": sys.version.split()[0]}
+    for pkg in "idaes-pse", "pyomo":
+        try:
+            result[pkg] = metadata.version(pkg)
+        except metadata.PackageNotFoundError:
+            result[pkg] = "unknown"
+    return result
+
+
+def data_files(nb_dir: Path) -> List[Path]:
+    """Find the files matching DATA_PATTERNS in a notebook's directory, and its
+    subdirectories except hidden ones or those starting with '_'.
+    """
+    found = set()
+    for pattern in DATA_PATTERNS:
+        for path in nb_dir.rglob(pattern):
+            if not any(p[0] in "._" for p in path.relative_to(nb_dir).parts[:-1]):
+                found.add(path)
+    return sorted(found)
+
+
+class ExecutionCache:
+    """Outputs of successfully executed notebooks.
+
+    A notebook's outputs are reused as long as its key (see :meth:`key`) is
+    the same. Each notebook has at most one entry, a JSON file with the same
+    relative path under CACHE_DIR in the notebook root, so entries for old
+    versions of a notebook do not accumulate.
+
+    Data files that notebooks write when they run, such as saved `*.json.gz`
+    initial states (which record the time they were saved), are listed in
+    GENERATED_FILE in CACHE_DIR, and left out of the keys.
+    """
+
+    def __init__(self, root: Path):
+        self._root = Path(root).resolve()
+        self._dir = self._root / CACHE_DIR
+        self._versions = None
+        self._file_hashes = {}  # (path, size, mtime) -> digest
+        self._generated = None  # paths of generated files, relative to root
+
+    def key(self, nb, path: Path, kernel_name: str = None) -> str:
+        """Compute the key for a notebook.
+
+        The key is a hash of the source of the code cells, the kernel,
+        the package versions (see :func:`package_versions`), and the names
+        and contents of the data files (see :func:`data_files`), except those
+        that notebooks generate.
+
+        Args:
+            nb: Notebook (nbformat.NotebookNode)
+            path: Path to notebook
+            kernel_name: Kernel to run notebook with, if not the notebook's own
+
+        Returns:
+            Key, as a hex string
+        """
+        h = hashlib.sha256()
+        for cell in nb.cells:
+            if cell.cell_type == "code":
+                h.update(cell.source.encode("utf-8"))
+                h.update(b"\0")
+        if kernel_name is None:
+            kernel_name = nb.metadata.get("kernelspec", {}).get("name", "")
+        h.update(kernel_name.encode("utf-8"))
+        if self._versions is None:
+            self._versions = package_versions()
+        h.update(json.dumps(self._versions, sort_keys=True).encode("utf-8"))
+        nb_dir = Path(path).parent
+        generated = self._read_generated()
+        for data_path in data_files(nb_dir):
+            if self._rel(data_path) in generated:
+                continue
+            h.update(data_path.relative_to(nb_dir).as_posix().encode("utf-8"))
+            h.update(self._file_hash(data_path))
+        return h.hexdigest()
+
+    def get(self, nb, path: Path, key: str) -> bool:
+        """Fill in a notebook's outputs from the cache.
+
+        Args:
+            nb: Notebook, modified in place
+            path: Path to notebook
+            key: Current key for notebook
+
+        Returns:
+            True if the outputs were found, False (and `nb` is unchanged) if not
+        """
+        entry_path = self._entry_path(path)
+        try:
+            with entry_path.open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return False
+        code_cells = [c for c in nb.cells if c.cell_type == "code"]
+        if entry.get("key") != key or len(entry["cells"]) != len(code_cells):
+            return False
+        for cell, cached in zip(code_cells, entry["cells"]):
+            cell.outputs = _as_nodes(cached["outputs"])
+            cell.execution_count = cached["execution_count"]
+        return True
+
+    def put(self, nb, path: Path, key: str):
+        """Store a notebook's outputs in the cache.
+
+        Args:
+            nb: Executed notebook
+            path: Path to notebook
+            key: Key for the notebook, computed after it was executed
+        """
+        entry = {
+            "key": key,
+            "time": time.time(),
+            "cells": [
+                {"outputs": c.outputs, "execution_count": c.execution_count}
+                for c in nb.cells
+                if c.cell_type == "code"
+            ],
+        }
+        entry_path = self._entry_path(path)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        # unique temporary file, as parallel test workers may share the cache
+        tmp_path = entry_path.with_name(f".{entry_path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        tmp_path.replace(entry_path)
+
+    def data_stamps(self, path: Path) -> Dict[Path, Tuple[int, int]]:
+        """Size and modification time of the data files for a notebook."""
+        stamps = {}
+        for data_path in data_files(Path(path).parent):
+            st = data_path.stat()
+            stamps[data_path] = (st.st_size, st.st_mtime_ns)
+        return stamps
+
+    def add_generated(self, path: Path, before: Dict[Path, Tuple[int, int]]):
+        """Record the data files for a notebook that were created or changed
+        since `before`, as generated by the notebook, so they are left out of
+        the keys of all notebooks.
+
+        Args:
+            path: Path to notebook, which has just been executed
+            before: Stamps of the data files before it was executed,
+                    from :meth:`data_stamps`
+        """
+        stamps = self.data_stamps(path)
+        changed = {self._rel(p) for p, st in stamps.items() if before.get(p) != st}
+        generated = self._read_generated()
+        if changed <= generated:
+            return
+        generated |= changed
+        self._dir.mkdir(parents=True, exist_ok=True)
+        gen_path = self._dir / GENERATED_FILE
+        tmp_path = gen_path.with_name(f".{gen_path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(sorted(generated), f, indent=1)
+        tmp_path.replace(gen_path)
+
+    def _read_generated(self) -> set:
+        # re-read every time, as parallel test workers may have added files
+        gen_path = self._dir / GENERATED_FILE
+        try:
+            with gen_path.open("r", encoding="utf-8") as f:
+                self._generated = set(json.load(f))
+        except (OSError, ValueError):
+            if self._generated is None:
+                self._generated = set()
+        return self._generated
+
+    def _rel(self, path: Path) -> str:
+        return Path(path).resolve().relative_to(self._root).as_posix()
+
+    def _entry_path(self, path: Path) -> Path:
+        rel_path = Path(path).resolve().relative_to(self._root)
+        return self._dir / rel_path.with_suffix(".json")
+
+    def _file_hash(self, path: Path) -> bytes:
+        st = path.stat()
+        fkey = (path, st.st_size, st.st_mtime_ns)
+        digest = self._file_hashes.get(fkey, None)
+        if digest is None:
+            digest = hashlib.sha256(path.read_bytes()).digest()
+            self._file_hashes[fkey] = digest
+        return digest
+
+
+def _as_nodes(outputs: List[Dict]) -> List:
+    # dev dependency, imported here so the package works without it
+    from nbformat import from_dict
+
+    return [from_dict(output) for output in outputs]
+
+
+# -------------------
+#  Execution history
+# -------------------
+
+
+def execute_and_record(key: str, path: Path, history_path: Path, **kwargs):
+    """Run a notebook with :func:`execute_notebook`, and record the run
+    (successful or not) in the history file.
+
+    Args:
+        key: Notebook key
+        path: Path to notebook
+        history_path: History file
+        **kwargs: Passed to :func:`execute_notebook`
+
+    Returns:
+        The executed notebook
+    """
+    stats, ok = {}, False
+    try:
+        nb = execute_notebook(path, stats=stats, **kwargs)
+        ok = True
+    finally:
+        if stats and not stats.get("cached", False):
+            record_run(history_path, key, ok, stats)
+    return nb
+
+
+def record_run(history_path: Path, key: str, ok: bool, stats: Dict):
+    """Append the record of one notebook run to the history file.
+
+    Each record is written with one system call on a file opened for appending,
+    so parallel test workers can record runs at the same time.
+
+    Args:
+        history_path: History file
+        key: Notebook key
+        ok: Whether the notebook ran successfully
+        stats: Statistics from :func:`execute_notebook`
+    """
+    record = dict(stats, key=key, ok=ok, time=time.time())
+    line = (json.dumps(record) + "\n").encode("utf-8")
+    fd = os.open(str(history_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def read_history(history_path: Path) -> Dict[str, List[Dict]]:
+    """Read the history file.
+
+    Returns:
+        Records for each notebook key, oldest first
+    """
+    history = {}
+    if not history_path.exists():
+        return history
+    with history_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                history.setdefault(record["key"], []).append(record)
+            except (ValueError, KeyError):
+                _log.debug(f"Ignoring bad record in '{history_path}'")
+    return history
+
+
+def compact_history(history_path: Path, keep: int = HISTORY_KEEP):
+    """Rewrite the history file with only the latest `keep` records per notebook.
+
+    This should not run while tests may be recording runs.
+    """
+    history = read_history(history_path)
+    tmp_path = history_path.with_name(f"{history_path.name}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        for records in history.values():
+            for record in records[-keep:]:
+                f.write(json.dumps(record) + "\n")
+    tmp_path.replace(history_path)
+
+
+def expected_durations(history: Dict[str, List[Dict]]) -> Dict[str, float]:
+    """Estimate the wall time of each notebook, as the median of its most
+    recent successful runs.
+    """
+    durations = {}
+    for key, records in history.items():
+        walls = [r["wall"] for r in records if r.get("ok") and r.get("wall")]
+        if walls:
+            durations[key] = statistics.median(walls[-HISTORY_ESTIMATE:])
+    return durations
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Parse a shard specification 'i/N', where 1 <= i <= N.
+
+    Raises:
+        ValueError: If the specification is not valid
+    """
+    try:
+        i, n = (int(x) for x in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must be 'i/N', e.g. '1/4', got '{text}'")
+    if not 1 <= i <= n:
+        raise ValueError(f"Shard 'i/N' must have 1 <= i <= N, got '{text}'")
+    return i, n
+
+
+def longest_first(names: Sequence[str], durations: Dict[str, float]) -> List[str]:
+    """Order names by decreasing expected duration, then by name."""
+    return sorted(names, key=lambda n: (-durations.get(n, 0), n))
+
+
+def shard(
+    names: Sequence[str], index: int, count: int, durations: Dict[str, float] = None
+) -> List[str]:
+    """Deterministically select the names in one of `count` shards.
+
+    Names are taken longest first, and each is put in the shard with the
+    least total expected duration so far (the lowest-numbered, for ties).
+    Without durations this deals the sorted names to the shards in turn, so
+    shard sizes differ by at most one.
+
+    Args:
+        names: Names (e.g. test ids) to split up
+        index: Which shard, from 1 to `count`
+        count: Number of shards
+        durations: Expected duration for each name. Missing names count as 0.
+
+    Returns:
+        Names in the shard, longest first
+    """
+    if durations is None:
+        durations = {n: 1 for n in names}
+    loads = [0.0] * count
+    selected = []
+    for name in longest_first(names, durations):
+        i = min(range(count), key=lambda k: (loads[k], k))
+        loads[i] += durations.get(name, 0)
+        if i == index - 1:
+            selected.append(name)
+    return selected
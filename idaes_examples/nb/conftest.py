@@ -1,20 +1,107 @@
 """
 Run pre-processing before tests to guarantee the presence of *_test.ipynb notebooks.
 """
-from idaes_examples import build
+from idaes_examples import build, execute
 from pathlib import Path
+import statistics
+import pytest
+
+
+def _history_path() -> Path:
+    return Path(__file__).parent / execute.HISTORY_FILE
 
 
 g_pre = -1  # number of pre-processed notebooks
 
 
+def pytest_addoption(parser):
+    group = parser.getgroup("idaes-examples")
+    group.addoption(
+        "--run-notebooks",
+        action="store_true",
+        default=False,
+        help="Execute the generated *_test.ipynb notebooks",
+    )
+    group.addoption(
+        "--no-execution-cache",
+        action="store_true",
+        default=False,
+        help="Execute notebooks even if their cached outputs are current",
+    )
+    group.addoption(
+        "--warm-kernels",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Run notebooks in kernels from a pool of N kernels with IDAES "
+        "already imported (default=0, no pool)",
+    )
+    group.addoption(
+        "--shard",
+        default=None,
+        metavar="i/N",
+        help="Only run the i-th of N deterministic subsets of the tests",
+    )
+
+
 def pytest_configure(config):
     global g_pre
-    if g_pre < 0:
+    config.addinivalue_line(
+        "markers", "notebook: executes a notebook (requires --run-notebooks)"
+    )
+    if config.getoption("shard"):
+        try:
+            execute.parse_shard(config.getoption("shard"))
+        except ValueError as err:
+            raise pytest.UsageError(str(err))
+    # only in the main process: pytest-xdist workers start after it is done
+    if g_pre < 0 and not hasattr(config, "workerinput"):
         g_pre = 0
         p = Path(build.__file__).parent
         g_pre = build.preprocess(p)
 
 
+def pytest_collection_modifyitems(config, items):
+    if not config.getoption("run_notebooks"):
+        skip = pytest.mark.skip(reason="needs --run-notebooks option to run")
+        for item in items:
+            if item.get_closest_marker("notebook"):
+                item.add_marker(skip)
+    # Expected duration of each test, from the notebook execution history.
+    # Notebooks without history, and other tests, are assumed to take the
+    # median time, so they are spread over the shards.
+    nb_durations = execute.expected_durations(execute.read_history(_history_path()))
+    default = statistics.median(nb_durations.values()) if nb_durations else 1
+    notebook_ids = {
+        item.nodeid: item.callspec.id
+        for item in items
+        if item.get_closest_marker("notebook")
+    }
+    durations = {
+        item.nodeid: nb_durations.get(notebook_ids.get(item.nodeid), default)
+        for item in items
+    }
+    if config.getoption("shard"):
+        i, n = execute.parse_shard(config.getoption("shard"))
+        names = [item.nodeid for item in items]
+        selected = set(execute.shard(names, i, n, durations=durations))
+        deselected = [item for item in items if item.nodeid not in selected]
+        items[:] = [item for item in items if item.nodeid in selected]
+        config.hook.pytest_deselected(items=deselected)
+    # Run the slowest notebooks first, so parallel workers finish at about the
+    # same time. Other tests keep their place, in collection order.
+    slots = [k for k, item in enumerate(items) if item.nodeid in notebook_ids]
+    by_id = {items[k].nodeid: items[k] for k in slots}
+    order = execute.longest_first(list(by_id), durations)
+    for k, nodeid in zip(slots, order):
+        items[k] = by_id[nodeid]
+
+
+def pytest_sessionfinish(session, exitstatus):
+    # only in the main process, after all workers have recorded their runs
+    if not hasattr(session.config, "workerinput") and _history_path().exists():
+        execute.compact_history(_history_path())
+
+
 def pytest_report_collectionfinish(config, start_path, startdir, items):
     return f"{g_pre} Jupyter Notebooks preprocessed"
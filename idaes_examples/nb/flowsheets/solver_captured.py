@@ -14,36 +14,108 @@
 Captured sover
 """
 
-import json
+import asyncio
+from contextlib import contextmanager, redirect_stdout
+from functools import partial
+import os
 from pathlib import Path
-import sys
+import re
 from tempfile import TemporaryDirectory
-from threading import Thread
-import time
+from threading import Lock, Thread
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 #
+import numpy as np
+from pyomo.common.tempfiles import TempfileManager
 from pyomo.environ import value
 
 
 class ModelWidget:
+    """Solve a model with its solver output captured, for display in a widget.
+
+    :meth:`solve` returns the Pyomo solver results object. The `report`
+    function given to the constructor is called as ``report(model, result)``,
+    where `result` is the dict form of the solver results (from
+    ``json_repn()``), so ``result["Solver"][0]["Status"]`` is the status of
+    the first solve.
+    """
+
     def __init__(self, model, report=None):
         self._model = model
-        self._report = report if report else self._status_report
+        self._report = report
         self._result = None
         self._text = ""
+        self._log = IpoptLogParser()
+
+    def solve(self, solver, output_cb=None, timing=False):
+        """Solve the model.
+
+        Args:
+            solver: Pyomo solver object
+            output_cb: See :class:`CapturedSolver`
+            timing: If True, have Ipopt report the time in each part of the
+                    algorithm (e.g. the linear solver), for :meth:`metrics`
 
-    def solve(self, solver):
-        solver = CapturedSolver(solver)
-        self._result = solver.solve(self._model)
+        Returns:
+            Solver results object
+        """
+        self._log = IpoptLogParser()
+        solver = CapturedSolver(solver, output_cb=self._log_output(output_cb))
+        self._result = solver.solve(self._model, options=self._options(timing))
         self._text = solver.ouput_text
         return self._result
 
+    async def solve_async(self, solver):
+        """Solve without blocking the event loop, yielding events as the solver
+        runs (see :meth:`CapturedSolver.solve_async`).
+
+        To solve several flowsheets at once, give each its own ModelWidget,
+        model (e.g. from ``m.clone()``) and solver object, and run the
+        ``solve_async`` calls as separate tasks.
+        """
+        self._log = IpoptLogParser()
+        captured = CapturedSolver(solver, output_cb=self._log_output(None))
+        async for event in captured.solve_async(self._model):
+            if event["event"] == "result":
+                self._result = event["result"]
+                self._text = captured.ouput_text
+            yield event
+
     def report(self):
-        return self._report(self._model, self._result)
+        result = self._result.json_repn()
+        if self._report is None:
+            return self._status_report(self._model, result) + self._log.summary()
+        return self._report(self._model, result)
+
+    def metrics(self):
+        """Convergence and timing metrics from the last solve.
+
+        Returns:
+            See :meth:`IpoptLogParser.metrics`
+        """
+        return self._log.metrics()
 
     def output(self):
         return self._text
 
+    def _log_output(self, output_cb):
+        if output_cb is None:
+            return self._log.feed
+
+        def both(lines):
+            self._log.feed(lines)
+            output_cb(lines)
+
+        return both
+
+    @staticmethod
+    def _options(timing):
+        return {"print_timing_statistics": "yes"} if timing else {}
+
     @staticmethod
     def _status_report(m, result):
         text = ""
@@ -53,95 +125,389 @@ class ModelWidget:
 
 
 class CapturedSolver:
-    def __init__(self, solver):
+    """Run a solver and capture its output, without printing it.
+
+    Ipopt writes its log to a named pipe (its "output_file" option), and
+    each line is passed to the callback as soon as Ipopt writes it.
+    Nothing process-wide, such as ``sys.stdout``, is changed, so separate
+    CapturedSolver objects (each with its own solver object) can solve at the
+    same time in different threads; only Pyomo's steps before and after each
+    solver run take turns (see :meth:`solve_async`).
+    Other solvers are run with ``tee=True`` and ``sys.stdout`` redirected to
+    the pipe, as before; as that is process-wide, these solves run one at a
+    time.
+    Where named pipes are not available (Windows), the output is written to a
+    temporary file and passed to the callback after the solve.
+
+    The results of :meth:`solve` are the Pyomo solver results object, not
+    the dict from its ``json_repn()`` method.
+    """
+
+    def __init__(self, solver, output_cb=None):
+        """Constructor.
+
+        Args:
+            solver: Pyomo solver object
+            output_cb: If given, function called with each list of new output
+                       lines. It is called from a separate thread.
+        """
         self._slv = solver
-        self._outcb = self._save_output_lines
-        self._outsep = "%%%"
+        self._outcb = output_cb
         self._output = []
 
     def solve(self, model, **kwargs):
-        return self._solve_captured(model)
+        """Solve the model.
+
+        Args:
+            model: Model to solve
+            kwargs: Passed to the solver's `solve` method
+
+        Returns:
+            Solver results object
+        """
+        return self._solve_captured(model, **kwargs)
+
+    async def solve_async(self, model, **kwargs):
+        """Solve the model without blocking the event loop.
+
+        The solve runs in a worker thread, with the solver itself in its own
+        process, as for :meth:`solve`. Pyomo's steps before and after running
+        the solver (e.g. writing the model file) use process-wide state, so
+        they run under a lock, one solve at a time; the solvers themselves
+        run at the same time. Solves started some other way (e.g. a plain
+        ``solver.solve`` call in another thread) should not run meanwhile.
+
+        Args:
+            model: Model to solve
+            kwargs: Passed to the solver's `solve` method
+
+        Yields:
+            For each Ipopt iteration, as it is reported, a dict with "event" set
+            to "iteration" and the iteration number ("iter"), objective value
+            ("objective"), and primal and dual infeasibility ("inf_pr" and
+            "inf_du"). Finally, a dict with "event" set to "result" and the
+            solver results object ("result").
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        user_cb, done = self._outcb, object()
+
+        def queue_lines(lines):  # in the reader thread
+            if user_cb is not None:
+                user_cb(lines)
+            loop.call_soon_threadsafe(queue.put_nowait, lines)
+
+        self._outcb = queue_lines
+        try:
+            future = loop.run_in_executor(
+                None, partial(self._solve_captured, model, **kwargs)
+            )
+            # runs after all the output lines have been queued
+            future.add_done_callback(lambda f: queue.put_nowait(done))
+            while True:
+                lines = await queue.get()
+                if lines is done:
+                    break
+                for line in lines:
+                    event = parse_iteration(line)
+                    if event is not None:
+                        yield event
+            result = await future
+        finally:
+            self._outcb = user_cb
+        yield {"event": "result", "result": result}
 
     @property
     def ouput_text(self):
-        p = self._output.index(self._outsep)
-        output = self._output if p == -1 else self._output[:p]
-        return "\n".join(output)
+        return "\n".join(self._output)
 
     def _save_output_lines(self, lines):
         self._output.extend(lines)
+        if self._outcb is not None:
+            self._outcb(lines)
 
-    def _solve_captured(self, m):
+    def _solve_captured(self, m, **kwargs):
         with TemporaryDirectory() as tempdirname:
             opath = Path(tempdirname) / "solver.txt"
-            ofile = opath.open(mode="w", encoding="utf-8")
-            filename = opath.name
-            result = {}
-            tailed = Thread(
-                target=self._tail_file, args=(filename, self._outsep, self._outcb, result)
-            )
-            proc = Thread(
-                target=self._run_captured,
-                args=(self._slv.solve, (m,), {"tee": True}, ofile, self._outsep),
-            )
-            tailed.start()
-            proc.start()
-            while proc.is_alive():
-                time.sleep(0.1)
-            proc.join()
-            tailed.join()
+            if fcntl is None or not hasattr(os, "mkfifo"):
+                result = _solve_to_file(self._slv, m, opath, kwargs)
+                if opath.exists():
+                    with opath.open("r", encoding="utf-8", errors="replace") as f:
+                        self._read_lines(f)
+                return result
+            os.mkfifo(opath)
+            # Open both ends here, so the reader does not wait for the solver to
+            # open the pipe. Holding the write end open means the reader only
+            # sees end-of-file once the solver and this method have both
+            # closed it, even if the solver never opened it.
+            rfd = os.open(opath, os.O_RDONLY | os.O_NONBLOCK)
+            wfd = os.open(opath, os.O_WRONLY)
+            flags = fcntl.fcntl(rfd, fcntl.F_GETFL)
+            fcntl.fcntl(rfd, fcntl.F_SETFL, flags & ~os.O_NONBLOCK)
+            rfile = os.fdopen(rfd, "r", encoding="utf-8", errors="replace")
+            reader = Thread(target=self._read_lines, args=(rfile,))
+            reader.start()
+            try:
+                result = _solve_to_file(self._slv, m, opath, kwargs)
+            finally:
+                os.close(wfd)
+                reader.join()
+                rfile.close()
         return result
 
-    @staticmethod
-    def _run_captured(target, args, kwargs, ofile, sep):
-        save_stdout = sys.stdout
-        sys.stdout = ofile
-        result = None
-        try:
-            result = target(*args, **kwargs)
-        finally:
-            ofile.write("\n")
-            ofile.write(sep)
-            ofile.write("\n")
-            if result is None:
-                ofile.write("{}")
-            else:
-                # append JSON result to output file
-                ofile.write(json.dumps(result.json_repn()))
-            ofile.write("\n")
-            ofile.write(sep)
-            ofile.write("\n")
-            ofile.close()
-            sys.stdout = save_stdout
+    def _read_lines(self, f):
+        for line in f:
+            self._save_output_lines([line.rstrip("\n")])
 
-    @staticmethod
-    def _tail_file(filename, sep, output_cb, result):
-        f = open(filename, "r", encoding="utf-8")
-        all_data = []
-        num_sep = 0
-        partial_line = ""
-        while num_sep < 2:
-            data = f.read()
-            if data:
-                lines = data.split("\n")
-                if partial_line:
-                    lines[0] = partial_line + lines[0]
-                if not data.endswith("\n"):
-                    partial_line = lines[-1]
-                    lines = lines[:-1]
+
+# held while sys.stdout is redirected for a solver other than Ipopt
+_stdout_lock = Lock()
+
+# Pyomo's shell solvers (e.g. Ipopt) push a context onto the process-wide
+# TempfileManager in their presolve step and pop the innermost one in their
+# postsolve step, so solves in separate threads could pop, and delete the
+# files of, each other's contexts. Both steps run under this lock, and each
+# solve keeps its context off the shared stack while its solver runs.
+_tempfile_lock = Lock()
+
+
+@contextmanager
+def _own_tempfile_context(solver):
+    """Within the block, run the presolve and postsolve steps of the solver
+    under _tempfile_lock, with its own TempfileManager context.
+    """
+    if not (hasattr(solver, "_presolve") and hasattr(solver, "_postsolve")):
+        yield
+        return
+    stack = TempfileManager._context_stack
+    presolve, postsolve = solver._presolve, solver._postsolve
+    saved = []
+
+    def save_contexts(depth):
+        saved.extend(stack[depth:])
+        del stack[depth:]
+
+    def locked_presolve(*args, **kwargs):
+        with _tempfile_lock:
+            depth = len(stack)
+            try:
+                presolve(*args, **kwargs)
+            finally:
+                save_contexts(depth)
+
+    def locked_postsolve():
+        with _tempfile_lock:
+            depth = len(stack)
+            stack.extend(saved)
+            saved.clear()
+            try:
+                return postsolve()
+            finally:
+                save_contexts(depth)
+
+    solver._presolve, solver._postsolve = locked_presolve, locked_postsolve
+    try:
+        yield
+    finally:
+        del solver._presolve, solver._postsolve
+        # left if the solve failed before its postsolve step
+        for context in reversed(saved):
+            context.release()
+
+
+def _solve_to_file(solver, m, opath, kwargs):
+    """Solve, with the solver output written to the file (or pipe) `opath`."""
+    kwargs = dict(kwargs)
+    options = dict(kwargs.pop("options", {}))
+    if str(getattr(solver, "name", "")).startswith("ipopt"):
+        options["output_file"] = str(opath)
+        with _own_tempfile_context(solver):
+            return solver.solve(m, options=options, tee=False, **kwargs)
+    with _stdout_lock, open(opath, "w", encoding="utf-8") as f:
+        with redirect_stdout(f), _own_tempfile_context(solver):
+            return solver.solve(m, options=options, tee=True, **kwargs)
+
+
+# Columns of the Ipopt iteration table, as parsed by IpoptLogParser. The
+# 'restoration' column is 1 for iterations in the restoration phase (an 'r'
+# after the number), and 'lg_rg' is NaN where Ipopt prints '-'.
+ITERATION_COLUMNS = (
+    "iter",
+    "objective",
+    "inf_pr",
+    "inf_du",
+    "lg_mu",
+    "d_norm",
+    "lg_rg",
+    "alpha_du",
+    "alpha_pr",
+    "ls",
+    "restoration",
+)
+
+_num = r"([-+]?\d+(?:\.\d*)?(?:e[-+]\d+)?|-)"
+# iter[r] objective inf_pr inf_du lg(mu) ||d|| lg(rg) alpha_du alpha_pr[type] ls
+_iteration_pat = re.compile(
+    r"\s*(\d+)(r?)" + (r"\s+" + _num) * 8 + r"[a-zA-Z]?\s+(\d+)"
+)
+# Ipopt 3.14 reports only the total, including function evaluations, as
+# 'Total seconds in IPOPT'; older versions split it in two
+_total_time_pat = re.compile(
+    r"Total (?:CPU secs|seconds) in (IPOPT(?: \(w/o function evaluations\))?|"
+    r"NLP function evaluations)\s*=\s*([\d.]+)"
+)
+_count_pat = re.compile(r"Number of (.+?) evaluations\s*=\s*(\d+)")
+# from the 'print_timing_statistics' option: name....: cpu (sys: t wall: t)
+_timing_pat = re.compile(
+    r"\s*([A-Za-z][\w ]*?)\.*:\s+([\d.]+) \(sys:\s+([\d.]+) wall:\s+([\d.]+)\)"
+)
+# timing statistics that are part of solving linear systems
+_linear_solver_timers = (
+    "LinearSystemScaling",
+    "LinearSystemSymbolicFactorization",
+    "LinearSystemFactorization",
+    "LinearSystemBackSolve",
+)
+
+
+def _float(text):
+    return float("nan") if text == "-" else float(text)
+
+
+def _parse_row(line):
+    match = _iteration_pat.match(line)
+    if match is None:
+        return None
+    g = match.groups()
+    values = [float(g[0])] + [_float(t) for t in g[2:10]] + [float(g[10])]
+    return values + [1.0 if g[1] else 0.0]
+
+
+def parse_iteration(line):
+    """Parse a line of the Ipopt iteration table.
+
+    Returns:
+        Iteration event (see :meth:`CapturedSolver.solve_async`), or None if the
+        line is not an iteration
+    """
+    row = _parse_row(line)
+    if row is None:
+        return None
+    return {
+        "event": "iteration",
+        "iter": int(row[0]),
+        "objective": row[1],
+        "inf_pr": row[2],
+        "inf_du": row[3],
+    }
+
+
+class IpoptLogParser:
+    """Incremental parser for Ipopt output.
+
+    Pass lines of output to :meth:`feed` as they arrive (it can be used as
+    the callback of :class:`CapturedSolver`), and get the results so far from
+    :meth:`metrics`.
+    """
+
+    def __init__(self):
+        self._rows = []
+        self._counts = {}
+        self._totals = {}
+        self._timers = {}
+
+    def feed(self, lines):
+        """Parse some lines of output."""
+        for line in lines:
+            row = _parse_row(line)
+            if row is not None:
+                self._rows.append(row)
+                continue
+            match = _total_time_pat.match(line)
+            if match:
+                name = match.group(1)
+                if name.startswith("IPOPT"):
+                    name = "total" if name == "IPOPT" else "ipopt"
                 else:
-                    partial_line = ""
-                output_cb(lines)
-                all_data.extend(lines)
-                num_sep += sum((ln == sep for ln in lines))
-            else:
-                time.sleep(0.5)
-        # parse JSON result back to Python dict
-        if num_sep >= 2:
-            n1 = all_data.index(sep)
-            n2 = all_data.index(sep, n1 + 1)
-            json_text = "".join(all_data[n1 + 1: n2])
-            r = json.loads(json_text)
-            result.update(r)
+                    name = "function"
+                self._totals[name] = float(match.group(2))
+                continue
+            match = _count_pat.match(line)
+            if match:
+                self._counts[match.group(1).replace(" ", "_")] = int(match.group(2))
+                continue
+            match = _timing_pat.match(line)
+            if match:
+                cpu, sys_, wall = (float(x) for x in match.groups()[1:])
+                self._timers[match.group(1)] = {"cpu": cpu, "sys": sys_, "wall": wall}
+
+    @property
+    def iterations(self) -> np.ndarray:
+        """Iteration table, with one row per iteration and the columns in
+        ITERATION_COLUMNS.
+        """
+        return np.array(self._rows, dtype=float).reshape(-1, len(ITERATION_COLUMNS))
+
+    def phases(self):
+        """CPU time, in seconds, in each phase of the solve. Phases that were
+        not reported are None.
 
+        Ipopt 3.14 and later only report the total time (as wall time), so
+        there the time in function evaluations, and so in Ipopt without them,
+        is only known if the 'print_timing_statistics' option was set.
 
+        Returns:
+            Dict with the total time ("total"), the time in function
+            evaluations ("function_evaluations"), in Ipopt without them
+            ("ipopt"), and, if the 'print_timing_statistics' option was set,
+            the part of that in the linear solver ("linear_solver")
+        """
+        linear = [
+            self._timers[n]["cpu"] for n in _linear_solver_timers if n in self._timers
+        ]
+        total = self._totals.get("total", None)
+        function = self._totals.get("function", None)
+        if function is None and "Function Evaluations" in self._timers:
+            function = self._timers["Function Evaluations"]["cpu"]
+        ipopt = self._totals.get("ipopt", None)
+        if ipopt is None and total is not None and function is not None:
+            ipopt = total - function
+        if total is None and ipopt is not None and function is not None:
+            total = ipopt + function
+        return {
+            "total": total,
+            "function_evaluations": function,
+            "ipopt": ipopt,
+            "linear_solver": sum(linear) if linear else None,
+        }
+
+    def metrics(self):
+        """Results parsed so far.
+
+        Returns:
+            Dict with the iteration table ("iterations", see :attr:`iterations`),
+            the number of each kind of evaluation ("evaluations", e.g.
+            "objective_function": 125), the time in each phase ("phases", see
+            :meth:`phases`), and the detailed timing statistics, if any
+            ("timing", name: {"cpu", "sys", "wall"})
+        """
+        return {
+            "iterations": self.iterations,
+            "evaluations": dict(self._counts),
+            "phases": self.phases(),
+            "timing": dict(self._timers),
+        }
+
+    def summary(self):
+        """Short text summary of the metrics."""
+        if not self._rows:
+            return ""
+        last = self._rows[-1]
+        text = (
+            f"Iterations: {int(last[0])}, final inf_pr={last[2]:.2e} "
+            f"inf_du={last[3]:.2e}\n"
+        )
+        times = [f"{k}={v:.3f}s" for k, v in self.phases().items() if v is not None]
+        if times:
+            text += f"CPU time: {' '.join(times)}\n"
+        return text
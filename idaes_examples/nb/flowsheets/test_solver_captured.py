@@ -0,0 +1,167 @@
+#################################################################################
+# The Institute for the Design of Advanced Energy Systems Integrated Platform
+# Framework (IDAES IP) was produced under the DOE Institute for the
+# Design of Advanced Energy Systems (IDAES), and is copyright (c) 2018-2022
+# by the software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia University
+# Research Corporation, et al.  All rights reserved.
+#
+# Please see the files COPYRIGHT.md and LICENSE.md for full copyright and
+# license information.
+#################################################################################
+"""
+Tests for capturing solver output.
+"""
+# stdlib
+import asyncio
+
+# third-party
+import pytest
+
+pytest.importorskip("pyomo", reason="Pyomo is needed to solve models")
+from pyomo.common.tempfiles import TempfileManager
+import pyomo.environ as pyo
+from pyomo.opt import SolverResults, SolverStatus
+
+# package
+from solver_captured import (
+    ITERATION_COLUMNS,
+    CapturedSolver,
+    IpoptLogParser,
+    ModelWidget,
+)
+
+
+# -------------------
+#  Fixtures
+# -------------------
+
+
+class PrintingSolver:
+    """Solver that only prints its output, when `tee` is True."""
+
+    name = "printing"
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def solve(self, m, options=None, tee=False):
+        if tee:
+            for line in self.lines:
+                print(line)
+        results = SolverResults()
+        results.solver.status = SolverStatus.ok
+        return results
+
+
+def simple_model():
+    m = pyo.ConcreteModel()
+    m.x = pyo.Var(initialize=1)
+    m.o = pyo.Objective(expr=m.x**2)
+    return m
+
+
+# -------------------
+#  Tests
+# -------------------
+
+
+def test_capture_stdout_solver():
+    lines = ["first line", "second line"]
+    received = []
+    solver = CapturedSolver(PrintingSolver(lines), output_cb=received.extend)
+    result = solver.solve(simple_model())
+    assert result.solver.status == SolverStatus.ok
+    assert solver.ouput_text == "\n".join(lines)
+    assert received == lines
+
+
+def test_report_gets_dict():
+    widget = ModelWidget(
+        simple_model(), report=lambda m, result: result["Solver"][0]["Status"]
+    )
+    widget.solve(PrintingSolver(["line"]))
+    assert widget.report() == "ok"
+    assert widget.output() == "line"
+
+
+def _ipopt_available():
+    return pyo.SolverFactory("ipopt").available(exception_flag=False)
+
+
+@pytest.mark.skipif(not _ipopt_available(), reason="Ipopt is not available")
+def test_concurrent_solves():
+    async def solve(m):
+        captured = CapturedSolver(pyo.SolverFactory("ipopt"))
+        events = [event async for event in captured.solve_async(m)]
+        return events, captured.ouput_text
+
+    async def solve_both(models):
+        return await asyncio.gather(*(solve(m) for m in models))
+
+    models = [simple_model(), simple_model()]
+    depth = len(TempfileManager._context_stack)
+    for events, text in asyncio.run(solve_both(models)):
+        assert events[-1]["event"] == "result"
+        assert events[-1]["result"].solver.status == SolverStatus.ok
+        iterations = [e["iter"] for e in events if e["event"] == "iteration"]
+        assert iterations and iterations == sorted(iterations)
+        assert "Ipopt" in text
+    assert len(TempfileManager._context_stack) == depth
+    for m in models:
+        assert m.x.value is not None
+
+
+_ITERATIONS = """\
+iter    objective    inf_pr   inf_du lg(mu)  ||d||  lg(rg) alpha_du alpha_pr  ls
+   0  1.0000000e+00 1.00e+00 0.00e+00  -1.0 0.00e+00    -  0.00e+00 0.00e+00   0
+   1  5.0000000e-01 1.11e-16 5.00e-01  -1.0 5.00e-01    -  1.00e+00 1.00e+00h  1
+   2r 4.9000000e-01 2.22e-16 1.00e-11  -2.5 1.00e-02  -4.0 1.00e+00 1.00e+00f  1
+
+Number of objective function evaluations             = 3
+"""
+
+LOG_3_13 = (
+    _ITERATIONS
+    + """\
+Total CPU secs in IPOPT (w/o function evaluations)   =      0.010
+Total CPU secs in NLP function evaluations           =      0.002
+
+EXIT: Optimal Solution Found.
+"""
+)
+
+LOG_3_14 = (
+    _ITERATIONS
+    + """\
+Total seconds in IPOPT                               = 0.015
+
+EXIT: Optimal Solution Found.
+"""
+)
+
+
+@pytest.mark.parametrize(
+    "log,phases",
+    [
+        (LOG_3_13, {"total": 0.012, "function_evaluations": 0.002, "ipopt": 0.010}),
+        (LOG_3_14, {"total": 0.015, "function_evaluations": None, "ipopt": None}),
+    ],
+    ids=["3.13", "3.14"],
+)
+def test_log_parser(log, phases):
+    parser = IpoptLogParser()
+    parser.feed(log.splitlines())
+    metrics = parser.metrics()
+    iterations = metrics["iterations"]
+    assert iterations.shape == (3, len(ITERATION_COLUMNS))
+    assert list(iterations[:, 0]) == [0, 1, 2]
+    assert list(iterations[:, -1]) == [0, 0, 1]  # restoration phase
+    assert metrics["evaluations"] == {"objective_function": 3}
+    for name, expected in dict(phases, linear_solver=None).items():
+        if expected is None:
+            assert metrics["phases"][name] is None
+        else:
+            assert metrics["phases"][name] == pytest.approx(expected)
+    assert "total=" in parser.summary()
@@ -42,6 +42,7 @@ from idaes.models_extra.power_generation.properties.natural_gas_PR import (
 from idaes.models.properties import iapws95
 import idaes.logger as idaeslog
 from idaes.core.util.tags import svg_tag
+from idaes_examples.common import snapshot
 
 
 @declare_process_block_class(
@@ -872,10 +873,8 @@ class GasTurbineFlowsheetData(FlowsheetBlockData):
         if load_from is not None:
             if os.path.exists(load_from):
                 init_log.info_high(f"GT load initial from {load_from}")
-                # here suffix=False avoids loading scaling factors
-                iutil.from_json(
-                    self, fname=load_from, wts=iutil.StoreSpec(suffix=False)
-                )
+                # scaling factors are not loaded
+                snapshot.load_initial(self, load_from)
                 return
 
         init_log.info_high("Gas Turbine Initialization Starting")
@@ -1031,10 +1030,8 @@ class GasTurbineFlowsheetData(FlowsheetBlockData):
         solver_obj.solve(self, tee=True)
 
         if save_to is not None:
-            iutil.to_json(self)
-            if save_to is not None:
-                iutil.to_json(self, fname=save_to)
-                init_log.info_high(f"Initialization saved to {save_to}")
+            snapshot.save_initial(self, save_to)
+            init_log.info_high(f"Initialization saved to {save_to}")
 
     @staticmethod
     def _stream_col_gen(tag_group):
@@ -55,6 +55,7 @@ from idaes.models_extra.power_generation.unit_models.boiler_heat_exchanger impor
     BoilerHeatExchanger,
     TubeArrangement,
 )
+from idaes_examples.common import snapshot
 
 
 @declare_process_block_class(
@@ -1082,10 +1083,8 @@ class HrsgFlowsheetData(FlowsheetBlockData):
         if load_from is not None:
             if os.path.exists(load_from):
                 init_log.info_high(f"HRSG load initial from {load_from}")
-                # here suffix=False avoids loading scaling factors
-                iutil.from_json(
-                    self, fname=load_from, wts=iutil.StoreSpec(suffix=False)
-                )
+                # scaling factors are not loaded
+                snapshot.load_initial(self, load_from)
                 return
 
         ######### LP Section ###########
@@ -1306,7 +1305,7 @@ class HrsgFlowsheetData(FlowsheetBlockData):
         res = solver_obj.solve(self, tee=True)
 
         if save_to is not None:
-            iutil.to_json(self, fname=save_to)
+            snapshot.save_initial(self, save_to)
             init_log.info_low(f"Initialization saved to {save_to}")
         init_log.info("High pressure system initialization - Completed")
 
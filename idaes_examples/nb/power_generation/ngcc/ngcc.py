@@ -13,7 +13,11 @@
 
 __author__ = "John Eslick"
 
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import os
+import sys
+import tempfile
 import pyomo.environ as pyo
 from pyomo.network import Arc
 import idaes.models.unit_models as um  # um = unit models
@@ -27,6 +31,41 @@ import idaes.core.util as iutil
 from idaes.core.solvers import get_solver
 from idaes.core.util.initialization import propagate_state
 import idaes.core.base.costing_base as cost_base
+from idaes_examples.common import snapshot
+
+
+# Sub-flowsheets that can be initialized in parallel (see
+# NgccFlowsheetData.initialize): attribute name -> (class, initialization file)
+_sub_flowsheets = {
+    "gt": (gas_turbine.GasTurbineFlowsheet, "gas_turbine_init.json.gz"),
+    "hrsg": (hrsg.HrsgFlowsheet, "hrsg_init.json.gz"),
+    "st": (steam_turbine.SteamTurbineFlowsheet, "steam_turbine_init.json.gz"),
+}
+
+
+def _st_scaling_guess(st):
+    iscale.set_scaling_factor(
+        st.steam_turbine.throttle_valve[1].control_volume.deltaP, 1e-6
+    )
+    iscale.set_scaling_factor(st.steam_turbine.hp_stages[1].control_volume.deltaP, 1e-6)
+    iscale.set_scaling_factor(st.main_condenser.tube.heat, 1e-8)
+    iscale.set_scaling_factor(st.main_condenser.shell.heat, 1e-8)
+
+
+def _initialize_sub_flowsheet(name, snapshot_file):
+    """Build one sub-flowsheet in a new model, initialize it, and save its
+    state to a snapshot file. This runs in a worker process.
+    """
+    cls, init_file = _sub_flowsheets[name]
+    m = pyo.ConcreteModel()
+    # same name as in the NGCC flowsheet, so the state can be loaded there
+    m.add_component(name, cls(dynamic=False))
+    sub = m.component(name)
+    if name == "st":
+        _st_scaling_guess(sub)
+    iscale.calculate_scaling_factors(m)
+    sub.initialize(load_from=init_file, save_to=init_file)
+    snapshot.save_snapshot(sub, snapshot_file)
 
 
 @declare_process_block_class(
@@ -406,14 +445,7 @@ class NgccFlowsheetData(FlowsheetBlockData):
             iscale.constraint_scaling_transform(c, 1e-5)
         for t, c in self.reboiler_duty_eqn.items():
             iscale.constraint_scaling_transform(c, 1e-7)
-        iscale.set_scaling_factor(
-            self.st.steam_turbine.throttle_valve[1].control_volume.deltaP, 1e-6
-        )
-        iscale.set_scaling_factor(
-            self.st.steam_turbine.hp_stages[1].control_volume.deltaP, 1e-6
-        )
-        iscale.set_scaling_factor(self.st.main_condenser.tube.heat, 1e-8)
-        iscale.set_scaling_factor(self.st.main_condenser.shell.heat, 1e-8)
+        _st_scaling_guess(self.st)
 
     def initialize(
         self,
@@ -422,16 +454,41 @@ class NgccFlowsheetData(FlowsheetBlockData):
         optarg=None,
         load_from="ngcc_init.json.gz",
         save_to="ngcc_init.json.gz",
+        parallel=False,
     ):
-
+        """Initialize the NGCC flowsheet
+
+        Args:
+            outlvl: Logging level for initializtion
+            solver (str): solver to user for initializtion
+            optarg (dict): solver options
+            load_from (str): if file exists and is not None, load initialization
+            save_to (str): save initializtion
+            parallel (bool): if True, initialize the gas turbine, HRSG and steam
+                turbine sub-flowsheets at the same time, each in its own model in
+                a worker process, then load their states into this flowsheet.
+                The steam turbine then starts from its own estimate of the LP
+                steam from the HRSG, and the HRSG from its own estimate of the
+                flue gas from the gas turbine; the gas turbine outlet is
+                propagated to the HRSG once the states are loaded. On Linux
+                the workers are forked, so they use solver settings made in
+                idaes.cfg at run time; elsewhere they are spawned, and only
+                use the settings from the configuration files. Only for
+                steady-state flowsheets.
+
+        Returns:
+            None
+        """
+        if parallel and self.config.dynamic:
+            raise ValueError("Parallel initialization is only for steady-state")
         init_log = idaeslog.getInitLogger(self.name, outlvl, tag="flowsheet")
         solve_log = idaeslog.getSolveLogger(self.name, outlvl, tag="flowsheet")
         solver_obj = get_solver(solver, optarg)
 
         if load_from is not None and os.path.exists(load_from):
             init_log.info(f"NGCC load initial from {load_from}")
-            # here suffix=False avoids loading scaling factors
-            iutil.from_json(self, fname=load_from, wts=iutil.StoreSpec(suffix=False))
+            # scaling factors are not loaded
+            snapshot.load_initial(self, load_from)
         else:
             self.cap_addtional_co2.fix()
             self.cap_fraction.fix()
@@ -441,23 +498,32 @@ class NgccFlowsheetData(FlowsheetBlockData):
             self.fuel_lhv.fix()
             self.fuel_hhv.fix()
 
-            self.gt.initialize(
-                load_from="gas_turbine_init.json.gz",
-                save_to="gas_turbine_init.json.gz",
-            )
-            propagate_state(self.g08a)
-            self.fg_translate.initialize()
-            propagate_state(self.g08b, overwrite_fixed=True)
-            self.hrsg.initialize(
-                load_from="hrsg_init.json.gz",
-                save_to="hrsg_init.json.gz",
-            )
-            self.hrsg.sh_hp4.shell_inlet.unfix()
-            propagate_state(self.t05a, overwrite_fixed=True)
-            self.st.initialize(
-                load_from="steam_turbine_init.json.gz",
-                save_to="steam_turbine_init.json.gz",
-            )
+            if parallel:
+                init_log.info(f"Initialize GT, HRSG and ST in parallel")
+                self._initialize_sub_flowsheets_parallel()
+                propagate_state(self.g08a)
+                self.fg_translate.initialize()
+                propagate_state(self.g08b, overwrite_fixed=True)
+                self.hrsg.sh_hp4.shell_inlet.unfix()
+                propagate_state(self.t05a, overwrite_fixed=True)
+            else:
+                self.gt.initialize(
+                    load_from="gas_turbine_init.json.gz",
+                    save_to="gas_turbine_init.json.gz",
+                )
+                propagate_state(self.g08a)
+                self.fg_translate.initialize()
+                propagate_state(self.g08b, overwrite_fixed=True)
+                self.hrsg.initialize(
+                    load_from="hrsg_init.json.gz",
+                    save_to="hrsg_init.json.gz",
+                )
+                self.hrsg.sh_hp4.shell_inlet.unfix()
+                propagate_state(self.t05a, overwrite_fixed=True)
+                self.st.initialize(
+                    load_from="steam_turbine_init.json.gz",
+                    save_to="steam_turbine_init.json.gz",
+                )
 
             init_log.info(f"Open tears")
             self.st02a_expanded.deactivate()  # steam from ng preheat
@@ -536,10 +602,23 @@ class NgccFlowsheetData(FlowsheetBlockData):
             solver_obj.solve(self, tee=True)
 
             if save_to is not None:
-                iutil.to_json(self)
-                if save_to is not None:
-                    iutil.to_json(self, fname=save_to)
-                    init_log.info(f"Initialization saved to {save_to}")
+                snapshot.save_initial(self, save_to)
+                init_log.info(f"Initialization saved to {save_to}")
+
+    def _initialize_sub_flowsheets_parallel(self):
+        mp_context = None
+        if sys.platform.startswith("linux"):
+            # workers then inherit solver settings made in idaes.cfg; fork is
+            # not safe on macOS, where it is not the default
+            mp_context = multiprocessing.get_context("fork")
+        names = list(_sub_flowsheets)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            files = [os.path.join(tmpdir, f"{name}.npz") for name in names]
+            with ProcessPoolExecutor(len(names), mp_context=mp_context) as pool:
+                list(pool.map(_initialize_sub_flowsheet, names, files))
+            for name, fname in zip(names, files):
+                # scaling factors are not loaded
+                snapshot.load_snapshot(getattr(self, name), fname)
 
     def check_scaling(self):
         jac, nlp = iscale.get_jacobian(self, scaled=True)
@@ -26,6 +26,7 @@ import soec
 import idaes.core.util as iutil
 from idaes.core.solvers import get_solver
 from idaes.core.util.initialization import propagate_state
+from idaes_examples.common import snapshot
 
 
 @declare_process_block_class(
@@ -133,10 +134,8 @@ class NgccSoecFlowsheetData(FlowsheetBlockData):
         if load_from is not None:
             if os.path.exists(load_from):
                 init_log.info(f"NGCC/SOEC design load initial from {load_from}")
-                # here suffix=False avoids loading scaling factors
-                iutil.from_json(
-                    self, fname=load_from, wts=iutil.StoreSpec(suffix=False)
-                )
+                # scaling factors are not loaded
+                snapshot.load_initial(self, load_from)
                 return
         solver_obj = get_solver(solver, optarg)
         self.ngcc.initialize(
@@ -203,7 +202,5 @@ class NgccSoecFlowsheetData(FlowsheetBlockData):
         solver_obj.solve(self, tee=True)
 
         if save_to is not None:
-            iutil.to_json(self)
-            if save_to is not None:
-                iutil.to_json(self, fname=save_to)
-                init_log.info(f"Initialization saved to {save_to}")
+            snapshot.save_initial(self, save_to)
+            init_log.info(f"Initialization saved to {save_to}")
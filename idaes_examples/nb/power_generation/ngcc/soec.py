@@ -37,6 +37,7 @@ from idaes.core.solvers import get_solver
 import idaes.core.util.tables as tables
 from idaes.core.util.tags import svg_tag
 import idaes.core.base.costing_base as cost_base
+from idaes_examples.common import snapshot
 
 
 @declare_process_block_class("SoecFlowsheet")
@@ -833,10 +834,8 @@ class SoecFlowsheetData(FlowsheetBlockData):
         if load_from is not None:
             if os.path.exists(load_from):
                 init_log.info(f"SOEC load initial from {load_from}")
-                # here suffix=False avoids loading scaling factors
-                iutil.from_json(
-                    self, fname=load_from, wts=iutil.StoreSpec(suffix=False)
-                )
+                # scaling factors are not loaded
+                snapshot.load_initial(self, load_from)
                 return
 
         init_log.info("SOEC Initialization Starting")
@@ -940,10 +939,8 @@ class SoecFlowsheetData(FlowsheetBlockData):
 
         init_log.info("SOEC initialization complete")
         if save_to is not None:
-            iutil.to_json(self)
-            if save_to is not None:
-                iutil.to_json(self, fname=save_to)
-                init_log.info(f"Initialization saved to {save_to}")
+            snapshot.save_initial(self, save_to)
+            init_log.info(f"Initialization saved to {save_to}")
 
     def _add_tags(self):
         tag_group = iutil.ModelTagGroup()
@@ -36,6 +36,7 @@ from idaes.core.util.tags import svg_tag
 import idaes.core.util as iutil
 from idaes.core.util.initialization import propagate_state
 import idaes.logger as idaeslog
+from idaes_examples.common import snapshot
 
 
 @declare_process_block_class(
@@ -357,10 +358,8 @@ class SteamTurbineFlowsheetData(FlowsheetBlockData):
         if load_from is not None:
             if os.path.exists(load_from):
                 init_log.info_high(f"ST load initial from {load_from}")
-                # here suffix=False avoids loading scaling factors
-                iutil.from_json(
-                    self, fname=load_from, wts=iutil.StoreSpec(suffix=False)
-                )
+                # scaling factors are not loaded
+                snapshot.load_initial(self, load_from)
                 return
 
         # This initializtion will use the inlet stage pressure ratios to
@@ -429,10 +428,8 @@ class SteamTurbineFlowsheetData(FlowsheetBlockData):
             raise InitializationError(f"steam turbine failed to initialize.")
 
         if save_to is not None:
-            iutil.to_json(self)
-            if save_to is not None:
-                iutil.to_json(self, fname=save_to)
-                init_log.info_high(f"Initialization saved to {save_to}")
+            snapshot.save_initial(self, save_to)
+            init_log.info_high(f"Initialization saved to {save_to}")
         init_log.info("Steam turbine flowsheet initialization complete.")
 
     def _add_tags(self):
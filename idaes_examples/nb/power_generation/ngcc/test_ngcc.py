@@ -0,0 +1,82 @@
+#################################################################################
+# The Institute for the Design of Advanced Energy Systems Integrated Platform
+# Framework (IDAES IP) was produced under the DOE Institute for the
+# Design of Advanced Energy Systems (IDAES), and is copyright (c) 2018-2022
+# by the software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia University
+# Research Corporation, et al.  All rights reserved.
+#
+# Please see the files COPYRIGHT.md and LICENSE.md for full copyright and
+# license information.
+#################################################################################
+"""
+Tests for the parallel initialization of the NGCC sub-flowsheets, from the
+saved initialization files, without solving.
+
+Building the sub-flowsheets needs the Helmholtz EoS external functions.
+"""
+# stdlib
+import shutil
+from pathlib import Path
+
+# third-party
+import pytest
+
+pytest.importorskip("idaes", reason="IDAES is needed for the NGCC flowsheet")
+import pyomo.environ as pyo
+import idaes.core.util as iutil
+from idaes.models.properties.general_helmholtz import helmholtz_available
+
+# package
+import ngcc
+from idaes_examples.common import snapshot
+
+_ngcc_dir = Path(__file__).parent
+
+
+# -------------------
+#  Fixtures
+# -------------------
+
+
+def build(name):
+    """Model with only the sub-flowsheet, named as in the NGCC flowsheet."""
+    cls, _ = ngcc._sub_flowsheets[name]
+    m = pyo.ConcreteModel()
+    m.add_component(name, cls(dynamic=False))
+    return m
+
+
+def var_state(v):
+    return v.value, v.fixed, v.lb, v.ub
+
+
+# -------------------
+#  Tests
+# -------------------
+
+
+@pytest.mark.skipif(
+    not helmholtz_available(), reason="Helmholtz EoS functions are not available"
+)
+@pytest.mark.parametrize("name", list(ngcc._sub_flowsheets))
+def test_initialize_sub_flowsheet(name, tmp_path, monkeypatch):
+    _, init_file = ngcc._sub_flowsheets[name]
+    # use a copy, since the JSON file is converted to a snapshot beside it
+    shutil.copy(_ngcc_dir / init_file, tmp_path)
+    monkeypatch.chdir(tmp_path)
+    snapshot_file = str(tmp_path / f"{name}.npz")
+    ngcc._initialize_sub_flowsheet(name, snapshot_file)
+
+    # the state in the worker's snapshot is the one in the JSON file
+    m_json = build(name)
+    iutil.from_json(
+        m_json.component(name), fname=init_file, wts=iutil.StoreSpec(suffix=False)
+    )
+    m = build(name)
+    snapshot.load_snapshot(m.component(name), snapshot_file)
+    for v in m_json.component_data_objects(pyo.Var, descend_into=True):
+        assert var_state(m.find_component(v.name)) == var_state(v), v.name
+    for c in m_json.component_data_objects(pyo.Constraint, descend_into=True):
+        assert m.find_component(c.name).active == c.active, c.name
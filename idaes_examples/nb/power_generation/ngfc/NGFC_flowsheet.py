@@ -17,6 +17,7 @@ of the solid oxide fuel cell based on a set a flowsheet conditions. More
 details can be found in the associated jupyter notebook.
 """
 
+import functools
 import os
 from collections import OrderedDict
 
@@ -34,6 +35,7 @@ from idaes.core.util import model_serializer as ms, ModelTag, ModelTagGroup
 from idaes.core.util.tags import svg_tag
 from idaes.core.util.tables import create_stream_table_dataframe
 from idaes.core.util.exceptions import InitializationError
+from idaes.core.solvers.features import nlp
 
 import idaes.core.util.scaling as iscale
 
@@ -1291,9 +1293,10 @@ def connect_reformer_to_power_island(m):
     pyo.TransformationFactory("network.expand_arcs").apply_to(m.fs)
 
 
-def SOFC_ROM_setup(m):
-    # create the ROM
-    build_SOFC_ROM(m.fs)
+def SOFC_ROM_setup(m, rom=None, mode="algebraic"):
+    # create the ROM; a reduced ROM (see SOFC_ROM.SofcRom.reduced) can be given,
+    # and mode="external" builds it as a grey-box model (see build_SOFC_ROM)
+    build_SOFC_ROM(m.fs, rom=rom, mode=mode)
 
     # build constraints connecting flowsheet to ROM input vars
 
@@ -1665,7 +1668,39 @@ def pfd_result(outfile, m, df):
         svg_tag(svg=f, tag_group=tag_group, outfile=outfile)
 
 
-def main():
+@functools.lru_cache(maxsize=None)
+def cyipopt_has_linear_solver(linear_solver):
+    """Check if CyIpopt can use a linear solver, by solving a small NLP (as
+    idaes.core.solvers.ipopt_has_linear_solver does for the Ipopt executable).
+
+    Args:
+        linear_solver: Name of the linear solver, e.g. "ma57"
+
+    Returns:
+        True if CyIpopt is available and solves the NLP with the linear solver
+    """
+    solver = pyo.SolverFactory("cyipopt", options={"linear_solver": linear_solver})
+    if not solver.available(exception_flag=False):
+        return False
+    m, x = nlp()
+    try:
+        res = solver.solve(m)
+    except Exception:  # what is raised for a missing solver depends on versions
+        return False
+    return pyo.check_optimal_termination(res) and abs(x - pyo.value(m.x)) < 1e-8
+
+
+def main(rom_mode="algebraic"):
+    """Build, initialize and solve the NGFC flowsheet.
+
+    Args:
+        rom_mode: How to build the SOFC ROM (see SOFC_ROM.build_SOFC_ROM);
+            with "external" the flowsheet is solved with cyipopt, and the
+            initialization and solution files get an "_external" suffix
+
+    Returns:
+        The model
+    """
     # create model and flowsheet
     m = pyo.ConcreteModel(name="NGFC without carbon capture")
     m.fs = FlowsheetBlock(dynamic=False)
@@ -1673,43 +1708,69 @@ def main():
     reinit = False  # switch to True to re-initialize and re-solve
     resolve = False  # switch to True to re-solve only (for debugging)
 
-    if os.path.exists("NGFC_flowsheet_init.json.gz") and reinit is False:
+    prefix = "NGFC_flowsheet"
+    if rom_mode != "algebraic":
+        prefix += f"_{rom_mode}"
+    init_fname = f"{prefix}_init.json.gz"
+    solution_fname = f"{prefix}_solution.json.gz"
+    solver_options = {
+        "max_iter": 50,
+        "tol": 1e-5,
+        "bound_push": 1e-8,
+        "nlp_scaling_method": "user-scaling"
+    }
+    if rom_mode == "algebraic":
+        solver_name = "ipopt"
+        solver_options.update(
+            {
+                "linear_solver": "ma57",
+                "ma57_pivtol": 1e-3,
+                "OF_ma57_automatic_scaling": "yes",
+            }
+        )
+    else:
+        # grey-box models need the CyIpopt interface to Ipopt. It passes the
+        # options straight to Ipopt (there is no options file for "OF_"
+        # options), and the model's scaling factors for "user-scaling". MA57
+        # is only used if that Ipopt has the HSL linear solvers.
+        solver_name = "cyipopt"
+        if cyipopt_has_linear_solver("ma57"):
+            solver_options.update(
+                {
+                    "linear_solver": "ma57",
+                    "ma57_pivtol": 1e-3,
+                    "ma57_automatic_scaling": "yes",
+                }
+            )
+
+    if os.path.exists(init_fname) and reinit is False:
         # already initialized, can build model and load results from json
         build_power_island(m)
         build_reformer(m)
         scale_flowsheet(m)
         connect_reformer_to_power_island(m)
-        SOFC_ROM_setup(m)
+        SOFC_ROM_setup(m, mode=rom_mode)
         add_SOFC_energy_balance(m)
         add_result_constraints(m)
-        if os.path.exists("NGFC_flowsheet_solution.json.gz") and resolve is False:
+        if os.path.exists(solution_fname) and resolve is False:
             # don't need to solve, can load results from json
             print('Loading solved model')
-            ms.from_json(m, fname="NGFC_flowsheet_solution.json.gz")
+            ms.from_json(m, fname=solution_fname)
         else:
             # need to solve the model using loaded initialization point
             # and then serialize solved model results
             print('Loading initialized model')
-            ms.from_json(m, fname="NGFC_flowsheet_init.json.gz")
+            ms.from_json(m, fname=init_fname)
             # solver and options
-            solver = pyo.SolverFactory("ipopt")
-            solver.options = {
-                "max_iter": 50,
-                "tol": 1e-5,
-                "bound_push": 1e-8,
-                "linear_solver": "ma57",
-                "ma57_pivtol": 1e-3,
-                "OF_ma57_automatic_scaling": "yes",
-                "nlp_scaling_method": "user-scaling"
-                  }
+            solver = pyo.SolverFactory(solver_name)
             solve_iteration = 0
             for i in range(1, 10):  # keep looping until condition is met
                 solve_iteration += 1
                 print('Solve # ', solve_iteration)
-                res = solver.solve(m, tee=True)
-                if 'Optimal Solution Found' in res.solver.message:
+                res = solver.solve(m, tee=True, options=solver_options)
+                if pyo.check_optimal_termination(res):
                     break
-            ms.to_json(m, fname="NGFC_flowsheet_solution.json.gz")
+            ms.to_json(m, fname=solution_fname)
     else:
         # need to initialize model, serialize, and try to solve/serialize
         build_power_island(m)
@@ -1720,29 +1781,20 @@ def main():
         initialize_power_island(m)
         initialize_reformer(m)
         connect_reformer_to_power_island(m)
-        SOFC_ROM_setup(m)
+        SOFC_ROM_setup(m, mode=rom_mode)
         add_SOFC_energy_balance(m)
         add_result_constraints(m)
-        ms.to_json(m, fname="NGFC_flowsheet_init.json.gz")
-        solver = pyo.SolverFactory("ipopt")
-        solver.options = {
-            "max_iter": 50,
-            "tol": 1e-5,
-            "bound_push": 1e-8,
-            "linear_solver": "ma57",
-            "ma57_pivtol": 1e-3,
-            "OF_ma57_automatic_scaling": "yes",
-            "nlp_scaling_method": "user-scaling"
-              }
+        ms.to_json(m, fname=init_fname)
+        solver = pyo.SolverFactory(solver_name)
         solve_iteration = 0
         for i in range(1, 10):  # keep looping until condition is met
             solve_iteration += 1
             print('Solve # ', solve_iteration)
-            res = solver.solve(m, tee=True)
-            if 'Optimal Solution Found' in res.solver.message:
+            res = solver.solve(m, tee=True, options=solver_options)
+            if pyo.check_optimal_termination(res):
                 break
 
-        ms.to_json(m, fname="NGFC_flowsheet_solution.json.gz")
+        ms.to_json(m, fname=solution_fname)
 
     # uncomment to report results
     make_stream_dict(m)
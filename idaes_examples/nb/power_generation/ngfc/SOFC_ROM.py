@@ -13,15 +13,74 @@
 """
 This file builds the kriging SOFC reduced order model (developed by Pacific
 Northwest National Laboratory) in a Pyomo block. A data file of kriging
-coefficients must be provided. The ROM is specifically designed for use with
-the NGFC flowsheet. The code for generating SOFC ROMS can be found on PNNL's
-Github page: https://github.com/NGFC-Lib/NGFC-Lib.
+coefficients must be provided; it is converted once to a binary (.npy) file
+(next to it, or in the user cache directory if this directory is read-only),
+which is memory-mapped when the ROM is built. The ROM is specifically designed
+for use with the NGFC flowsheet. The kriging model can be built as algebraic
+constraints, or as an external grey-box model evaluated with NumPy. The code
+for generating SOFC ROMS can be found on PNNL's Github page:
+https://github.com/NGFC-Lib/NGFC-Lib.
 """
 
+import hashlib
 import os
-from pyomo.environ import Block, Constraint, Param, Var, exp, value, units
+import time
+import numpy as np
+from pyomo.environ import (
+    Block,
+    ConcreteModel,
+    Constraint,
+    Param,
+    SolverFactory,
+    Var,
+    exp,
+    value,
+    units,
+)
 from pyomo.util.calc_var_value import calculate_variable_from_constraint
 from pyomo.common.fileutils import this_file_dir
+from pyomo.contrib.pynumero.interfaces.external_grey_box import (
+    ExternalGreyBoxBlock,
+    ExternalGreyBoxModel,
+)
+from scipy.sparse import coo_matrix
+
+n_inputs = 9
+n_outputs = 48
+n_samples = 13424
+
+# names of the ROM input vars, in the order of the ROM inputs
+ROM_INPUTS = (
+    "current_density",
+    "fuel_temperature",
+    "internal_reforming",
+    "air_temperature",
+    "air_recirculation",
+    "OTC",
+    "fuel_util",
+    "air_util",
+    "pressure",
+)
+
+# initial values of the ROM inputs, and the default operating point
+ROM_INITIALIZE_VALUES = (4000, 500, 0.4, 700, 0.5, 2.1, 0.85, 0.5, 1)
+
+# text file of kriging coefficients, one per line, and its binary copy
+COEFFICIENTS_TEXT = "kriging_coefficients.dat"
+COEFFICIENTS_FILE = "kriging_coefficients.npy"
+
+# name and shape of each group of coefficients, in file order
+COEFFICIENTS_LAYOUT = (
+    ("mean_input", (n_inputs,)),
+    ("sigma_input", (n_inputs,)),
+    ("mean_output", (n_outputs,)),
+    ("sigma_output", (n_outputs,)),
+    ("ds_input", (n_samples, n_inputs)),
+    ("theta", (n_inputs,)),
+    ("beta", (n_inputs + 1, n_outputs)),
+    ("gamma", (n_samples, n_outputs)),
+)
+_n_coefficients = sum(int(np.prod(shape)) for _, shape in COEFFICIENTS_LAYOUT)
 
 
 # creates a dictionary from a list of indices and values
@@ -43,123 +102,352 @@ def build_matrix(index1, index2, values):
     return d
 
 
-def build_SOFC_ROM(m):
-    m.SOFC = b = Block()
+def convert_kriging_coefficients(text_file=None, binary_file=None):
+    """Convert the text file of kriging coefficients to a binary (.npy) file,
+    which can be memory-mapped by :func:`load_kriging_coefficients`.
+
+    Args:
+        text_file: Text file, default is COEFFICIENTS_TEXT in this directory
+        binary_file: Binary file, default is COEFFICIENTS_FILE in this directory
+
+    Raises:
+        ValueError: If the text file does not have the expected number of
+            coefficients
+    """
+    if text_file is None:
+        text_file = os.path.join(this_file_dir(), COEFFICIENTS_TEXT)
+    if binary_file is None:
+        binary_file = os.path.join(this_file_dir(), COEFFICIENTS_FILE)
+    kriging = _read_kriging_text(text_file)
+    # write to a temporary file first, so a partial file is never loaded
+    tmp = f"{binary_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            np.save(f, kriging)
+        os.replace(tmp, binary_file)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _read_kriging_text(text_file):
+    kriging = np.loadtxt(text_file, dtype=np.float64).ravel()
+    if kriging.size != _n_coefficients:
+        raise ValueError(
+            f"Expected {_n_coefficients} kriging coefficients in {text_file}, "
+            f"found {kriging.size}"
+        )
+    return kriging
 
-    # load kriging coefficients
-    fname = "kriging_coefficients.dat"
-    path = os.path.join(this_file_dir(), fname)
 
-    with open(path) as file:
-        text = file.readlines()
+def _user_cache_file(text_file):
+    # keyed on the text file, so installs and versions of it each have a copy
+    stat = os.stat(text_file)
+    key = f"{os.path.abspath(text_file)}:{stat.st_size}:{stat.st_mtime_ns}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    name, ext = os.path.splitext(COEFFICIENTS_FILE)
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_dir, "idaes_examples", f"{name}_{digest}{ext}")
+
+
+def _is_stale(binary_file, text_file):
+    if not os.path.exists(binary_file):
+        return True
+    return os.path.getmtime(binary_file) < os.path.getmtime(text_file)
+
+
+def load_kriging_coefficients(binary_file=None):
+    """Load the kriging coefficients.
+
+    The binary file is memory-mapped, and each group of coefficients is a
+    read-only view of it. If the binary file is missing, or older than the
+    text file, it is first created from the text file. If it cannot be
+    written (e.g. in a read-only install), a copy in the user cache directory
+    is used instead, named for the path, size and modification time of the
+    text file, and if that cannot be written either, the text file is
+    read into memory.
+
+    Args:
+        binary_file: Binary file, default is COEFFICIENTS_FILE in this directory
+
+    Returns:
+        dict of arrays, with the names and shapes in COEFFICIENTS_LAYOUT
+
+    Raises:
+        ValueError: If the file does not have the expected number of
+            coefficients
+    """
+    if binary_file is None:
+        binary_file = os.path.join(this_file_dir(), COEFFICIENTS_FILE)
+    text_file = os.path.join(os.path.dirname(binary_file), COEFFICIENTS_TEXT)
+    if os.path.exists(text_file) and _is_stale(binary_file, text_file):
+        kriging = None
+        for path in (binary_file, _user_cache_file(text_file)):
+            try:
+                if _is_stale(path, text_file):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    convert_kriging_coefficients(text_file, path)
+            except OSError:
+                continue
+            binary_file = path
+            kriging = np.load(binary_file, mmap_mode="r")
+            break
+        if kriging is None:
+            kriging = _read_kriging_text(text_file)
+    else:
+        kriging = np.load(binary_file, mmap_mode="r")
+    if kriging.shape != (_n_coefficients,):
+        raise ValueError(
+            f"Expected {_n_coefficients} kriging coefficients in {binary_file}, "
+            f"found {kriging.size}"
+        )
+    coefficients = {}
+    start = 0
+    for name, shape in COEFFICIENTS_LAYOUT:
+        end = start + int(np.prod(shape))
+        coefficients[name] = kriging[start:end].reshape(shape)
+        start = end
+    return coefficients
+
+
+class SofcRom:
+    """The kriging SOFC ROM, evaluated with NumPy for one or many input points.
+
+    Inputs are in the order of ROM_INPUTS, in the units of the ROM input vars
+    of the Pyomo block (temperatures in degC, pressure in atm). The outputs are
+    the 48 ROM outputs, in the order of the ROM_output var.
+
+    A ROM may use only some of the samples (support points) of the kriging
+    model, see :meth:`reduced`. Their indices in the full model are in
+    `samples`.
+    """
+
+    #: rows of input points evaluated at once, to limit memory use
+    chunk_size = 1000
+
+    def __init__(self, coefficients=None, samples=None):
+        """Constructor.
+
+        Args:
+            coefficients: Kriging coefficients, as from
+                :func:`load_kriging_coefficients` (the default)
+            samples: Indices, in the full model, of the samples in the
+                coefficients; default is all the samples
+        """
+        if coefficients is None:
+            coefficients = load_kriging_coefficients()
+        for name, _ in COEFFICIENTS_LAYOUT:
+            setattr(self, name, np.asarray(coefficients[name], dtype=np.float64))
+        if samples is None:
+            samples = np.arange(self.ds_input.shape[0])
+        self.samples = np.asarray(samples)
+        # theta-weighted squared norm of each sample, for the distance kernel
+        self._ds_norm = (self.ds_input**2) @ self.theta
+
+    def evaluate(self, X):
+        """Evaluate the ROM, with the intermediate results.
+
+        Args:
+            X: Input points, shape (N, 9), or a single point, shape (9,)
+
+        Returns:
+            dict with the normalized inputs "norm_input" (N, 9), the kriging
+            basis "R" (N, n_samples), and the normalized and actual outputs
+            "norm_output" and "output" (N, 48). For a single point, the
+            arrays have no first dimension.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        single = X.ndim == 1
+        X = np.atleast_2d(X)
+        if X.shape[1] != n_inputs:
+            raise ValueError(f"Expected {n_inputs} inputs, got {X.shape[1]}")
+        norm_input = (X - self.mean_input) / self.sigma_input
+        R = np.empty((X.shape[0], self.ds_input.shape[0]))
+        for start in range(0, X.shape[0], self.chunk_size):
+            x = norm_input[start : start + self.chunk_size]
+            # sum_j theta_j (ds_kj - x_j)^2, expanded into matrix products
+            d2 = self._ds_norm + ((x**2) @ self.theta)[:, None]
+            d2 -= 2 * (x * self.theta) @ self.ds_input.T
+            np.exp(-np.maximum(d2, 0), out=R[start : start + self.chunk_size])
+        F = np.hstack([np.ones((X.shape[0], 1)), norm_input])
+        norm_output = F @ self.beta + R @ self.gamma
+        result = {
+            "norm_input": norm_input,
+            "R": R,
+            "norm_output": norm_output,
+            "output": self.mean_output + norm_output * self.sigma_output,
+        }
+        if single:
+            result = {k: v[0] for k, v in result.items()}
+        return result
+
+    def predict(self, X):
+        """Evaluate the ROM outputs.
+
+        Args:
+            X: Input points, shape (N, 9), or a single point, shape (9,)
+
+        Returns:
+            Outputs, shape (N, 48), or (48,) for a single point
+        """
+        return self.evaluate(X)["output"]
+
+    def _kernel_gradient(self, x):
+        # normalized input, R, and the gradient of each R_k / R_k with
+        # respect to the normalized input, 2 theta_j (ds_kj - norm_j)
+        result = self.evaluate(x)
+        norm, R = result["norm_input"], result["R"]
+        return norm, R, 2 * self.theta * (self.ds_input - norm)
+
+    def jacobian(self, x):
+        """Derivatives of the outputs with respect to the inputs.
+
+        Args:
+            x: Input point, shape (9,)
+
+        Returns:
+            Jacobian, shape (48, 9)
+        """
+        _, R, a = self._kernel_gradient(x)
+        d_norm = self.beta[1:].T + self.gamma.T @ (R[:, None] * a)
+        return self.sigma_output[:, None] * d_norm / self.sigma_input
+
+    def hessian(self, x, weights):
+        """Second derivatives of a weighted sum of the outputs with respect to
+        the inputs.
+
+        Args:
+            x: Input point, shape (9,)
+            weights: Weight of each output, shape (48,)
+
+        Returns:
+            Hessian, shape (9, 9)
+        """
+        _, R, a = self._kernel_gradient(x)
+        c = R * (self.gamma @ (np.asarray(weights) * self.sigma_output))
+        h_norm = a.T @ (c[:, None] * a) - np.diag(2 * self.theta) * c.sum()
+        return h_norm / np.outer(self.sigma_input, self.sigma_input)
+
+    def reduced(self, X, tol=1e-3):
+        """A ROM with only the samples needed to predict the outputs at some
+        input points within a tolerance.
+
+        Dropping sample k changes normalized output i by R[k] * gamma[k, i],
+        so samples are dropped, smallest first, while the sum of the largest
+        of these changes over the points and outputs stays within `tol`.
+        The error at the points is then at most `tol` in every normalized
+        output, i.e. `tol` times the output's standard deviation in the
+        kriging data. Away from the points the error is not bounded, so the
+        points should cover the region where the ROM will be used.
+
+        Args:
+            X: Input points, shape (N, 9), or a single point, shape (9,)
+            tol: Allowed error in the normalized outputs
+
+        Returns:
+            New SofcRom
+        """
+        R = np.atleast_2d(self.evaluate(X)["R"])
+        bound = R.max(axis=0) * np.abs(self.gamma).max(axis=1)
+        order = np.argsort(bound)
+        n_drop = int(np.searchsorted(np.cumsum(bound[order]), tol, side="right"))
+        keep = np.sort(order[n_drop:])
+        coefficients = {name: getattr(self, name) for name, _ in COEFFICIENTS_LAYOUT}
+        coefficients["ds_input"] = self.ds_input[keep]
+        coefficients["gamma"] = self.gamma[keep]
+        return SofcRom(coefficients, samples=self.samples[keep])
+
+
+class SofcRomGreyBox(ExternalGreyBoxModel):
+    """The SOFC ROM as an external grey-box model, mapping the 9 ROM inputs to
+    the 48 ROM outputs, with values and derivatives from a SofcRom.
+    """
+
+    def __init__(self, rom):
+        self._rom = rom
+        self._x = np.array(ROM_INITIALIZE_VALUES, dtype=np.float64)
+        self._weights = np.zeros(n_outputs)
+        # the Jacobian is dense, and the Hessian is given as a lower triangle
+        self._jac_rows, self._jac_cols = np.indices((n_outputs, n_inputs))
+        self._hess_rows, self._hess_cols = np.tril_indices(n_inputs)
+
+    def input_names(self):
+        return list(ROM_INPUTS)
+
+    def output_names(self):
+        return [f"ROM_output_{i}" for i in range(n_outputs)]
+
+    def set_input_values(self, input_values):
+        self._x = np.array(input_values, dtype=np.float64)
+
+    def set_output_constraint_multipliers(self, output_con_multiplier_values):
+        self._weights = np.array(output_con_multiplier_values, dtype=np.float64)
+
+    def evaluate_outputs(self):
+        return self._rom.predict(self._x)
+
+    def evaluate_jacobian_outputs(self):
+        jac = self._rom.jacobian(self._x)
+        return coo_matrix(
+            (jac.ravel(), (self._jac_rows.ravel(), self._jac_cols.ravel())),
+            shape=(n_outputs, n_inputs),
+        )
 
-    kriging = [float(line) for line in text]
+    def evaluate_hessian_outputs(self):
+        hess = self._rom.hessian(self._x, self._weights)
+        rows, cols = self._hess_rows, self._hess_cols
+        return coo_matrix((hess[rows, cols], (rows, cols)), shape=(n_inputs, n_inputs))
 
-    n_inputs = 9
-    n_outputs = 48
-    n_samples = 13424
 
-    # create indecies for vars and params
+def _build_kriging_constraints(b, rom):
+    """Build the kriging model of the ROM as Pyomo params and constraints."""
     input_index = list(range(n_inputs))
     input_plus_index = list(range(n_inputs + 1))
     output_index = list(range(n_outputs))
-    samples_index = list(range(n_samples))
+    # samples keep their index in the full model, also in a reduced ROM
+    samples_index = rom.samples.tolist()
+
+    # create params, with Python floats rather than NumPy scalars
+    def vector(name, index):
+        return build_dict(index, getattr(rom, name).tolist())
+
+    def matrix(name, index1, index2):
+        return build_matrix(index1, index2, getattr(rom, name).ravel().tolist())
 
-    # read through data file and create params
-    start_count = 0
-    end_count = n_inputs
-    values = kriging[start_count:end_count]
     b.mean_input = Param(
-        input_index, initialize=build_dict(input_index, values), mutable=False
+        input_index, initialize=vector("mean_input", input_index), mutable=False
     )
-
-    start_count += n_inputs
-    end_count += n_inputs
-    values = kriging[start_count:end_count]
     b.sigma_input = Param(
-        input_index, initialize=build_dict(input_index, values), mutable=False
+        input_index, initialize=vector("sigma_input", input_index), mutable=False
     )
-
-    start_count += n_inputs
-    end_count += n_outputs
-    values = kriging[start_count:end_count]
     b.mean_output = Param(
-        output_index, initialize=build_dict(output_index, values), mutable=False
+        output_index, initialize=vector("mean_output", output_index), mutable=False
     )
-
-    start_count += n_outputs
-    end_count += n_outputs
-    values = kriging[start_count:end_count]
     b.sigma_output = Param(
-        output_index, initialize=build_dict(output_index, values), mutable=False
+        output_index, initialize=vector("sigma_output", output_index), mutable=False
     )
-
-    start_count += n_outputs
-    end_count += n_inputs * n_samples
-    values = kriging[start_count:end_count]
     b.ds_input = Param(
         samples_index,
         input_index,
-        initialize=build_matrix(samples_index, input_index, values),
+        initialize=matrix("ds_input", samples_index, input_index),
         mutable=False,
     )
-
-    start_count += n_inputs * n_samples
-    end_count += n_inputs
-    values = kriging[start_count:end_count]
-    b.theta = Param(
-        input_index, initialize=build_dict(input_index, values), mutable=False
-    )
-
-    start_count += n_inputs
-    end_count += (n_inputs + 1) * n_outputs
-    values = kriging[start_count:end_count]
+    b.theta = Param(input_index, initialize=vector("theta", input_index), mutable=False)
     b.beta = Param(
         input_plus_index,
         output_index,
-        initialize=build_matrix(input_plus_index, output_index, values),
+        initialize=matrix("beta", input_plus_index, output_index),
         mutable=False,
     )
-
-    start_count += (n_inputs + 1) * n_outputs
-    end_count += n_samples * n_outputs
-    values = kriging[start_count:end_count]
     b.gamma = Param(
         samples_index,
         output_index,
-        initialize=build_matrix(samples_index, output_index, values),
+        initialize=matrix("gamma", samples_index, output_index),
         mutable=False,
     )
 
-    # create input vars for the user to interface with
-    b.current_density = Var(
-        initialize=4000, units=units.A / units.m**2, bounds=(2000, 6000)
-    )
-    # units for T should be degC but pyomo doesn't support conversion from K
-    b.fuel_temperature = Var(initialize=500, units=None, bounds=(15, 600))
-
-    b.internal_reforming = Var(initialize=0.4, units=None, bounds=(0, 1))
-
-    #b.air_temperature = Var(initialize=700, units=None, bounds=(550, 800))
-    b.air_temperature = Var(initialize=700, units=None, bounds=(225, 800))
-
-    b.air_recirculation = Var(initialize=0.5, units=None, bounds=(0, 0.8))
-
-    b.OTC = Var(initialize=2.1, units=None, bounds=(1.5, 3))
-
-    b.fuel_util = Var(initialize=0.85, units=None, bounds=(0.4, 0.95))
-
-    #b.air_util = Var(initialize=0.5, units=None, bounds=(0.125, 0.833))
-    b.air_util = Var(initialize=0.5, units=None, bounds=(0, 0.833))
-
-    b.pressure = Var(initialize=1, units=units.atm, bounds=(1, 2.5))
-
-    # create vars for intermediate calculations
-    ROM_initialize_values = [4000, 500, 0.4, 700, 0.5, 2.1, 0.85, 0.5, 1]
-    b.ROM_input = Var(
-        input_index, initialize=build_dict(input_index, ROM_initialize_values)
-    )
-
     b.norm_input = Var(input_index, initialize=0)
 
     b.F = Var(input_plus_index, initialize=0)
@@ -169,32 +457,6 @@ def build_SOFC_ROM(m):
 
     b.norm_output = Var(output_index, initialize=0)
 
-    b.ROM_output = Var(output_index)
-
-    # create kriging regression constraints
-
-    # this dict maps the index values to the input vars
-    input_map = {
-        0: b.current_density,
-        1: b.fuel_temperature,
-        2: b.internal_reforming,
-        3: b.air_temperature,
-        4: b.air_recirculation,
-        5: b.OTC,
-        6: b.fuel_util,
-        7: b.air_util,
-        8: b.pressure,
-    }
-
-    def input_rule(b, i):
-        if units.get_units(input_map[i]) is None:
-            return b.ROM_input[i] == input_map[i]
-        else:
-            unit_conversion = units.get_units(input_map[i])
-            return b.ROM_input[i] == input_map[i] / unit_conversion
-
-    b.input_mapping_eqs = Constraint(input_index, rule=input_rule)
-
     def norm_input_rule(b, i):
         return b.norm_input[i] == (b.ROM_input[i] - b.mean_input[i]) / b.sigma_input[i]
 
@@ -230,6 +492,89 @@ def build_SOFC_ROM(m):
 
     b.ROM_output_eqs = Constraint(output_index, rule=ROM_output_rule)
 
+
+def build_SOFC_ROM(m, rom=None, mode="algebraic"):
+    """Build the ROM in a block `m.SOFC`.
+
+    Args:
+        m: Parent block, e.g. the flowsheet
+        rom: SofcRom with the coefficients to use, e.g. a reduced ROM (see
+            SofcRom.reduced); default is the full ROM. It is kept as
+            `m.SOFC.rom` for :func:`initialize_SOFC_ROM`.
+        mode: "algebraic" to build the kriging model as Pyomo constraints, or
+            "external" to evaluate it with NumPy in an external grey-box block
+            (see SofcRomGreyBox), which needs the "cyipopt" solver
+
+    Raises:
+        ValueError: If the mode is not known
+    """
+    if mode not in ("algebraic", "external"):
+        raise ValueError(f"Unknown SOFC ROM mode '{mode}'")
+    m.SOFC = b = Block()
+
+    # load kriging coefficients
+    if rom is None:
+        rom = SofcRom()
+    b.rom = rom
+    b.mode = mode
+
+    # create indecies for vars and params
+    input_index = list(range(n_inputs))
+    output_index = list(range(n_outputs))
+
+    # create input vars for the user to interface with
+    b.current_density = Var(
+        initialize=4000, units=units.A / units.m**2, bounds=(2000, 6000)
+    )
+    # units for T should be degC but pyomo doesn't support conversion from K
+    b.fuel_temperature = Var(initialize=500, units=None, bounds=(15, 600))
+
+    b.internal_reforming = Var(initialize=0.4, units=None, bounds=(0, 1))
+
+    #b.air_temperature = Var(initialize=700, units=None, bounds=(550, 800))
+    b.air_temperature = Var(initialize=700, units=None, bounds=(225, 800))
+
+    b.air_recirculation = Var(initialize=0.5, units=None, bounds=(0, 0.8))
+
+    b.OTC = Var(initialize=2.1, units=None, bounds=(1.5, 3))
+
+    b.fuel_util = Var(initialize=0.85, units=None, bounds=(0.4, 0.95))
+
+    #b.air_util = Var(initialize=0.5, units=None, bounds=(0.125, 0.833))
+    b.air_util = Var(initialize=0.5, units=None, bounds=(0, 0.833))
+
+    b.pressure = Var(initialize=1, units=units.atm, bounds=(1, 2.5))
+
+    # create vars for the ROM inputs and outputs
+    b.ROM_input = Var(
+        input_index, initialize=build_dict(input_index, ROM_INITIALIZE_VALUES)
+    )
+
+    b.ROM_output = Var(output_index)
+
+    # this dict maps the index values to the input vars
+    input_map = {i: b.component(name) for i, name in enumerate(ROM_INPUTS)}
+
+    def input_rule(b, i):
+        if units.get_units(input_map[i]) is None:
+            return b.ROM_input[i] == input_map[i]
+        else:
+            unit_conversion = units.get_units(input_map[i])
+            return b.ROM_input[i] == input_map[i] / unit_conversion
+
+    b.input_mapping_eqs = Constraint(input_index, rule=input_rule)
+
+    # create kriging regression constraints, or the external model
+    if mode == "algebraic":
+        _build_kriging_constraints(b, rom)
+    else:
+        b.external = ExternalGreyBoxBlock()
+        b.external.set_external_model(
+            SofcRomGreyBox(rom),
+            inputs=[b.ROM_input[i] for i in input_index],
+            outputs=[b.ROM_output[i] for i in output_index],
+        )
+
     # create output variables and constraints
     b.anode_outlet_temperature = Var(initialize=600, units=None)
     b.cathode_outlet_temperature = Var(initialize=600, units=None)
@@ -264,25 +609,40 @@ def build_SOFC_ROM(m):
 
 
 # initialization procedure for the ROM
-def initialize_SOFC_ROM(b):
+def initialize_SOFC_ROM(b, rom=None):
+    """Initialize the ROM block from the current values of its input vars.
+
+    The kriging basis and outputs are computed with NumPy (see SofcRom) and
+    assigned to the vars directly. For a ROM built with mode="external" only
+    the outputs are assigned, as there are no intermediate vars.
+
+    Args:
+        b: ROM block, from :func:`build_SOFC_ROM`
+        rom: SofcRom to evaluate, default is the one the block was built with
+    """
+
     def cvfc_indexed(variable, constraint):
         for i in constraint.keys():
             calculate_variable_from_constraint(variable[i], constraint[i])
 
-    # F needs to be done manually
-    def calculate_F():
-        for i in b.norm_input.keys():
-            b.F[i + 1].fix(value(b.norm_input[i]))
-            b.F[i + 1].unfix()
+    def set_values(variable, values):
+        for i, v in zip(variable.keys(), values.tolist()):
+            variable[i].set_value(v)
 
     print("Starting ROM initialization")
 
+    if rom is None:
+        rom = b.rom
+
     cvfc_indexed(b.ROM_input, b.input_mapping_eqs)
-    cvfc_indexed(b.norm_input, b.norm_input_eqs)
-    calculate_F()
-    cvfc_indexed(b.R, b.R_eqs)
-    cvfc_indexed(b.norm_output, b.norm_output_eqs)
-    cvfc_indexed(b.ROM_output, b.ROM_output_eqs)
+    result = rom.evaluate([value(b.ROM_input[i]) for i in b.ROM_input.keys()])
+    if b.mode == "algebraic":
+        set_values(b.norm_input, result["norm_input"])
+        for i in b.norm_input.keys():
+            b.F[i + 1].set_value(value(b.norm_input[i]))
+        set_values(b.R, result["R"])
+        set_values(b.norm_output, result["norm_output"])
+    set_values(b.ROM_output, result["output"])
     cvfc_indexed(b.anode_outlet_temperature, b.anode_outlet_eq)
     cvfc_indexed(b.cathode_outlet_temperature, b.cathode_outlet_eq)
     cvfc_indexed(b.stack_voltage, b.stack_voltage_eq)
@@ -290,3 +650,94 @@ def initialize_SOFC_ROM(b):
     cvfc_indexed(b.deltaT_cell, b.deltaT_cell_eq)
 
     print("ROM initialization completed")
+
+
+def benchmark_reduced_ROM(tol=1e-3, spread=0.05, n_points=200, seed=0, rom=None):
+    """Compare a reduced ROM (see SofcRom.reduced) with the full ROM.
+
+    The reduced ROM is made for random points within +/- `spread` (relative)
+    of the default operating point, ROM_INITIALIZE_VALUES, and within the
+    bounds of the ROM inputs. The prediction
+    error is measured at other random points in the same region. Each ROM is
+    also built as a Pyomo block, initialized at the operating point, and
+    solved with Ipopt for the inputs fixed at one of the test points.
+
+    This can be run with `idaesx bench`, as the target
+    'power_generation/ngfc/SOFC_ROM.py:benchmark_reduced_ROM'.
+
+    Args:
+        tol: Tolerance for the reduced ROM, in normalized outputs
+        spread: Relative size of the region around the operating point
+        n_points: Number of points to make the ROM, and to test it
+        seed: Seed for the random points
+        rom: Full SofcRom to reduce; default is the one from the kriging
+            coefficients file
+
+    Returns:
+        dict of results for "full" and "reduced"
+    """
+    rng = np.random.default_rng(seed)
+    x0 = np.array(ROM_INITIALIZE_VALUES, dtype=np.float64)
+
+    def build(r):
+        t0 = time.perf_counter()
+        m = ConcreteModel()
+        build_SOFC_ROM(m, rom=r)
+        return m, time.perf_counter() - t0
+
+    full = SofcRom() if rom is None else rom
+    models = {"full": build(full)}
+    lb, ub = zip(*(models["full"][0].SOFC.component(n).bounds for n in ROM_INPUTS))
+
+    def points():
+        X = x0 * (1 + spread * rng.uniform(-1, 1, size=(n_points, n_inputs)))
+        return np.clip(X, lb, ub)
+
+    t0 = time.perf_counter()
+    rom = full.reduced(points(), tol=tol)
+    reduce_time = time.perf_counter() - t0
+    models["reduced"] = build(rom)
+    X = points()
+    y_full = full.predict(X)
+
+    results = {}
+    for name, r in (("full", full), ("reduced", rom)):
+        t0 = time.perf_counter()
+        y = r.predict(X)
+        predict_time = time.perf_counter() - t0
+
+        m, build_time = models[name]
+        for i, var_name in enumerate(ROM_INPUTS):
+            m.SOFC.component(var_name).fix(ROM_INITIALIZE_VALUES[i])
+        initialize_SOFC_ROM(m.SOFC)
+        for i, var_name in enumerate(ROM_INPUTS):
+            m.SOFC.component(var_name).fix(X[0, i])
+        t0 = time.perf_counter()
+        SolverFactory("ipopt").solve(m, tee=False)
+        solve_time = time.perf_counter() - t0
+        solved = np.array([value(m.SOFC.ROM_output[i]) for i in range(n_outputs)])
+
+        results[name] = {
+            "samples": len(r.samples),
+            "build_time": build_time,
+            "solve_time": solve_time,
+            "predict_time": predict_time,
+            # errors in normalized outputs, relative to the full ROM
+            "max_error": float(np.max(np.abs(y - y_full) / full.sigma_output)),
+            "solve_error": float(
+                np.max(np.abs(solved - y_full[0]) / full.sigma_output)
+            ),
+        }
+    results["reduced"]["reduce_time"] = reduce_time
+
+    print(
+        f"{'':8} {'samples':>8} {'build':>8} {'solve':>8} {'predict':>8} "
+        f"{'error':>9} {'solved':>9}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:8} {r['samples']:8d} {r['build_time']:7.2f}s "
+            f"{r['solve_time']:7.2f}s {r['predict_time']:7.3f}s "
+            f"{r['max_error']:9.2e} {r['solve_error']:9.2e}"
+        )
+    return results
@@ -0,0 +1,299 @@
+#################################################################################
+# The Institute for the Design of Advanced Energy Systems Integrated Platform
+# Framework (IDAES IP) was produced under the DOE Institute for the
+# Design of Advanced Energy Systems (IDAES), and is copyright (c) 2018-2022
+# by the software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia University
+# Research Corporation, et al.  All rights reserved.
+#
+# Please see the files COPYRIGHT.md and LICENSE.md for full copyright and
+# license information.
+#################################################################################
+"""
+Tests for the SOFC ROM, comparing the NumPy evaluation with the algebraic
+Pyomo form, and the external grey-box form with both.
+
+The ROM is tested with made-up, well-conditioned kriging coefficients, and
+with the real ones if the kriging coefficients file is there. Solving the NGFC
+flowsheet also needs Ipopt, with the MA57 linear solver, and CyIpopt.
+"""
+# stdlib
+import os
+from pathlib import Path
+
+# third-party
+import pytest
+
+pytest.importorskip("idaes", reason="IDAES is needed for the SOFC ROM")
+import numpy as np
+import pyomo.environ as pyo
+from idaes.core.solvers import ipopt_has_linear_solver
+
+# package
+import SOFC_ROM
+
+_ngfc_dir = Path(__file__).parent
+
+needs_coefficients = pytest.mark.skipif(
+    not any(
+        (_ngfc_dir / f).exists()
+        for f in (SOFC_ROM.COEFFICIENTS_FILE, SOFC_ROM.COEFFICIENTS_TEXT)
+    ),
+    reason="kriging coefficients file is missing",
+)
+
+
+# -------------------
+#  Fixtures
+# -------------------
+
+
+def synthetic_coefficients(n_samples=500, seed=1):
+    """Made-up kriging coefficients, for a smooth ROM around the default
+    operating point, with fewer samples than the real ROM."""
+    rng = np.random.default_rng(seed)
+    x0 = np.array(SOFC_ROM.ROM_INITIALIZE_VALUES, dtype=np.float64)
+    n_inputs, n_outputs = SOFC_ROM.n_inputs, SOFC_ROM.n_outputs
+    return {
+        "mean_input": x0,
+        "sigma_input": 0.2 * x0,
+        "mean_output": rng.uniform(1, 10, n_outputs),
+        "sigma_output": rng.uniform(0.5, 2, n_outputs),
+        "ds_input": rng.normal(0, 1.5, (n_samples, n_inputs)),
+        "theta": rng.uniform(0.5, 3, n_inputs),
+        "beta": rng.normal(0, 1, (n_inputs + 1, n_outputs)),
+        "gamma": rng.normal(0, 0.1, (n_samples, n_outputs)),
+    }
+
+
+@pytest.fixture(scope="module")
+def synthetic_rom():
+    return SOFC_ROM.SofcRom(synthetic_coefficients())
+
+
+@pytest.fixture(
+    scope="module",
+    params=["synthetic", pytest.param("kriging", marks=needs_coefficients)],
+)
+def rom(request, synthetic_rom):
+    if request.param == "synthetic":
+        return synthetic_rom
+    return SOFC_ROM.SofcRom()
+
+
+@pytest.fixture(scope="module")
+def coefficients_text(tmp_path_factory):
+    """Text file of made-up kriging coefficients."""
+    path = tmp_path_factory.mktemp("kriging") / SOFC_ROM.COEFFICIENTS_TEXT
+    np.savetxt(path, np.arange(SOFC_ROM._n_coefficients, dtype=np.float64))
+    return path
+
+
+@pytest.fixture
+def x():
+    return np.array(SOFC_ROM.ROM_INITIALIZE_VALUES, dtype=np.float64) * 1.02
+
+
+def _solvers_available():
+    # the algebraic flowsheet is solved by the Ipopt executable, with MA57
+    cyipopt = pyo.SolverFactory("cyipopt")
+    return cyipopt.available(exception_flag=False) and ipopt_has_linear_solver("ma57")
+
+
+def _central_difference(f, x):
+    h = 1e-6 * np.maximum(np.abs(x), 1)
+    steps = np.diag(h)
+    return np.stack(
+        [(f(x + steps[j]) - f(x - steps[j])) / (2 * h[j]) for j in range(len(x))],
+        axis=-1,
+    )
+
+
+# -------------------
+#  Tests
+# -------------------
+
+
+def test_predict_batch(rom, x):
+    X = x * np.linspace(0.98, 1.02, 5)[:, None]
+    Y = rom.predict(X)
+    assert Y.shape == (5, SOFC_ROM.n_outputs)
+    for i in range(5):
+        np.testing.assert_allclose(rom.predict(X[i]), Y[i], rtol=1e-12)
+
+
+def test_predict_algebraic(synthetic_rom, x):
+    m = pyo.ConcreteModel()
+    SOFC_ROM.build_SOFC_ROM(m, rom=synthetic_rom, mode="algebraic")
+    b = m.SOFC
+    for name, value in zip(SOFC_ROM.ROM_INPUTS, x):
+        b.component(name).set_value(value)
+    SOFC_ROM.initialize_SOFC_ROM(b)
+
+    # the values assigned from NumPy satisfy the kriging constraints
+    outputs = np.array([pyo.value(v) for v in b.ROM_output.values()])
+    np.testing.assert_allclose(outputs, synthetic_rom.predict(x), rtol=1e-12)
+    for c in b.component_data_objects(pyo.Constraint, active=True):
+        assert pyo.value(c.body) == pytest.approx(pyo.value(c.upper), abs=1e-9)
+
+
+def test_reduced_accuracy(rom, x):
+    tol = 1e-3
+    rng = np.random.default_rng(0)
+
+    def points(n):
+        return x * (1 + 0.05 * rng.uniform(-1, 1, size=(n, SOFC_ROM.n_inputs)))
+
+    X, X_test = points(200), points(200)
+    reduced = rom.reduced(X, tol=tol)
+    assert len(reduced.samples) <= len(rom.samples)
+    # the error, in normalized outputs, is within the tolerance at the points
+    # used to reduce the ROM, and at other points in the same region
+    for points_ in (X, X_test):
+        error = np.abs(reduced.predict(points_) - rom.predict(points_))
+        assert np.max(error / rom.sigma_output) <= tol
+
+
+def test_jacobian(rom, x):
+    np.testing.assert_allclose(
+        rom.jacobian(x), _central_difference(rom.predict, x), rtol=1e-5, atol=1e-8
+    )
+
+
+def test_hessian(rom, x):
+    w = np.linspace(-1, 1, SOFC_ROM.n_outputs)
+    hess = rom.hessian(x, w)
+    np.testing.assert_allclose(hess, hess.T, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(
+        hess,
+        _central_difference(lambda x: w @ rom.jacobian(x), x),
+        rtol=1e-5,
+        atol=1e-8,
+    )
+
+
+def test_benchmark_reduced(synthetic_rom, monkeypatch):
+    class InitializingSolver:
+        """Solves the square ROM block by initializing it from its inputs."""
+
+        def solve(self, m, tee=False):
+            SOFC_ROM.initialize_SOFC_ROM(m.SOFC)
+
+    monkeypatch.setattr(SOFC_ROM, "SolverFactory", lambda name: InitializingSolver())
+    tol = 1e-3
+    results = SOFC_ROM.benchmark_reduced_ROM(tol=tol, n_points=20, rom=synthetic_rom)
+    assert results["full"]["samples"] == len(synthetic_rom.samples)
+    assert results["reduced"]["samples"] < results["full"]["samples"]
+    assert results["full"]["max_error"] == 0
+    assert results["reduced"]["max_error"] <= tol
+    # the solution is at one of the test points
+    for r in results.values():
+        assert r["solve_error"] <= r["max_error"] + 1e-9
+
+
+def test_grey_box(rom, x):
+    model = SOFC_ROM.SofcRomGreyBox(rom)
+    assert model.input_names() == list(SOFC_ROM.ROM_INPUTS)
+    assert len(model.output_names()) == SOFC_ROM.n_outputs
+    model.set_input_values(x)
+    np.testing.assert_allclose(model.evaluate_outputs(), rom.predict(x), rtol=1e-12)
+    jac = model.evaluate_jacobian_outputs()
+    np.testing.assert_allclose(jac.toarray(), rom.jacobian(x), rtol=1e-12)
+    w = np.linspace(-1, 1, SOFC_ROM.n_outputs)
+    model.set_output_constraint_multipliers(w)
+    hess = model.evaluate_hessian_outputs().toarray()
+    np.testing.assert_allclose(hess, np.tril(rom.hessian(x, w)), rtol=1e-12)
+
+
+def test_initialize_external(rom, x):
+    m = pyo.ConcreteModel()
+    SOFC_ROM.build_SOFC_ROM(m, rom=rom, mode="external")
+    b = m.SOFC
+    for name, value in zip(SOFC_ROM.ROM_INPUTS, x):
+        b.component(name).set_value(value)
+    SOFC_ROM.initialize_SOFC_ROM(b)
+
+    # residuals of the grey-box outputs, for its input and output vars
+    model = b.external.get_external_model()
+    model.set_input_values([pyo.value(v) for v in b.external.inputs.values()])
+    outputs = np.array([pyo.value(v) for v in b.external.outputs.values()])
+    np.testing.assert_allclose(model.evaluate_outputs() - outputs, 0, atol=1e-9)
+    np.testing.assert_allclose(outputs, rom.predict(x), rtol=1e-12)
+
+    # residuals of the other constraints of the block
+    for c in b.component_data_objects(pyo.Constraint, active=True):
+        assert pyo.value(c.body) == pytest.approx(pyo.value(c.upper), abs=1e-9)
+
+
+def test_unknown_mode(synthetic_rom):
+    with pytest.raises(ValueError):
+        SOFC_ROM.build_SOFC_ROM(pyo.ConcreteModel(), rom=synthetic_rom, mode="unknown")
+
+
+@needs_coefficients
+@pytest.mark.skipif(
+    not _solvers_available(), reason="needs Ipopt with MA57, and CyIpopt"
+)
+def test_main_external(tmp_path, monkeypatch):
+    import NGFC_flowsheet
+
+    # start from scratch, without saved initialization or solution files
+    monkeypatch.chdir(tmp_path)
+    m_alg = NGFC_flowsheet.main()
+    m_ext = NGFC_flowsheet.main(rom_mode="external")
+
+    # all vars, except the intermediate kriging vars, have the same solution
+    compared = 0
+    for v in m_alg.component_data_objects(pyo.Var, descend_into=True):
+        v_ext = m_ext.find_component(v.name)
+        if v_ext is None or v.value is None:
+            continue
+        assert v_ext.value == pytest.approx(v.value, rel=1e-4, abs=1e-6), v.name
+        compared += 1
+    assert compared > 0
+    assert os.path.exists(tmp_path / "NGFC_flowsheet_external_solution.json.gz")
+
+
+def test_load_coefficients_read_only(coefficients_text, tmp_path, monkeypatch):
+    convert = SOFC_ROM.convert_kriging_coefficients
+    read_only = [str(coefficients_text.parent)]
+
+    def convert_unless_read_only(text_file, binary_file):
+        if os.path.dirname(binary_file) in read_only:
+            raise PermissionError(binary_file)
+        convert(text_file, binary_file)
+
+    monkeypatch.setattr(
+        SOFC_ROM, "convert_kriging_coefficients", convert_unless_read_only
+    )
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    binary_file = coefficients_text.with_suffix(".npy")
+    cache_file = Path(SOFC_ROM._user_cache_file(str(coefficients_text)))
+    assert cache_file.parent == tmp_path / "idaes_examples"
+
+    # converted to the user cache directory
+    coefficients = SOFC_ROM.load_kriging_coefficients(str(binary_file))
+    assert not binary_file.exists() and cache_file.exists()
+    assert coefficients["mean_input"].tolist() == list(range(SOFC_ROM.n_inputs))
+
+    # read into memory
+    cache_file.unlink()
+    read_only.append(str(cache_file.parent))
+    coefficients = SOFC_ROM.load_kriging_coefficients(str(binary_file))
+    assert not cache_file.exists()
+    assert coefficients["gamma"].shape == (SOFC_ROM.n_samples, SOFC_ROM.n_outputs)
+    assert coefficients["gamma"][-1, -1] == SOFC_ROM._n_coefficients - 1
+
+
+def test_user_cache_file(tmp_path):
+    # each copy of the text file has its own cached binary file
+    text_files = [tmp_path / d / SOFC_ROM.COEFFICIENTS_TEXT for d in ("a", "b")]
+    for path in text_files:
+        path.parent.mkdir()
+        path.write_text("1.0\n")
+    a, b = (SOFC_ROM._user_cache_file(str(path)) for path in text_files)
+    assert a != b
+    assert SOFC_ROM._user_cache_file(str(text_files[0])) == a
+    text_files[0].write_text("1.0\n2.0\n")
+    assert SOFC_ROM._user_cache_file(str(text_files[0])) != a
@@ -19,6 +19,18 @@
 # Washington to design NGFC systems with high efficiencies and low CO2
 # emissions.
 ##############################################################################
+"""
+Surrogate models of the CO2 purification unit (CPU), fitted with ALAMO.
+
+Each surrogate is a class whose `f` method maps the CPU inlet flow and mole
+fractions to one output; `f` accepts numbers or Pyomo components, and is used
+by `CPUData.add_surrogates` in cpu.py.
+
+The surrogates are all affine in the inputs, so they can also be written as a
+table of coefficients, see :func:`coefficient_table`. :class:`CpuSurrogates`
+uses that table to evaluate all the outputs for many inlet states at once.
+"""
+import numpy as np
 
 
 class compressor_power_fun:
@@ -226,3 +238,133 @@ class vent_temperature_fun:
 class vent_pressure_fun:
     def f(x1, x2, x3, x4, x5, x6):
         return -0.22395635483747847803966e-013 * x1 + 115831.96800000000803266
+
+
+# inputs of the `f` methods, x1..x6, in order
+CPU_INPUTS = ("flow_mol", "Ar", "CO2", "O2", "H2O", "N2")
+
+# output name and surrogate, in the order of the outputs of CpuSurrogates
+SURROGATES = {
+    cls.__name__[: -len("_fun")]: cls
+    for cls in (
+        heat_duty_fun,
+        compressor_power_fun,
+        refrigeration_duty_fun,
+        pureco2_temperature_fun,
+        pureco2_pressure_fun,
+        pureco2_flow_mol_fun,
+        pureco2_co2_flow_mol_comp_fun,
+        pureco2_o2_flow_mol_comp_fun,
+        pureco2_ar_flow_mol_comp_fun,
+        pureco2_h2o_flow_mol_comp_fun,
+        pureco2_n2_flow_mol_comp_fun,
+        water_temperature_fun,
+        water_pressure_fun,
+        water_flow_mol_fun,
+        water_co2_flow_mol_comp_fun,
+        water_o2_flow_mol_comp_fun,
+        water_ar_flow_mol_comp_fun,
+        water_h2o_flow_mol_comp_fun,
+        water_n2_flow_mol_comp_fun,
+        vent_temperature_fun,
+        vent_pressure_fun,
+        vent_flow_mol_fun,
+        vent_co2_flow_mol_comp_fun,
+        vent_o2_flow_mol_comp_fun,
+        vent_ar_flow_mol_comp_fun,
+        vent_h2o_flow_mol_comp_fun,
+        vent_n2_flow_mol_comp_fun,
+    )
+}
+
+
+class _Affine:
+    """A constant plus a linear combination of the inputs, passed to the `f`
+    method of a surrogate to read its coefficients.
+    """
+
+    def __init__(self, coef, const=0.0):
+        self.coef = coef
+        self.const = const
+
+    def __add__(self, other):
+        if isinstance(other, _Affine):
+            return _Affine(self.coef + other.coef, self.const + other.const)
+        return _Affine(self.coef, self.const + other)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return _Affine(-self.coef, -self.const)
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return (-self) + other
+
+    def __mul__(self, other):
+        if isinstance(other, _Affine):
+            raise TypeError("CPU surrogate is not affine in its inputs")
+        return _Affine(self.coef * other, self.const * other)
+
+    __rmul__ = __mul__
+
+
+def coefficient_table(surrogates=None):
+    """Constants and input coefficients of the CPU surrogates.
+
+    Args:
+        surrogates: Dict of output name to surrogate class, default SURROGATES
+
+    Returns:
+        Tuple of the output names, the constants (n_outputs,) and the
+        coefficients (n_outputs, 6), so that the outputs for an inlet state
+        `x` are `constants + coefficients @ x`
+
+    Raises:
+        TypeError: If a surrogate is not affine in its inputs
+    """
+    if surrogates is None:
+        surrogates = SURROGATES
+    unit = np.eye(len(CPU_INPUTS))
+    inputs = [_Affine(unit[i]) for i in range(len(CPU_INPUTS))]
+    constants = np.zeros(len(surrogates))
+    coefficients = np.zeros((len(surrogates), len(CPU_INPUTS)))
+    for i, cls in enumerate(surrogates.values()):
+        value = cls.f(*inputs)
+        if isinstance(value, _Affine):
+            constants[i], coefficients[i] = value.const, value.coef
+        else:  # a constant surrogate
+            constants[i] = value
+    return list(surrogates), constants, coefficients
+
+
+class CpuSurrogates:
+    """The CPU surrogates, evaluated with NumPy for one or many inlet states.
+
+    Inputs are in the order of CPU_INPUTS: the inlet flow in mol/s, then the
+    inlet mole fractions. Outputs are in the order of `names` (by default the
+    keys of SURROGATES), in the units of the matching CPU vars and expressions.
+    """
+
+    def __init__(self, surrogates=None):
+        """Constructor.
+
+        Args:
+            surrogates: Dict of output name to surrogate class, default
+                SURROGATES
+        """
+        self.names, self.constants, self.coefficients = coefficient_table(surrogates)
+
+    def predict(self, X):
+        """Outputs of all the surrogates.
+
+        Args:
+            X: Inlet states, shape (6,) or (N, 6)
+
+        Returns:
+            Outputs, shape (n_outputs,) or (N, n_outputs)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        return X @ self.coefficients.T + self.constants
@@ -38,7 +38,6 @@ import idaes.core.util as iutil
 import idaes.core.util.tables as tables
 import idaes.core.util.scaling as iscale
 import idaes.core.util.initialization as iinit
-from idaes.core.util import model_serializer as ms
 import idaes.core.plugins
 from idaes.core.solvers import use_idaes_solver_configuration_defaults
 
@@ -78,6 +77,7 @@ from idaes.models_extra.power_generation.costing.power_plant_capcost import (
 
 # Import logger
 import idaes.logger as idaeslog
+from idaes_examples.common import snapshot
 
 
 def _set_port(port, F, T, P, comp, fix=True):
@@ -2672,7 +2672,7 @@ def get_model(m=None, name="SOEC Module"):
         iscale.calculate_scaling_factors(m.soec_fs)
 
         # load model and results
-        ms.from_json(m, fname=init_fname)
+        snapshot.load_initial(m, init_fname, suffix=True)
 
     else:
         # main plant
@@ -2714,7 +2714,7 @@ def get_model(m=None, name="SOEC Module"):
         initialize_results(m.soec_fs)
 
         # save model and results
-        ms.to_json(m, fname=init_fname)
+        snapshot.save_initial(m, init_fname, suffix=True)
 
     return m, solver
 
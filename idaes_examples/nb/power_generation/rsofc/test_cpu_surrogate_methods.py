@@ -0,0 +1,63 @@
+#################################################################################
+# The Institute for the Design of Advanced Energy Systems Integrated Platform
+# Framework (IDAES IP) was produced under the DOE Institute for the
+# Design of Advanced Energy Systems (IDAES), and is copyright (c) 2018-2022
+# by the software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia University
+# Research Corporation, et al.  All rights reserved.
+#
+# Please see the files COPYRIGHT.md and LICENSE.md for full copyright and
+# license information.
+#################################################################################
+"""
+Tests for the batch evaluation of the CPU surrogates, comparing it with the
+Pyomo expressions of the surrogates, as built by CPUData.add_surrogates.
+"""
+# third-party
+import pytest
+
+pytest.importorskip("pyomo", reason="Pyomo is needed for the surrogate expressions")
+import numpy as np
+import pyomo.environ as pyo
+
+# package
+import cpu_surrogate_methods as sm
+
+
+# -------------------
+#  Fixtures
+# -------------------
+
+
+@pytest.fixture
+def X():
+    """Inlet states: flow in mol/s, then mole fractions that sum to one."""
+    rng = np.random.default_rng(0)
+    flow = rng.uniform(500, 1500, size=(5, 1))
+    fractions = rng.dirichlet([1, 8, 1, 1, 1], size=5)
+    return np.hstack([flow, fractions])
+
+
+def pyomo_outputs(x):
+    """Values of the Pyomo expressions of all the surrogates at inlet state x."""
+    m = pyo.ConcreteModel()
+    m.x = pyo.Var(range(len(sm.CPU_INPUTS)))
+    for i, value in enumerate(x):
+        m.x[i].set_value(value)
+    inputs = [m.x[i] for i in range(len(sm.CPU_INPUTS))]
+    return np.array([pyo.value(cls.f(*inputs)) for cls in sm.SURROGATES.values()])
+
+
+# -------------------
+#  Tests
+# -------------------
+
+
+def test_predict(X):
+    surrogates = sm.CpuSurrogates()
+    assert surrogates.names == list(sm.SURROGATES)
+    expected = np.array([pyomo_outputs(x) for x in X])
+    for x, y in zip(X, expected):
+        np.testing.assert_allclose(surrogates.predict(x), y, rtol=1e-10, atol=1e-6)
+    np.testing.assert_allclose(surrogates.predict(X), expected, rtol=1e-10, atol=1e-6)
@@ -0,0 +1,156 @@
+#################################################################################
+# The Institute for the Design of Advanced Energy Systems Integrated Platform
+# Framework (IDAES IP) was produced under the DOE Institute for the
+# Design of Advanced Energy Systems (IDAES), and is copyright (c) 2018-2022
+# by the software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia University
+# Research Corporation, et al.  All rights reserved.
+#
+# Please see the files COPYRIGHT.md and LICENSE.md for full copyright and
+# license information.
+#################################################################################
+"""
+Tests for preprocessing, on a small tree of notebooks in a temporary directory
+"""
+# stdlib
+import json
+import logging
+from pathlib import Path
+import re
+import shutil
+
+# third-party
+import pytest
+
+# package
+from idaes_examples import build
+from idaes_examples.util import NB_ROOT, Ext
+
+
+# -------------------
+#  Fixtures
+# -------------------
+
+
+def make_notebook(title: str) -> dict:
+    return {
+        "cells": [
+            {
+                "cell_type": "markdown",
+                "metadata": {},
+                "source": [f"# {title}\n", "See [the first](nb0_src.ipynb)\n"],
+            },
+            {
+                "cell_type": "code",
+                "metadata": {"tags": ["testing"]},
+                "source": ["x = 1"],
+                "outputs": [{"output_type": "stream", "name": "stdout", "text": "1"}],
+                "execution_count": 1,
+            },
+            {
+                "cell_type": "code",
+                "metadata": {"tags": ["exercise"]},
+                "source": ["y = 2"],
+                "outputs": [],
+                "execution_count": None,
+            },
+        ],
+        "metadata": {"kernelspec": {"name": "python3"}},
+        "nbformat": 4,
+        "nbformat_minor": 5,
+    }
+
+
+@pytest.fixture
+def tree(tmp_path) -> Path:
+    """Directory with a notebook root containing a TOC and a few notebooks."""
+    nb_root = tmp_path / NB_ROOT
+    (nb_root / "sec").mkdir(parents=True)
+    sections = []
+    for i in range(4):
+        nb_path = nb_root / "sec" / f"nb{i}_src.ipynb"
+        nb_path.write_text(json.dumps(make_notebook(f"Notebook {i}")))
+        sections.append({"file": f"sec/nb{i}_doc"})
+    toc = {"parts": [{"chapters": [{"file": "sec/index", "sections": sections}]}]}
+    (nb_root / "_toc.yml").write_text(json.dumps(toc))
+    return tmp_path
+
+
+def generated(tree: Path, ext: Ext) -> list:
+    return sorted((tree / NB_ROOT / "sec").glob(f"*_{ext.value}.ipynb"))
+
+
+def preprocess_counts(tree: Path, caplog, **kwargs) -> tuple:
+    """Preprocess and return the number of unchanged and regenerated notebooks."""
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger=build.__name__):
+        build.preprocess(str(tree), **kwargs)
+    match = re.search(r"unchanged=(\d+) regenerated=(\d+)", caplog.text)
+    return int(match.group(1)), int(match.group(2))
+
+
+# -------------------
+#  Tests
+# -------------------
+
+
+def test_preprocess_relative_path(tree, monkeypatch):
+    monkeypatch.chdir(tree)
+    assert build.preprocess(".") == 4
+    assert len(generated(tree, Ext.TEST)) == 4
+    manifest = json.loads((tree / NB_ROOT / build.MANIFEST_FILE).read_text())
+    assert sorted(manifest["notebooks"]) == [f"sec/nb{i}_src.ipynb" for i in range(4)]
+
+
+def test_preprocess_manifest(tree, caplog):
+    assert preprocess_counts(tree, caplog) == (0, 4)
+    assert preprocess_counts(tree, caplog) == (4, 0)
+    # changed source
+    src = tree / NB_ROOT / "sec" / "nb1_src.ipynb"
+    src.write_text(json.dumps(make_notebook("Changed")))
+    assert preprocess_counts(tree, caplog) == (3, 1)
+    # missing output
+    generated(tree, Ext.DOC)[2].unlink()
+    assert preprocess_counts(tree, caplog) == (3, 1)
+    assert len(generated(tree, Ext.DOC)) == 4
+
+
+def test_preprocess_jobs(tree, tmp_path_factory, caplog):
+    serial = tmp_path_factory.mktemp("serial") / "tree"
+    shutil.copytree(tree, serial)
+    assert preprocess_counts(serial, caplog) == (0, 4)
+    assert preprocess_counts(tree, caplog, jobs=2) == (0, 4)
+    assert preprocess_counts(tree, caplog, jobs=2) == (4, 0)
+    for ext in Ext:
+        paths = generated(tree, ext)
+        assert [p.name for p in paths] == [p.name for p in generated(serial, ext)]
+        for path in paths:
+            assert path.read_bytes() == (serial / path.relative_to(tree)).read_bytes()
+    manifest_path = Path(NB_ROOT) / build.MANIFEST_FILE
+    manifest = json.loads((tree / manifest_path).read_text())
+    assert manifest == json.loads((serial / manifest_path).read_text())
+
+
+@pytest.mark.parametrize(
+    "ext,code,link",
+    [
+        (Ext.TEST, ["x = 1"], "nb0_test.ipynb"),
+        (Ext.DOC, ["y = 2"], "nb0_doc.md"),
+        (Ext.USER, ["y = 2"], "nb0_usr.ipynb"),
+        (Ext.EX, ["y = 2"], "nb0_exercise.ipynb"),
+        (Ext.SOL, ["y = 2"], "nb0_solution.ipynb"),
+    ],
+)
+def test_preprocess_cells(tree, ext, code, link):
+    build.preprocess(str(tree))
+    nb = json.loads(generated(tree, ext)[1].read_text())
+    cells = nb["cells"]
+    assert [c["cell_type"] for c in cells] == ["markdown", "code"]
+    assert cells[0]["source"] == ["# Notebook 1\n", f"See [the first]({link})\n"]
+    assert cells[1]["source"] == code
+    if ext == Ext.TEST:  # outputs are stripped
+        assert cells[1]["outputs"] == [] and cells[1]["execution_count"] is None
+    # the source notebook is unchanged
+    src = json.loads((tree / NB_ROOT / "sec" / "nb1_src.ipynb").read_text())
+    assert src == make_notebook("Notebook 1")
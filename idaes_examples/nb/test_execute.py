@@ -0,0 +1,190 @@
+#################################################################################
+# The Institute for the Design of Advanced Energy Systems Integrated Platform
+# Framework (IDAES IP) was produced under the DOE Institute for the
+# Design of Advanced Energy Systems (IDAES), and is copyright (c) 2018-2022
+# by the software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia University
+# Research Corporation, et al.  All rights reserved.
+#
+# Please see the files COPYRIGHT.md and LICENSE.md for full copyright and
+# license information.
+#################################################################################
+"""
+Execute the generated test notebooks, one test per notebook.
+
+These only run with the '--run-notebooks' option. Use pytest-xdist ('-n auto')
+to run them in parallel, and '--shard i/N' to split them across machines.
+Each run is recorded in the execution history, which is used to run the
+slowest notebooks first and to balance the shards.
+Notebooks that ran successfully are not run again while their execution cache
+key is unchanged, unless the '--no-execution-cache' option is given.
+With '--warm-kernels N', each notebook runs in a new kernel that has already
+imported IDAES and Pyomo (see execute.KernelPool).
+
+The other tests, of the execution cache and scheduling, always run.
+"""
+# stdlib
+import gzip
+from pathlib import Path
+
+# third-party
+import pytest
+
+# package
+from idaes_examples import execute
+from idaes_examples.util import notebook_index
+
+
+_nb_root = Path(__file__).parent
+
+
+def _notebook_params():
+    index = notebook_index(_nb_root)
+    return [
+        pytest.param(key, path, id=key)
+        for key, path in execute.testable_notebooks(index)
+    ]
+
+
+@pytest.fixture(scope="session")
+def kernel_pool(pytestconfig):
+    size = pytestconfig.getoption("warm_kernels")
+    if size < 1:
+        yield None
+    else:
+        # one pool per process, so each pytest-xdist worker has its own
+        with execute.KernelPool(size) as pool:
+            yield pool
+
+
+@pytest.mark.notebook
+@pytest.mark.parametrize("nb_key,nb_path", _notebook_params())
+def test_execute(nb_key: str, nb_path: Path, pytestconfig, kernel_pool):
+    pytest.importorskip("nbclient", reason="nbclient is needed to run notebooks")
+    cache = None
+    if not pytestconfig.getoption("no_execution_cache"):
+        cache = execute.ExecutionCache(_nb_root)
+    execute.execute_and_record(
+        nb_key,
+        nb_path,
+        _nb_root / execute.HISTORY_FILE,
+        cache=cache,
+        kernel_pool=kernel_pool,
+    )
+
+
+# -------------------
+#  Execution cache
+# -------------------
+
+
+def _notebook(*sources):
+    nbformat = pytest.importorskip("nbformat")
+    cells = [nbformat.v4.new_code_cell(src) for src in sources]
+    return nbformat.v4.new_notebook(cells=cells)
+
+
+def test_cache_key(tmp_path):
+    nb_path = tmp_path / "sec" / "nb_test.ipynb"
+    nb_path.parent.mkdir()
+    data_path = nb_path.parent / "data.csv"
+    data_path.write_text("a,b\n1,2\n")
+    cache = execute.ExecutionCache(tmp_path)
+    nb = _notebook("x = 1")
+    key = cache.key(nb, nb_path)
+    assert cache.key(_notebook("x = 1"), nb_path) == key
+    # code, kernel and data files are all in the key
+    assert cache.key(_notebook("x = 2"), nb_path) != key
+    assert cache.key(nb, nb_path, kernel_name="other") != key
+    data_path.write_text("a,b\n1,3\n")
+    changed_key = cache.key(nb, nb_path)
+    assert changed_key != key
+    # but not the data files that notebooks generate
+    before = cache.data_stamps(nb_path)
+    with gzip.open(nb_path.parent / "out.json.gz", "wt") as f:
+        f.write("{}")
+    assert cache.key(nb, nb_path) != changed_key
+    cache.add_generated(nb_path, before)
+    assert cache.key(nb, nb_path) == changed_key
+    assert execute.ExecutionCache(tmp_path).key(nb, nb_path) == changed_key
+
+
+def test_cache_get_put(tmp_path):
+    nb_path = tmp_path / "nb_test.ipynb"
+    cache = execute.ExecutionCache(tmp_path)
+    nb = _notebook("print(1)", "x = 2")
+    nb.cells[0].outputs = [{"output_type": "stream", "name": "stdout", "text": "1"}]
+    nb.cells[0].execution_count = 1
+    key = cache.key(nb, nb_path)
+    cache.put(nb, nb_path, key)
+    cached = _notebook("print(1)", "x = 2")
+    assert not cache.get(cached, nb_path, "other-key")
+    assert cached.cells[0].outputs == []
+    assert cache.get(cached, nb_path, key)
+    assert cached.cells[0].outputs[0]["text"] == "1"
+    assert cached.cells[0].execution_count == 1
+
+
+def test_cache_notebook_writes_data(tmp_path):
+    pytest.importorskip("nbclient", reason="nbclient is needed to run notebooks")
+    pytest.importorskip("ipykernel", reason="ipykernel is needed to run notebooks")
+    nbformat = pytest.importorskip("nbformat")
+    nb_path = tmp_path / "nb_test.ipynb"
+    nb = _notebook(
+        "import gzip, time",
+        "with gzip.open('state.json.gz', 'wt') as f:\n    f.write(str(time.time()))",
+    )
+    nbformat.write(nb, str(nb_path))
+    cache = execute.ExecutionCache(tmp_path)
+    stats = {}
+    execute.execute_notebook(nb_path, kernel_name="python3", stats=stats, cache=cache)
+    assert not stats.get("cached", False)
+    # the notebook rewrites its data file, and its outputs are still current
+    stats = {}
+    execute.execute_notebook(nb_path, kernel_name="python3", stats=stats, cache=cache)
+    assert stats.get("cached", False)
+
+
+# -------------------
+#  Scheduling
+# -------------------
+
+
+def test_parse_shard():
+    assert execute.parse_shard("2/4") == (2, 4)
+    assert execute.parse_shard("1/1") == (1, 1)
+    for text in ("", "1", "a/b", "1/2/3", "0/3", "4/3", "-1/2"):
+        with pytest.raises(ValueError):
+            execute.parse_shard(text)
+
+
+def _all_shards(names, count, durations=None):
+    shards = [execute.shard(names, i, count, durations) for i in range(1, count + 1)]
+    # every name is in exactly one shard, whatever the order of the names
+    assert sorted(n for s in shards for n in s) == sorted(names)
+    assert shards == [
+        execute.shard(names[::-1], i, count, durations) for i in range(1, count + 1)
+    ]
+    return shards
+
+
+def test_shard_balance():
+    names = [f"nb{i:02d}" for i in range(20)]
+    # without durations, the shard sizes differ by at most one
+    sizes = [len(s) for s in _all_shards(names, 3)]
+    assert max(sizes) - min(sizes) <= 1
+    # with durations, the total durations differ by at most the longest
+    durations = {n: float((7 * i) % 11 + 1) for i, n in enumerate(names)}
+    shards = _all_shards(names, 3, durations)
+    loads = [sum(durations[n] for n in s) for s in shards]
+    assert max(loads) - min(loads) <= max(durations.values())
+    for s in shards:  # longest first
+        assert [durations[n] for n in s] == sorted(
+            (durations[n] for n in s), reverse=True
+        )
+    # names without a duration count as 0, and are still assigned
+    del durations["nb00"], durations["nb05"]
+    assert len(_all_shards(names, 4, durations)) == 4
+    # more shards than names
+    assert [len(s) for s in _all_shards(names[:2], 3)] == [1, 1, 0]
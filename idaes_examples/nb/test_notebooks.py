@@ -23,7 +23,7 @@ from typing import List
 import pytest
 
 # package
-from idaes_examples.util import read_toc, find_notebooks
+from idaes_examples.util import notebook_index
 
 
 # -------------------
@@ -34,15 +34,7 @@ from idaes_examples.util import read_toc, find_notebooks
 def notebooks() -> List[Path]:
     src_path = find_toc(Path(__file__).parent)
     assert src_path is not None, "Cannot find _toc.yml"
-    toc = read_toc(src_path)
-
-    notebooks = []
-
-    def add_notebook(p, **kwargs):
-        notebooks.append(p)
-
-    find_notebooks(src_path, toc, callback=add_notebook)
-    return notebooks
+    return notebook_index(src_path).paths
 
 
 def find_toc(p: Path):
@@ -0,0 +1,161 @@
+#################################################################################
+# The Institute for the Design of Advanced Energy Systems Integrated Platform
+# Framework (IDAES IP) was produced under the DOE Institute for the
+# Design of Advanced Energy Systems (IDAES), and is copyright (c) 2018-2022
+# by the software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia University
+# Research Corporation, et al.  All rights reserved.
+#
+# Please see the files COPYRIGHT.md and LICENSE.md for full copyright and
+# license information.
+#################################################################################
+"""
+Tests for the binary snapshots of a model's initial state
+"""
+# stdlib
+import logging
+import os
+
+# third-party
+import pytest
+
+pytest.importorskip("idaes", reason="IDAES is needed to save model states")
+import idaes.core.util as iutil
+import pyomo.environ as pyo
+
+# package
+from idaes_examples.common import snapshot
+
+
+# -------------------
+#  Fixtures
+# -------------------
+
+
+def build_model(keys=(1, 2, 3)):
+    m = pyo.ConcreteModel()
+    m.x = pyo.Var(keys, initialize=1, bounds=(0, 10))
+    m.y = pyo.Var(initialize=2)
+    m.p = pyo.Param(keys, initialize=3, mutable=True)
+    m.q = pyo.Param(initialize=4)
+    m.c = pyo.Constraint(keys, rule=lambda m, k: m.x[k] == m.p[k] * m.y)
+    m.b = pyo.Block()
+    m.b.z = pyo.Var(["a", "b"], initialize=5)
+    m.o = pyo.Objective(expr=m.y**2)
+    m.scaling_factor = pyo.Suffix(direction=pyo.Suffix.EXPORT)
+    m.scaling_factor[m.y] = 1e-2
+    return m
+
+
+def change_state(m, offset=1.0):
+    """Change the state that a snapshot keeps, with values that depend on the
+    index keys and `offset`."""
+    for k, v in m.x.items():
+        v.set_value(k + offset)
+        v.setub(20 + k)
+    m.x[2].fix()
+    m.y.setlb(None)
+    m.y.set_value(None)
+    for k, p in m.p.items():
+        p.set_value(10 * k + offset)
+    m.b.z["b"].fix(offset)
+    m.c[1].deactivate()
+    m.b.deactivate()
+    m.scaling_factor[m.x[3]] = offset
+    m.scaling_factor[m.y] = 1e-3
+
+
+def state(m):
+    """Everything a snapshot keeps, by component name."""
+    result = {}
+    for v in m.component_data_objects(pyo.Var, descend_into=True):
+        result[v.name] = (v.value, v.fixed, v.lb, v.ub)
+    for p in m.component_data_objects(pyo.Param, descend_into=True):
+        result[p.name] = pyo.value(p)
+    for c in m.component_data_objects(
+        (pyo.Block, pyo.Constraint, pyo.Objective), descend_into=True
+    ):
+        result[c.name] = c.active
+    for c, value in m.scaling_factor.items():
+        result[f"scaling_factor[{c.name}]"] = value
+    return result
+
+
+# -------------------
+#  Tests
+# -------------------
+
+
+def test_snapshot_file():
+    assert snapshot.snapshot_file("hrsg_init.json.gz") == "hrsg_init.npz"
+    assert snapshot.snapshot_file("hrsg_init.json") == "hrsg_init.npz"
+    assert snapshot.snapshot_file("hrsg") == "hrsg.npz"
+
+
+@pytest.mark.parametrize("suffix", [True, False])
+def test_round_trip(tmp_path, suffix):
+    fname = str(tmp_path / "m.npz")
+    m = build_model()
+    change_state(m)
+    snapshot.save_snapshot(m, fname, suffix=suffix)
+
+    m2 = build_model()
+    snapshot.load_snapshot(m2, fname)
+    expected = state(m)
+    if not suffix:  # the suffix is left as it was built
+        expected = {k: v for k, v in expected.items() if "scaling" not in k}
+        expected["scaling_factor[y]"] = 1e-2
+    assert state(m2) == expected
+
+
+@pytest.mark.parametrize("keys", [(3, 2, 1), (2, 3, 4)], ids=["order", "keys"])
+def test_layout_mismatch(tmp_path, caplog, keys):
+    fname = str(tmp_path / "m.npz")
+    m = build_model()
+    change_state(m)
+    snapshot.save_snapshot(m, fname, suffix=True)
+
+    # the same number of data in each component, but not the same index keys,
+    # so the data are matched by name
+    m2 = build_model(keys)
+    with caplog.at_level(logging.WARNING, logger=snapshot.__name__):
+        snapshot.load_snapshot(m2, fname)
+    saved, loaded = state(m), state(m2)
+    shared = [k for k in keys if k in (1, 2, 3)]
+    for name in ("x", "p", "c"):
+        for k in shared:
+            assert loaded[f"{name}[{k}]"] == saved[f"{name}[{k}]"]
+    if 4 in keys:
+        assert loaded["x[4]"] == (1, False, 0, 10)
+        assert "no state for" in caplog.text
+    else:
+        assert caplog.text == ""
+    for name in ("y", "b.z[b]", "b", "o", "scaling_factor[y]"):
+        assert loaded[name] == saved[name]
+
+
+def test_load_initial(tmp_path):
+    fname = str(tmp_path / "m_init.json.gz")
+    snap = snapshot.snapshot_file(fname)
+    m = build_model()
+    change_state(m)
+    snapshot.save_initial(m, fname, suffix=True)
+    assert os.path.exists(snap)
+
+    m2 = build_model()
+    snapshot.load_initial(m2, fname, suffix=True)
+    assert state(m2) == state(m)
+
+    # a newer JSON file is loaded, and converted to a snapshot again
+    change_state(m, offset=2.0)
+    iutil.to_json(m, fname=fname)
+    mtime = os.path.getmtime(fname) - 10
+    os.utime(snap, (mtime, mtime))
+    m3 = build_model()
+    snapshot.load_initial(m3, fname, suffix=True)
+    assert state(m3) == state(m)
+    assert os.path.getmtime(snap) >= os.path.getmtime(fname)
+    m4 = build_model()
+    snapshot.load_snapshot(m4, snap)
+    assert state(m4) == state(m)
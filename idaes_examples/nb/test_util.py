@@ -0,0 +1,92 @@
+#################################################################################
+# The Institute for the Design of Advanced Energy Systems Integrated Platform
+# Framework (IDAES IP) was produced under the DOE Institute for the
+# Design of Advanced Energy Systems (IDAES), and is copyright (c) 2018-2022
+# by the software owners: The Regents of the University of California, through
+# Lawrence Berkeley National Laboratory,  National Technology & Engineering
+# Solutions of Sandia, LLC, Carnegie Mellon University, West Virginia University
+# Research Corporation, et al.  All rights reserved.
+#
+# Please see the files COPYRIGHT.md and LICENSE.md for full copyright and
+# license information.
+#################################################################################
+"""
+Tests for the utility functions
+"""
+# stdlib
+import json
+
+# third-party
+import pytest
+
+# package
+from idaes_examples.util import NB_CELLS, iter_notebook
+
+
+# -------------------
+#  Fixtures
+# -------------------
+
+
+NOTEBOOK = {
+    "cells": [
+        {
+            "cell_type": "markdown",
+            "metadata": {},
+            "source": ['# Title with "quotes", \\ and [brackets]\n', "café ✓"],
+        },
+        {
+            "cell_type": "code",
+            "metadata": {"tags": ["testing"], "scrolled": True, "n": None},
+            "source": ["x = {'a': [1, 2]}\n", "print(x)"],
+            "outputs": [{"output_type": "stream", "name": "stdout", "text": "{}"}],
+            "execution_count": 12,
+        },
+        {"cell_type": "raw", "metadata": {}, "source": []},
+    ],
+    "metadata": {"kernelspec": {"name": "python3"}, "version": -1.5e-3},
+    "nbformat": 4,
+    "nbformat_minor": 5,
+}
+
+
+def read_pairs(path) -> dict:
+    """Notebook from the pairs of `iter_notebook`, with the cells in a list."""
+    nb = {NB_CELLS: []}
+    for key, value in iter_notebook(path):
+        if key == NB_CELLS:
+            nb[NB_CELLS].append(value)
+        else:
+            nb[key] = value
+    return nb
+
+
+# -------------------
+#  Tests
+# -------------------
+
+
+@pytest.mark.parametrize(
+    "dump_kwargs",
+    [{}, {"indent": 1, "ensure_ascii": False}, {"separators": (",", ":")}],
+    ids=["default", "nbformat", "compact"],
+)
+def test_iter_notebook(tmp_path, dump_kwargs):
+    path = tmp_path / "nb.ipynb"
+    path.write_text(json.dumps(NOTEBOOK, **dump_kwargs), encoding="utf-8")
+    with path.open(encoding="utf-8") as f:
+        expected = json.load(f)
+    assert read_pairs(path) == expected
+
+
+def test_iter_notebook_no_cells(tmp_path):
+    path = tmp_path / "nb.ipynb"
+    path.write_text(json.dumps(dict(NOTEBOOK, cells=[]), indent=1))
+    assert read_pairs(path) == json.loads(path.read_text())
+
+
+def test_iter_notebook_not_object(tmp_path):
+    path = tmp_path / "nb.ipynb"
+    path.write_text("[1, 2]")
+    with pytest.raises(ValueError):
+        list(iter_notebook(path))
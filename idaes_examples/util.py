@@ -3,9 +3,13 @@ Common variables and methods for tests and scripts.
 """
 # stdlib
 from enum import Enum
+import hashlib
+import json
 import logging
+import os
 from pathlib import Path
-from typing import Dict
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 # third-party
 import yaml
@@ -13,11 +17,16 @@ import yaml
 src_suffix = "_src"
 src_suffix_len = 4
 
+_log = logging.getLogger(__name__)
+
 
 NB_ROOT = "nb"  # root folder name
+NB_INDEX = ".notebook-index.json"  # cached notebook index, in root folder
 NB_CELLS = "cells"  # key for list of cells in a Jupyter Notebook
 NB_META = "metadata"  # notebook-level metadata key
 NB_IDAES, NB_SKIP = "idaes", "skip" # key and sub-key for notebook skipping
+NB_STRIP = "strip_outputs"  # sub-key for generated files without cell outputs
+NB_TIMEOUT = "timeout"  # sub-key for cell timeout (seconds) when executing
 
 
 class Tags(Enum):
@@ -126,3 +135,308 @@ def find_notebooks(
                 else:
                     raise FileNotFoundError(f"Could not find notebook at: {path}")
     return n
+
+
+class _JsonStream:
+    """Decode JSON values one at a time from a text file, reading only as much
+    of the file as needed for each value.
+    """
+
+    _ws = re.compile(r"\s*")
+
+    def __init__(self, fp, chunk_size: int = 1 << 16):
+        self._fp, self._chunk_size = fp, chunk_size
+        self._buf, self._pos, self._eof = "", 0, False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size: int = 0) -> bool:
+        """Read more data. Returns False at end of file."""
+        if self._eof:
+            return False
+        data = self._fp.read(max(size, self._chunk_size))
+        if not data:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos :] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or '' at end of file."""
+        while True:
+            self._pos = self._ws.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                return self._buf[self._pos : self._pos + 1]
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' in JSON, got '{found}'")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # incomplete value: read at least as much again, and retry
+                if self._fill(len(self._buf) - self._pos):
+                    continue
+                raise
+            # a number may continue past the end of the buffer
+            if end < len(self._buf) or not self._fill():
+                self._pos = end
+                return obj
+
+
+def iter_notebook(path: Path) -> Iterator[Tuple[str, Any]]:
+    """Incrementally read a notebook's top-level keys and values.
+
+    The cells are returned one at a time, as `(NB_CELLS, cell)` pairs, so a
+    caller that stops early (e.g. after the first markdown cell) does not
+    read or parse the rest of the file.
+
+    Args:
+        path: Path to notebook file
+
+    Returns:
+        Iterator over (key, value) pairs.
+
+    Raises:
+        ValueError: If the file is not a JSON object
+    """
+    with path.open("r", encoding="utf-8") as f:
+        stream = _JsonStream(f)
+        stream.expect("{")
+        while stream.peek() not in ("}", ""):
+            key = stream.value()
+            stream.expect(":")
+            if key == NB_CELLS:
+                stream.expect("[")
+                while stream.peek() not in ("]", ""):
+                    yield key, stream.value()
+                    if stream.peek() == ",":
+                        stream.expect(",")
+                stream.expect("]")
+            else:
+                yield key, stream.value()
+            if stream.peek() == ",":
+                stream.expect(",")
+
+
+class NotebookInfo:
+    """Resolved information about one source notebook in the TOC."""
+
+    def __init__(self, root: Path, rel_path: str, skip=(), tags=()):
+        self._root, self._rel = root, rel_path
+        self.skip: List[str] = list(skip)
+        self.tags: List[str] = list(tags)
+
+    @property
+    def path(self) -> Path:
+        """Path to source notebook."""
+        return self._root / self._rel
+
+    @property
+    def key(self) -> str:
+        """Path, relative to the notebook root, without the suffix or extension.
+        For example, 'tut/flash_unit'.
+        """
+        return self._rel[: -(src_suffix_len + len(".ipynb"))]
+
+    @property
+    def name(self) -> str:
+        """Base name of notebook, e.g. 'flash_unit'."""
+        return self.key.rsplit("/", 1)[-1]
+
+    @property
+    def section(self) -> Tuple[str, ...]:
+        """Directories containing the notebook, e.g. ('tut',)."""
+        return tuple(self._rel.split("/")[:-1])
+
+    def ext_path(self, ext: Ext) -> Path:
+        """Path to the notebook generated for a given extension."""
+        return self._root / f"{self.key}_{ext.value}.ipynb"
+
+    @property
+    def paths(self) -> Dict[Ext, Path]:
+        """Paths to all notebooks that may be generated from this one."""
+        return {ext: self.ext_path(ext) for ext in Ext}
+
+    def __repr__(self):
+        return f"NotebookInfo({self.key!r})"
+
+
+class NotebookIndex:
+    """Index of all notebooks in a Jupyterbook TOC.
+
+    The resolved index is cached in the notebook root directory, and re-used
+    as long as the TOC file is unchanged. Notebook-level information is
+    re-read only for source notebooks whose size or modification time changed.
+    """
+
+    FORMAT = 1  # increment when cached layout changes
+
+    def __init__(self, src_path: Path, use_cache: bool = True):
+        """Constructor.
+
+        Args:
+            src_path: Path to source directory containing TOC file
+            use_cache: If False, do not read or write the on-disk cache
+
+        Raises:
+            FileNotFoundError: If TOC file, or any notebook in it, does not exist
+        """
+        self._root = src_path
+        self._toc_path = src_path / "_toc.yml"
+        if not self._toc_path.exists():
+            raise FileNotFoundError(f"Could not find path: {self._toc_path}")
+        self._toc_stamp = self._stamp(self._toc_path)
+        toc_data = self._toc_path.read_bytes()
+        toc_hash = hashlib.sha256(toc_data).hexdigest()
+        cache_path = src_path / NB_INDEX
+        cached = self._read_cache(cache_path, toc_hash) if use_cache else None
+        if cached is None:
+            toc = yaml.safe_load(toc_data)
+            rel_paths, cached, changed = self._toc_paths(toc), {}, True
+        else:
+            rel_paths, changed = list(cached.keys()), False
+        self._nb, entries = {}, {}
+        for rel in rel_paths:
+            path = src_path / rel
+            if not path.exists():
+                raise FileNotFoundError(f"Could not find notebook at: {path}")
+            stamp = self._stamp(path)
+            entry = cached.get(rel)
+            if entry is None or entry["stamp"] != stamp:
+                entry = dict(stamp=stamp, **self._read_notebook_meta(path))
+                changed = True
+            entries[rel] = entry
+            info = NotebookInfo(src_path, rel, skip=entry["skip"], tags=entry["tags"])
+            self._nb[info.key] = info
+        self._stamps = {rel: entry["stamp"] for rel, entry in entries.items()}
+        if use_cache and changed:
+            self._write_cache(cache_path, toc_hash, entries)
+
+    @staticmethod
+    def _stamp(path: Path) -> List[int]:
+        st = path.stat()
+        return [st.st_size, st.st_mtime_ns]
+
+    def is_current(self) -> bool:
+        """Whether the TOC and source notebooks are unchanged since indexing."""
+        try:
+            if self._stamp(self._toc_path) != self._toc_stamp:
+                return False
+            for rel, stamp in self._stamps.items():
+                if self._stamp(self._root / rel) != stamp:
+                    return False
+        except FileNotFoundError:
+            return False
+        return True
+
+    @staticmethod
+    def _toc_paths(toc: Dict) -> List[str]:
+        paths = []
+        for part in toc["parts"]:
+            for chapter in part["chapters"]:
+                for filemap in chapter["sections"]:
+                    filename = filemap["file"][:-4]  # strip "_doc" suffix
+                    paths.append(f"{filename}{src_suffix}.ipynb")
+        return paths
+
+    @staticmethod
+    def _read_notebook_meta(path: Path) -> Dict:
+        skip, tags = [], set()
+        for key, value in iter_notebook(path):
+            if key == NB_CELLS:
+                tags.update(value.get("metadata", {}).get("tags", []))
+            elif key == NB_META:
+                skip = value.get(NB_IDAES, {}).get(NB_SKIP, [])
+        return {"skip": sorted(skip), "tags": sorted(tags)}
+
+    @classmethod
+    def _read_cache(cls, cache_path: Path, toc_hash: str) -> Optional[Dict]:
+        if not cache_path.exists():
+            return None
+        try:
+            with cache_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as err:
+            _log.debug(f"Ignoring unreadable notebook index '{cache_path}': {err}")
+            return None
+        if data.get("format") != cls.FORMAT or data.get("toc") != toc_hash:
+            return None
+        return data["notebooks"]
+
+    @classmethod
+    def _write_cache(cls, cache_path: Path, toc_hash: str, entries: Dict):
+        data = {"format": cls.FORMAT, "toc": toc_hash, "notebooks": entries}
+        # unique temporary file, as parallel test workers may index at once
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump(data, f)
+            tmp_path.replace(cache_path)
+        except OSError as err:  # e.g. read-only installation
+            _log.debug(f"Cannot write notebook index '{cache_path}': {err}")
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    def __len__(self):
+        return len(self._nb)
+
+    def __iter__(self) -> Iterator[NotebookInfo]:
+        """Iterate over notebooks, in TOC order."""
+        return iter(self._nb.values())
+
+    def __getitem__(self, key: str) -> NotebookInfo:
+        """Get notebook by its key, e.g. 'tut/flash_unit'."""
+        return self._nb[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._nb
+
+    def find(self, path: Path) -> Optional[NotebookInfo]:
+        """Find notebook for a source or generated notebook path."""
+        try:
+            rel = Path(path).relative_to(self._root).as_posix()
+        except ValueError:
+            return None
+        key = rel.rsplit("_", 1)[0]
+        return self._nb.get(key, None)
+
+    @property
+    def paths(self) -> List[Path]:
+        """Paths to all the source notebooks, in TOC order."""
+        return [info.path for info in self._nb.values()]
+
+
+_indexes = {}  # cached NotebookIndex objects, by (resolved) path
+
+
+def notebook_index(src_path: Path) -> NotebookIndex:
+    """Get the notebook index for a source directory.
+
+    The index is shared by all callers in this process, and rebuilt
+    whenever the TOC file or a source notebook changes.
+
+    Args:
+        src_path: Path to source directory containing TOC file
+
+    Returns:
+        Notebook index
+
+    Raises:
+        FileNotFoundError: If TOC file, or any notebook in it, does not exist
+    """
+    key = Path(src_path).resolve()
+    index = _indexes.get(key, None)
+    if index is None or not index.is_current():
+        index = NotebookIndex(key)
+        _indexes[key] = index
+    return index